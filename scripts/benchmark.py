@@ -0,0 +1,273 @@
+import sys
+import time
+import logging
+from glob import glob
+from typing import Callable, Any, Dict, List
+
+from toolkit.uf2.uf2 import UF2
+from toolkit.pxt.project import Project, find_aligned, META_MAGIC
+from toolkit.ev3.simulation.simulator import Simulator
+from toolkit.ev3.simulation.runtime import Runtime, Branch
+from toolkit.ev3.simulation.brick import Brick, Motor
+from toolkit.ev3.simulation.chassis import Chassis, ChassisPoses
+from toolkit.ev3.simulation.screen import Framebuffer, SCREEN_WIDTH, SCREEN_HEIGHT
+from toolkit.ev3.simulation.block.source import BlockSource
+from toolkit.ev3.simulation.block.block import Block, BlockValue
+from toolkit.ev3.simulation.lib.utilities import get_all_handlers
+from toolkit.ev3.simulation.lib import motors
+from toolkit.uf2.block import block_struct, MAGIC_NUMBER_0, MAGIC_NUMBER_1, MAGIC_NUMBER_END, FILE_CONTAINER
+
+log = logging.getLogger(__name__)
+
+
+def measure(function: Callable[[], Any], repeat: int = 5) -> float:
+    """Measure the best wall-clock time of a function in seconds."""
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(name: str, baseline: float, optimized: float) -> None:
+    """Print the results of a benchmark."""
+    print("{:<48} {:>10.3f}ms {:>10.3f}ms {:>8.1f}x".format(name, baseline * 1000, optimized * 1000, baseline / optimized if optimized > 0 else float("inf")))
+
+
+def create_archive(size: int, filename: str = "Projects/benchmark.elf") -> bytes:
+    """Create a synthetic UF2 archive containing a single file of the given size."""
+    number_of_blocks = (size + 255) // 256
+    blocks = []
+    for i in range(number_of_blocks):
+        payload = bytes([i % 256]) * 256
+        data = (payload + filename.encode() + b"\x00").ljust(476, b"\x00")
+        blocks.append(block_struct.pack(MAGIC_NUMBER_0, MAGIC_NUMBER_1, FILE_CONTAINER, i * 256, 256, i, number_of_blocks, size, data, MAGIC_NUMBER_END))
+    return b"".join(blocks)
+
+
+def benchmark_extract_bytes() -> None:
+    """Compare concatenating payloads to assembling them into a preallocated buffer."""
+    def concatenate(uf2: UF2) -> bytes:
+        result = bytes()
+        for block in uf2.blocks:
+            result += block.data[:block.payload_size]
+        return result
+
+    for size in [256 * 1024, 1024 * 1024, 4 * 1024 * 1024]:
+        uf2 = UF2.parse(create_archive(size))
+        report("extract_bytes {}KiB".format(size // 1024), measure(lambda: concatenate(uf2), repeat=1), measure(uf2.assemble))
+
+
+def benchmark_extract_files() -> None:
+    """Compare rebuilding files by concatenation to writing payloads in place."""
+    def concatenate(uf2: UF2) -> Dict[str, bytes]:
+        files: Dict[str, bytes] = {}
+        for block in uf2.blocks:
+            if block.filename not in files:
+                files[block.filename] = bytearray(block.file_size)
+            files[block.filename] = files[block.filename][0:block.target_address] + block.data + files[block.filename][block.target_address + block.payload_size:]
+        return files
+
+    for size in [256 * 1024, 1024 * 1024, 2 * 1024 * 1024]:
+        uf2 = UF2.parse(create_archive(size))
+        report("extract_files {}KiB".format(size // 1024), measure(lambda: concatenate(uf2), repeat=1), measure(uf2.extract_files))
+
+
+def benchmark_find_meta_blocks() -> None:
+    """Compare scanning for the PXT meta magic in Python to the aligned find."""
+    def scan(payload: bytes) -> List[int]:
+        return [i for i in range(0, len(payload), 16) if payload[i:i + 8] == META_MAGIC]
+
+    payloads = []
+    for path in sorted(glob("examples/*.uf2")):
+        # The assembled payload is a copy, so the mapping can be closed right away
+        with UF2.open(path) as uf2:
+            payloads.append((path, uf2.assemble()))
+    for size in [1024 * 1024, 16 * 1024 * 1024]:
+        payload = bytearray(size)
+        # Place aligned and misaligned magic numbers throughout the payload
+        for offset in range(0, size - 16, size // 8):
+            payload[offset:offset + 8] = META_MAGIC
+            payload[offset + 3:offset + 11] = META_MAGIC
+        payloads.append(("synthetic {}KiB".format(size // 1024), memoryview(payload)))
+
+    for name, payload in payloads:
+        if list(find_aligned(payload, META_MAGIC, 16)) != scan(payload):
+            raise Exception("Mismatching offsets for '{}'".format(name))
+        report("find_meta_blocks {}".format(name), measure(lambda: scan(payload), repeat=1), measure(lambda: list(find_aligned(payload, META_MAGIC, 16))))
+
+
+def benchmark_handlers() -> None:
+    """Compare handlers evaluating their values on every call to compiled handlers bound to folded constants."""
+    def evaluate_shadow(value: BlockValue) -> Any:
+        # The value evaluation done on every call before constants were folded
+        if value.shadow.type == "math_number":
+            return int(value.shadow.fields["NUM"].value)
+        elif value.shadow.type == "motorSpeedPicker":
+            return int(value.shadow.fields["speed"].value)
+        elif value.shadow.type == "timePicker":
+            return int(value.shadow.fields["ms"].value)
+        raise Exception("Unimplemented value type '{}'".format(value.shadow.type))
+
+    # Parse motor labels on every call, bypassing the cache
+    parse_motor_label = motors.parse_motor_label.__wrapped__
+
+    def handle_motor_run(runtime: Runtime, block: Block, branch: Branch) -> None:
+        speed = evaluate_shadow(block.values["speed"])
+        for port, type in parse_motor_label(block.fields["motor"].value):
+            runtime.globals["brick"].get_motor(port, type).set_speed(speed)
+
+    def handle_device_pause(runtime: Runtime, block: Block, branch: Branch) -> None:
+        ms = evaluate_shadow(block.values["pause"])
+        runtime.sleep(branch, ms * 1000)
+        log.debug("Sleeping for {}ms".format(ms))
+
+    source = BlockSource("""<xml xmlns="http://www.w3.org/1999/xhtml">
+      <block type="motorRun">
+        <field name="motor">motors.largeA</field>
+        <value name="speed"><shadow type="motorSpeedPicker"><field name="speed">50</field></shadow></value>
+      </block>
+      <block type="device_pause">
+        <value name="pause"><shadow type="timePicker"><field name="ms">100</field></shadow></value>
+      </block>
+    </xml>""")
+    runtime = Runtime(source)
+    runtime.globals["brick"] = Brick(runtime)
+    runtime.globals["brick"].motors["A"] = Motor("large")
+    for call, handler in get_all_handlers().items():
+        runtime.register_handler(call, handler)
+
+    calls = 100000
+    for block, baseline in zip(source.blocks, [handle_motor_run, handle_device_pause]):
+        branch = runtime.add_branch(block)
+
+        def run_baseline() -> None:
+            for i in range(calls):
+                baseline(runtime, block, branch)
+
+        def run_optimized() -> None:
+            # The compiled handler, to which the constants are bound
+            handler = runtime.program.instructions[runtime.program.entry(block)].handler
+            for i in range(calls):
+                handler(runtime, block, branch)
+
+        report("handler {} x{}".format(block.type, calls), measure(run_baseline, repeat=3), measure(run_optimized, repeat=3))
+
+
+def create_simulator(blocks: str) -> Simulator:
+    """Create a started simulator of a forever loop of the given blocks, with motors connected to all ports."""
+    project = Project.from_sources({"name": "benchmark"}, {}, {})
+    simulator = Simulator(project, BlockSource("""<xml xmlns="http://www.w3.org/1999/xhtml">
+      <block type="forever"><statement name="HANDLER">{}</statement></block>
+    </xml>""".format(blocks)))
+    for port in simulator.brick.motors.keys():
+        simulator.brick.motors[port] = Motor("large")
+    simulator.start()
+    return simulator
+
+
+MOTOR_RUN_BLOCKS = """<block type="motorRun">
+  <field name="motor">motors.largeA</field>
+  <value name="speed"><shadow type="motorSpeedPicker"><field name="speed">50</field></shadow></value>
+  <next><block type="motorStop"><field name="motors">motors.largeA</field></block></next>
+</block>"""
+
+
+def benchmark_run_steps() -> None:
+    """Compare stepping one call at a time to stepping in batches.
+
+    Batches only save the overhead of each call to step, such as allocating a
+    StepResult, as both run the same blocks and physics for each step.
+    """
+    steps = 100000
+
+    def step() -> None:
+        simulator = create_simulator(MOTOR_RUN_BLOCKS)
+        for i in range(steps):
+            simulator.step()
+
+    def run_steps() -> None:
+        simulator = create_simulator(MOTOR_RUN_BLOCKS)
+        simulator.run_steps(steps)
+
+    report("run_steps x{}".format(steps), measure(step, repeat=3), measure(run_steps, repeat=3))
+
+
+def benchmark_chassis() -> None:
+    """Compare updating the pose of each robot on its own to updating all poses at once."""
+    ticks = 100
+    for robots in [10, 100, 1000]:
+        def update_each() -> None:
+            chassis = [Chassis("B", "C") for i in range(robots)]
+            for tick in range(ticks):
+                for i, robot in enumerate(chassis):
+                    robot.move(10.0, 10.0 + i % 5)
+
+        def update_all() -> None:
+            poses = ChassisPoses(robots)
+            chassis = [Chassis("B", "C", poses, poses.add()) for i in range(robots)]
+            for tick in range(ticks):
+                for i, robot in enumerate(chassis):
+                    robot.move(10.0, 10.0 + i % 5)
+                poses.update()
+
+        report("chassis {} robots x{}".format(robots, ticks), measure(update_each, repeat=3), measure(update_all, repeat=3))
+
+
+def benchmark_screen() -> None:
+    """Compare a screen of lists of booleans to the packed framebuffer."""
+    calls = 1000
+
+    def clear_lists() -> None:
+        for i in range(calls):
+            screen = [[False] * SCREEN_WIDTH for y in range(SCREEN_HEIGHT)]
+
+    framebuffer = Framebuffer()
+
+    def clear_framebuffer() -> None:
+        for i in range(calls):
+            framebuffer.clear()
+
+    report("screen clear x{}".format(calls), measure(clear_lists, repeat=3), measure(clear_framebuffer, repeat=3))
+
+    bitmap = bytes(range(256)) * 8
+    screen = [[False] * SCREEN_WIDTH for y in range(SCREEN_HEIGHT)]
+
+    def blit_lists() -> None:
+        for i in range(calls):
+            for y in range(64):
+                for x in range(64):
+                    screen[y + 3][x + 5] = bool(bitmap[y * 8 + (x >> 3)] & (0x80 >> (x & 7)))
+
+    def blit_framebuffer() -> None:
+        for i in range(calls):
+            framebuffer.blit(bitmap, 64, 64, 5, 3)
+
+    report("screen blit 64x64 x{}".format(calls), measure(blit_lists, repeat=3), measure(blit_framebuffer, repeat=3))
+
+
+benchmarks: Dict[str, Callable[[], None]] = {
+    "extract_bytes": benchmark_extract_bytes,
+    "extract_files": benchmark_extract_files,
+    "find_meta_blocks": benchmark_find_meta_blocks,
+    "handlers": benchmark_handlers,
+    "run_steps": benchmark_run_steps,
+    "chassis": benchmark_chassis,
+    "screen": benchmark_screen,
+}
+
+
+def main(names: List[str]) -> None:
+    logging.basicConfig(level=logging.WARNING, format='[%(levelname)s] [%(module)s] %(message)s')
+
+    print("{:<48} {:>12} {:>12} {:>9}".format("benchmark", "baseline", "optimized", "speedup"))
+    for name in names or benchmarks.keys():
+        if name not in benchmarks:
+            raise Exception("No such benchmark '{}'".format(name))
+        benchmarks[name]()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,26 @@
+import sys
+import logging
+
+from toolkit.ev3.simulation.journal import Replayer
+
+log = logging.getLogger(__name__)
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] [%(module)s] %(message)s')
+
+    # Read the archive from the first parameter and the journal from the
+    # second, optionally replaying only up to the simulated time in seconds of
+    # the third
+    with open(sys.argv[1], "rb") as file:
+        data = file.read()
+    until = int(float(sys.argv[3]) * 1000000) if len(sys.argv) > 3 else None
+
+    simulator, result = Replayer(data, sys.argv[2]).replay(until)
+    log.info("Replayed {} records and {} steps up to {:.3f}s, {} of {} checkpoints matched".format(
+        result.records, result.steps, result.time / 1000000, result.checkpoints - len(result.mismatches), result.checkpoints
+    ))
+    log.info(simulator.brick.to_dict())
+    sys.exit(0 if result.verified else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+import sys
+import json
+import logging
+
+from toolkit.ev3.simulation.scenarios import ScenarioRunner, Scenario
+
+log = logging.getLogger(__name__)
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] [%(module)s] %(message)s')
+
+    # Read the archive from the first parameter and the scenarios from the
+    # second, a JSON file with the config of the brick and a list of scenarios
+    with open(sys.argv[1], "rb") as file:
+        data = file.read()
+    with open(sys.argv[2], "r") as file:
+        description = json.load(file)
+
+    runner = ScenarioRunner(data, description.get("config"), description.get("warmup", 0))
+    results = runner.run([Scenario.from_dict(scenario) for scenario in description["scenarios"]])
+    for result in results:
+        print("{:<32} {:>10} steps {:>10.3f}s simulated {:>8.3f}s {}".format(
+            result.name, result.steps, result.time / 1000000, result.elapsed, result.error or "ok"
+        ))
+
+if __name__ == '__main__':
+    main()
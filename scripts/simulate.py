@@ -1,9 +1,8 @@
 import sys
 import logging
 
-from toolkit.uf2.uf2 import UF2
-from toolkit.pxt.project import Project
-from toolkit.ev3.simulation.simulator import Simulator
+from toolkit.ev3.simulation.cache import ProjectCache
+from toolkit.ev3.simulation.pacing import Pacing
 
 log = logging.getLogger(__name__)
 
@@ -11,12 +10,16 @@ def main() -> None:
     logging.basicConfig(level=logging.INFO, format='[%(levelname)s] [%(module)s] %(message)s')
 
     # Read the archive from the first parameter
-    uf2 = UF2.read(sys.argv[1])
-    project = Project(uf2)
-    simulator = Simulator(project)
+    with open(sys.argv[1], "rb") as file:
+        data = file.read()
+    simulator = ProjectCache().simulator(data)
+
+    # Pace the simulation by the optional second parameter, either 'realtime',
+    # 'max' or a scale such as '2x'
+    pacing = Pacing.parse(sys.argv[2]) if len(sys.argv) > 2 else Pacing.realtime()
 
     simulator.start()
-    simulator.run()
+    simulator.run(pacing)
 
 if __name__ == '__main__':
     main()
@@ -22,6 +22,12 @@ def disconnect():
 def simulation_update(response: Any) -> None:
     log.info(response)
 
+@client.on("simulation_frame")
+def simulation_frame(frame: Any) -> bool:
+    log.info(frame)
+    # Acknowledge the frame to receive further frames
+    return True
+
 def simulation_created(succeeded: bool) -> None:
     if not succeeded:
         log.error("Unable to start simulation")
@@ -38,6 +44,12 @@ def simulation_created(succeeded: bool) -> None:
             client.emit("simulation_step", callback=simulation_update)
         elif len(arguments) == 1 and arguments[0].isdigit():
             client.emit("simulation_step", int(arguments[0]), callback=simulation_update)
+        elif arguments[0] == "run":
+            pacing = arguments[1] if len(arguments) > 1 else "realtime"
+            frame_rate = float(arguments[2]) if len(arguments) > 2 else 10
+            client.emit("simulation_run", {"pacing": pacing, "frameRate": frame_rate}, callback=simulation_update)
+        elif arguments[0] == "pause":
+            client.emit("simulation_pause")
         else:
             parameters = {}
             for parameter in arguments[1:]:
@@ -53,12 +65,16 @@ def main(project_path: str) -> None:
     print("* Enter an event to trigger, along with its parameters")
     print("* Press enter without any input to step once")
     print("* Enter a number and press enter to step multiple steps")
+    print("* Enter 'run', optionally followed by the pacing and frame rate, to let the server run the simulation")
+    print("* Enter 'pause' to stop running the simulation on the server")
     print("* Press CTRL+C")
     print()
     print("Examples:")
     print("buttonEnter event=\"ButtonEvent.Pressed\" button=\"brick.buttonEnter\"")
     print("touchEvent event=\"ButtonEvent.Pressed\" sensor=\"sensors.touch1\"")
+    print("colorOnLightDetected mode=\"LightIntensityMode.Reflected\" condition=\"Light.Dark\" sensor=\"sensors.color3\"")
     print("10")
+    print("run realtime 10")
     print("<empty>\n")
     print("=" * 80 + "\n\n")
 
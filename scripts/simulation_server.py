@@ -1,77 +1,196 @@
-import sys
+import os
+import asyncio
 import logging
-import json
-from threading import Thread
-from queue import Queue
-from typing import Dict, Union, Any
-from base64 import b64decode
-
-# Requires Eventlet
-# python3 -m pip install eventlet
-import eventlet
+from typing import Dict, Any, Optional
+from urllib.parse import parse_qs
+
+# Requires AIOHTTP
+# python3 -m pip install aiohttp
+from aiohttp import web
 # Requires Socket IO
 # python3 -m pip install python-socketio
-from socketio import Server, WSGIApp
+from socketio import AsyncServer
 
-from toolkit.ev3.simulation.simulator import Simulator
-from toolkit.ev3.simulation.brick import Motor, Sensor
-from toolkit.pxt.project import Project
-from toolkit.uf2.uf2 import UF2
+from toolkit.ev3.simulation.workers import WorkerPool, StepBudget, Frame, MAX_STEPS_PER_REQUEST
 
 log = logging.getLogger(__name__)
-server = Server()
-simulators: Dict[str, Simulator] = {}
+
+# Steps per second each tenant may run across all of its sessions, and the
+# number of steps it may run at once after being idle
+TENANT_STEP_RATE = float(os.environ.get("EV3_TENANT_STEP_RATE", 200000))
+TENANT_STEP_BURST = float(os.environ.get("EV3_TENANT_STEP_BURST", 50000))
+
+server = AsyncServer(async_mode="aiohttp")
+
+
+def on_frame(frame: Frame) -> None:
+    """Push a frame of a simulation running autonomously to its client, which acknowledges it to receive further frames.
+
+    The steps run autonomously are charged to the budget of the client's tenant.
+    """
+    budget = budgets.get(tenants.get(frame.session))
+    if budget is not None and frame.steps > 0:
+        budget.charge(frame.steps)
+    if frame.error is not None:
+        asyncio.ensure_future(server.emit("simulation_error", {"time": frame.time, "error": frame.error}, to=frame.session))
+        return
+    if frame.diff is None:
+        # Nothing changed, the frame only reported steps
+        return
+    asyncio.ensure_future(server.emit(
+        "simulation_frame",
+        {"time": frame.time, "diff": frame.diff},
+        to=frame.session,
+        callback=lambda *_: pool.notify(frame.session, "acknowledge")
+    ))
+
+
+# Simulators are held by worker processes, each client keeping its worker
+pool = WorkerPool(int(os.environ["EV3_WORKERS"]) if "EV3_WORKERS" in os.environ else None, on_frame=on_frame)
+# The tenant of each client, such as a classroom, and the step budget of each
+# tenant with connected clients
+tenants: Dict[str, str] = {}
+budgets: Dict[str, StepBudget] = {}
+
+
+async def reply_error(client_id: str, error: str) -> Dict[str, str]:
+    """Emit an error to a client, returning it as the reply to its request."""
+    log.warning("Unable to handle request of client {}: {}".format(client_id, error))
+    await server.emit("simulation_error", {"error": error}, to=client_id)
+    return {"error": error}
+
+
+def validate_client(client_id: str) -> Optional[str]:
+    """The error of a request of a client which is not connected or has no simulation, if any."""
+    if tenants.get(client_id) not in budgets:
+        return "Got unknown client '{}'".format(client_id)
+    if not pool.has_session(client_id):
+        return "No simulation was created for client '{}'".format(client_id)
+    return None
+
 
 @server.on("simulation_create")
-def event_create(client_id: str, data: bytes) -> None:
+async def event_create(client_id: str, data: bytes) -> None:
     try:
-        uf2 = UF2.parse(data)
-        project = Project(uf2)
-        simulator = Simulator(project)
-        simulators[client_id] = simulator
-        return True
+        return await pool.create(client_id, data)
     except Exception:
         log.error("Unable to create simulation", exc_info=True)
         return False
 
 
 @server.on("simulation_start")
-def event_start(client_id: str, config):
-    for port, type in config["motors"].items():
-        simulators[client_id].brick.motors[port] = Motor(type)
-    for port, type in config["sensors"].items():
-        simulators[client_id].brick.sensors[port] = Sensor(type)
-    simulators[client_id].start()
+async def event_start(client_id: str, config):
+    await pool.request(client_id, "start", config=config)
 
 
 @server.on("simulation_step")
-def event_step(client_id: str, count = 1):
-    for i in range(count):
-        simulators[client_id].step()
-    return simulators[client_id].brick.to_dict()
+async def event_step(client_id: str, count = 1):
+    """Execute up to count steps within the tenant's budget, in slices so that other sessions of the worker take turns."""
+    error = validate_client(client_id)
+    if error is not None:
+        return await reply_error(client_id, error)
+
+    budget = budgets[tenants[client_id]]
+    remaining = count
+    try:
+        while remaining > 0:
+            wanted = min(remaining, MAX_STEPS_PER_REQUEST)
+            granted = budget.take(wanted)
+            if granted == 0:
+                await asyncio.sleep(budget.wait_time(wanted))
+                continue
+            result = await pool.request(client_id, "step", count=granted, diff=False)
+            remaining -= granted
+            if result["steps"] < granted:
+                # Nothing is left to run until an event is triggered
+                budget.refund(granted - result["steps"])
+                break
+        return await pool.request(client_id, "diff")
+    except Exception as exception:
+        # Such as the client disconnecting while stepping
+        return await reply_error(client_id, str(exception))
+
+
+@server.on("simulation_run")
+async def event_run(client_id: str, config = None):
+    """Run the simulation autonomously on the server, pushing frames at the requested rate, and return the negotiated settings.
+
+    The steps it runs are charged to the tenant's budget as they are reported
+    by its frames, so that stepping the tenant's other sessions waits for them.
+    """
+    error = validate_client(client_id)
+    if error is not None:
+        return await reply_error(client_id, error)
+
+    config = config or {}
+    # Sessions of a tenant share its step rate
+    tenant = tenants[client_id]
+    sessions = sum(1 for other in tenants.values() if other == tenant)
+    try:
+        return await pool.request(
+            client_id,
+            "run",
+            pacing=config.get("pacing", "realtime"),
+            frame_rate=float(config.get("frameRate", 30)),
+            window=int(config.get("window", 2)),
+            step_rate=budgets[tenant].rate / sessions
+        )
+    except Exception as exception:
+        return await reply_error(client_id, str(exception))
+
+
+@server.on("simulation_pause")
+async def event_pause(client_id: str):
+    await pool.request(client_id, "pause")
+
+
+@server.on("simulation_screen")
+async def event_screen(client_id: str, full: bool = False):
+    """Fetch the packed rows of the screen which changed since the last fetch, or all of them."""
+    return await pool.request(client_id, "screen", full=full)
 
 
 @server.on("simulation_trigger_event")
-def event_trigger_event(client_id: str, arguments: Dict[str, Any]):
-    simulators[client_id].runtime.trigger_event(arguments["event"], **arguments["parameters"])
+async def event_trigger_event(client_id: str, arguments: Dict[str, Any]):
+    await pool.request(client_id, "trigger", event=arguments["event"], parameters=arguments["parameters"])
 
 
 @server.event
-def connect(client_id: str, environment):
-    log.info("Client connected client_id={}".format(client_id))
+async def connect(client_id: str, environment):
+    # Clients share the budget of the tenant given by their query, if any
+    query = parse_qs(environment.get("QUERY_STRING", ""))
+    tenant = query.get("tenant", [client_id])[0]
+    tenants[client_id] = tenant
+    if tenant not in budgets:
+        budgets[tenant] = StepBudget(TENANT_STEP_RATE, TENANT_STEP_BURST)
+    log.info("Client connected client_id={} tenant={}".format(client_id, tenant))
 
 
 @server.event
-def disconnect(client_id: str):
+async def disconnect(client_id: str):
     log.info("Client disconnected client_id={}".format(client_id))
-    del simulators[client_id]
+    tenant = tenants.pop(client_id, None)
+    if tenant is not None and tenant not in tenants.values():
+        budgets.pop(tenant, None)
+    await pool.close(client_id)
+
+
+async def on_startup(app: web.Application) -> None:
+    pool.start(asyncio.get_running_loop())
+
+
+async def on_cleanup(app: web.Application) -> None:
+    pool.stop()
 
 
 def main() -> None:
     logging.basicConfig(level=logging.DEBUG, format='[%(levelname)s] [%(module)s] %(message)s')
 
-    app = WSGIApp(server)
-    eventlet.wsgi.server(eventlet.listen(("0.0.0.0", 3773)), app)
+    app = web.Application()
+    server.attach(app)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    web.run_app(app, host="0.0.0.0", port=3773)
 
 
 if __name__ == "__main__":
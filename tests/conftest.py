@@ -0,0 +1,41 @@
+import os
+import copy
+
+import pytest
+
+from toolkit.ev3.simulation.cache import ProjectCache
+
+
+EXAMPLES_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+# Motors, sensors and world of the line follower example, as sent by clients
+LINE_FOLLOWER_CONFIG = {
+    "motors": {"A": "large", "B": "large"},
+    "sensors": {"1": "color", "4": "ultrasonic"},
+    "world": {
+        "width": 2000, "height": 2000, "start": [1000, 430, 90], "boundary": True,
+        "lines": [{"points": [[400, 400], [1600, 400], [1600, 1600]], "width": 20}],
+        "walls": [[800, 800, 1200, 800]]
+    }
+}
+
+
+def read_example(name: str) -> bytes:
+    """Read an example archive by its filename."""
+    with open(os.path.join(EXAMPLES_DIRECTORY, name), "rb") as file:
+        return file.read()
+
+
+@pytest.fixture
+def cache(tmp_path) -> ProjectCache:
+    return ProjectCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def line_follower() -> bytes:
+    return read_example("line-follower.uf2")
+
+
+@pytest.fixture
+def line_follower_config() -> dict:
+    return copy.deepcopy(LINE_FOLLOWER_CONFIG)
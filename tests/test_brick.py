@@ -0,0 +1,110 @@
+from typing import Tuple
+
+import pytest
+
+from toolkit.pxt.project import Project
+from toolkit.ev3.simulation.simulator import Simulator
+from toolkit.ev3.simulation.block.source import BlockSource
+from toolkit.ev3.simulation.brick import Motor, MOTOR_MAX_VELOCITY, PHYSICS_PERIOD
+
+
+def test_line_follower_moves_in_world(cache, line_follower, line_follower_config):
+    # The motors run by speed while a branch waits for the color sensor, so
+    # only the motion in the world lets the simulated time pass
+    simulator = cache.simulator(line_follower)
+    simulator.brick.configure(line_follower_config)
+    simulator.start()
+
+    for _ in range(3):
+        statistics = simulator.run_steps(1000)
+        assert statistics.steps == 1000
+        assert not statistics.blocked
+
+    assert simulator.time > 0
+    assert simulator.brick.chassis.pose != tuple(line_follower_config["world"]["start"])
+
+
+def test_motors_without_world_do_not_advance_time(cache, line_follower, line_follower_config):
+    del line_follower_config["world"]
+    simulator = cache.simulator(line_follower)
+    simulator.brick.configure(line_follower_config)
+    simulator.start()
+
+    statistics = simulator.run_steps(1000)
+    assert statistics.blocked
+    assert simulator.time == 0
+
+
+def create_scheduled_simulator(unit: str, value: float, brake: bool = False) -> Simulator:
+    """Create a started simulator running a schedule of motor A on start, after setting its brake mode."""
+    project = Project.from_sources({"name": "test"}, {}, {})
+    simulator = Simulator(project, BlockSource("""<xml xmlns="http://www.w3.org/1999/xhtml">
+      <block type="pxt-on-start"><statement name="HANDLER">
+        <block type="outputMotorSetBrakeMode">
+          <field name="motor">motors.largeA</field>
+          <value name="brake"><shadow type="toggleOnOff"><field name="on">{}</field></shadow></value>
+          <next><block type="motorSchedule">
+            <field name="motor">motors.largeA</field>
+            <field name="unit">{}</field>
+            <value name="speed"><shadow type="motorSpeedPicker"><field name="speed">50</field></shadow></value>
+            <value name="value"><shadow type="math_number"><field name="NUM">{}</field></shadow></value>
+          </block></next>
+        </block>
+      </statement></block>
+    </xml>""".format(str(brake).lower(), unit, value)))
+    simulator.brick.connect_motor("A", Motor("large"))
+    simulator.start()
+    return simulator
+
+
+def run_schedule(simulator: Simulator) -> Tuple[int, float]:
+    """Run a schedule until the branch waiting for it completes, returning the time and position once the motor was ready."""
+    ready = []
+    motor = simulator.brick.motors["A"]
+    simulator.runtime.register_wait_listener(
+        lambda event, waiting: ready.append((simulator.time, motor.position)) if event.event == "motorReady" and not waiting else None
+    )
+    statistics = simulator.run_steps(10000)
+    assert statistics.completed_branches == 1 and statistics.idle
+    assert len(ready) == 1
+    return ready[0]
+
+
+# The furthest a large motor turns within a physics update, in degrees
+MAX_UPDATE_DEGREES = MOTOR_MAX_VELOCITY["large"] * PHYSICS_PERIOD / 1000000
+
+
+@pytest.mark.parametrize("unit, value, degrees", [
+    ("MoveUnit.Degrees", 360, 360),
+    ("MoveUnit.Degrees", -360, -360),
+    ("MoveUnit.Rotations", 2, 720)
+])
+def test_angular_schedules_end_once_turned(unit, value, degrees):
+    simulator = create_scheduled_simulator(unit, value)
+    time, position = run_schedule(simulator)
+    assert abs(degrees) <= abs(position) < abs(degrees) + MAX_UPDATE_DEGREES
+    assert (position > 0) == (degrees > 0)
+    assert simulator.brick.motors["A"].speed == 0
+    assert not simulator.brick.motors["A"].is_busy
+
+
+def test_timed_schedules_end_once_elapsed():
+    simulator = create_scheduled_simulator("MoveUnit.Seconds", 1)
+    time, position = run_schedule(simulator)
+    assert time == 1000000
+    assert position > 0
+
+
+def test_braking_stops_sooner_than_coasting():
+    rests = []
+    for brake in [True, False]:
+        simulator = create_scheduled_simulator("MoveUnit.Degrees", 360, brake=brake)
+        _, position = run_schedule(simulator)
+        # The motor comes to rest once the schedule ended, as the time passes
+        simulator.runtime.advance_time(2000000)
+        motor = simulator.brick.motors["A"]
+        assert motor.velocity == 0.0 and not motor.is_active
+        assert motor.brake == brake
+        rests.append(motor.position - position)
+    braking, coasting = rests
+    assert 0 < braking < coasting
@@ -0,0 +1,25 @@
+import os
+import pickle
+
+import pytest
+
+from toolkit.ev3.simulation.cache import ProjectCache
+
+
+def test_failed_write_leaves_no_temporary_files(cache, monkeypatch, line_follower):
+    def dump(*args, **kwargs) -> None:
+        raise pickle.PicklingError("Unable to pickle")
+
+    monkeypatch.setattr(pickle, "dump", dump)
+    with pytest.raises(pickle.PicklingError):
+        cache.load(line_follower)
+    assert os.listdir(cache.directory) == []
+
+
+def test_load_reads_written_entries(tmp_path, line_follower):
+    directory = str(tmp_path / "cache")
+    project, main = ProjectCache(directory).load(line_follower)
+    # A new cache has nothing in memory, so it reads the entry from disk
+    cached_project, cached_main = ProjectCache(directory).load(line_follower)
+    assert cached_project.source == project.source
+    assert [block.type for block in cached_main.blocks] == [block.type for block in main.blocks]
@@ -0,0 +1,65 @@
+from toolkit.ev3.simulation.block.source import BlockSource
+from toolkit.ev3.simulation.runtime import Runtime
+from toolkit.ev3.simulation.brick import Brick, Motor, Sensor, StatusLightPattern
+from toolkit.ev3.simulation.changes import ChangeTracker, pack_diff, unpack_diff
+
+
+def create_brick() -> Brick:
+    return Brick(Runtime(BlockSource("""<xml xmlns="http://www.w3.org/1999/xhtml"></xml>""")))
+
+
+def test_tracker_versions_components():
+    tracker = ChangeTracker()
+    assert tracker.version == 0
+    assert tracker.mark("motors.A") == 1
+    assert tracker.mark("sensors.1") == 2
+    assert tracker.mark("motors.A") == 3
+    assert tracker.changed_since(0) == ["motors.A", "sensors.1"]
+    assert tracker.changed_since(2) == ["motors.A"]
+    assert tracker.changed_since(3) == []
+
+
+def test_diffs_hold_the_changes_since_a_version():
+    brick = create_brick()
+    start = brick.version
+    brick.connect_motor("A", Motor("large"))
+    brick.connect_sensor("1", Sensor("color"))
+    diff = brick.diff_since(start)
+    assert diff["version"] == brick.version > start
+    assert diff["motors"] == {"A": Motor("large").to_dict()}
+    assert diff["sensors"] == {"1": Sensor("color").to_dict()}
+
+    # Only the components changed after the version are included
+    version = brick.version
+    brick.set_status_light_pattern(StatusLightPattern("StatusLight.Orange"))
+    brick.print("Hello", line=1)
+    diff = brick.diff_since(version)
+    assert set(diff) == {"version", "statusLightPattern", "screen"}
+    assert diff["statusLightPattern"] == "StatusLight.Orange"
+    assert len(diff["screen"]) > 0
+
+    brick.connect_motor("A", None)
+    assert brick.diff_since(diff["version"]) == {"version": brick.version, "motors": {"A": None}}
+    assert brick.diff_since(brick.version) == {"version": brick.version}
+
+
+def test_packed_diffs_round_trip():
+    brick = create_brick()
+    brick.connect_motor("A", Motor("large"))
+    brick.connect_motor("B", Motor("medium"))
+    brick.get_motor("A").set_speed(-50)
+    brick.connect_sensor("1", Sensor("color"))
+    brick.update_sensor("1", {"reflected": 42, "color": "ColorSensorColor.Red"})
+    brick.set_status_light_pattern(StatusLightPattern("StatusLight.Green"))
+    brick.print("Hello", line=2)
+    brick.connect_sensor("2", None)
+
+    diff = brick.diff_since(0)
+    assert set(diff) == {"version", "motors", "sensors", "statusLightPattern", "screen", "chassis"}
+    assert diff["chassis"] is None
+    assert unpack_diff(pack_diff(diff)) == diff
+
+    # The chassis is packed as single precision floats, without its ports
+    chassis = {"version": 7, "chassis": {"leftPort": "A", "rightPort": "B", "x": 1000.5, "y": -250.25, "heading": 90.0}}
+    assert unpack_diff(pack_diff(chassis)) == {"version": 7, "chassis": {"x": 1000.5, "y": -250.25, "heading": 90.0}}
+    assert unpack_diff(pack_diff({"version": 8})) == {"version": 8}
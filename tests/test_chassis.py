@@ -0,0 +1,59 @@
+from toolkit.ev3.simulation.chassis import ChassisPoses
+from toolkit.ev3.simulation.journal import Recorder, JournalWriter, Replayer
+
+
+def test_shared_poses_move_once_updated(cache, line_follower, line_follower_config):
+    poses = ChassisPoses()
+    simulators = [cache.simulator(line_follower, poses) for _ in range(2)]
+    for simulator in simulators:
+        simulator.brick.configure(line_follower_config)
+        simulator.start()
+
+    start = tuple(line_follower_config["world"]["start"])
+    for _ in range(200):
+        for simulator in simulators:
+            simulator.run_steps(100)
+        # The robots stop once they moved, until the poses are updated
+        assert all(simulator.brick.is_moved for simulator in simulators)
+        assert all(simulator.brick.chassis.pose == simulators[0].brick.chassis.pose for simulator in simulators)
+        poses.update()
+        for simulator in simulators:
+            simulator.brick.sense_moved()
+
+    assert len(poses) == 2
+    for simulator in simulators:
+        assert simulator.time > 0
+        assert simulator.brick.chassis.pose != start
+    # Both robots ran the same program in the same world
+    assert simulators[0].brick.state_hash() == simulators[1].brick.state_hash()
+
+
+def test_closed_chassis_frees_its_pose(cache, line_follower, line_follower_config):
+    poses = ChassisPoses()
+    simulator = cache.simulator(line_follower, poses)
+    simulator.brick.configure(line_follower_config)
+    simulator.start()
+    # The chassis is paired once the motors first run
+    simulator.run_steps(100)
+    assert len(poses) == 1
+
+    simulator.brick.set_chassis(None)
+    assert len(poses) == 0
+
+
+def test_shared_poses_replay(tmp_path, cache, line_follower, line_follower_config):
+    path = str(tmp_path / "session.ev3j")
+    poses = ChassisPoses()
+    recorder = Recorder(cache.simulator(line_follower, poses), JournalWriter(path), checkpoint_period=100000)
+    recorder.configure(line_follower_config)
+    recorder.start()
+    for _ in range(200):
+        recorder.run_steps(100)
+        poses.update()
+        recorder.sync()
+    recorder.close()
+
+    simulator, result = Replayer(line_follower, path, cache.directory).replay(strict=True)
+    assert result.checkpoints > 1
+    assert result.verified
+    assert simulator.brick.chassis.pose == recorder.simulator.brick.chassis.pose
@@ -0,0 +1,40 @@
+import pytest
+
+from toolkit.ev3.simulation import images
+from toolkit.ev3.simulation.images import decode_rgf, load_image, set_image_paths
+
+
+def test_rgf_rows_are_read_from_the_least_significant_bit():
+    # A 10x2 image with the first and last pixel of the first row set, and the
+    # second pixel of the second row
+    bitmap = decode_rgf(bytes([10, 2, 0b00000001, 0b00000010, 0b00000010, 0b00000000]))
+    assert (bitmap.width, bitmap.height) == (10, 2)
+    assert bitmap.data == bytes([0b10000000, 0b01000000, 0b01000000, 0b00000000])
+
+
+def test_truncated_rgf_images_raise():
+    with pytest.raises(Exception, match="truncated"):
+        decode_rgf(bytes([10]))
+    with pytest.raises(Exception, match="truncated"):
+        decode_rgf(bytes([10, 2, 0, 0, 0]))
+
+
+def test_images_are_decoded_once_and_shared(tmp_path, monkeypatch):
+    (tmp_path / "smile.rgf").write_bytes(bytes([8, 1, 0b00000001]))
+    paths = images.library.paths
+    set_image_paths([str(tmp_path)])
+    try:
+        reads = []
+        read = images.library.read
+        monkeypatch.setattr(images.library, "read", lambda name: reads.append(name) or read(name))
+
+        bitmap = load_image("images.smile")
+        assert bitmap.data == bytes([0b10000000])
+        assert load_image("images.smile") is bitmap
+        assert reads == ["images.smile"]
+
+        # Changing the paths drops the decoded images
+        set_image_paths([str(tmp_path)])
+        assert load_image("images.smile") is not bitmap
+    finally:
+        set_image_paths(paths)
@@ -0,0 +1,36 @@
+from toolkit.ev3.simulation.cache import ProjectCache
+from toolkit.ev3.simulation.journal import Recorder, JournalWriter, Replayer
+from toolkit.ev3.simulation.pacing import Pacer, Pacing
+
+
+def test_replay_matches_recording(tmp_path, cache, line_follower, line_follower_config):
+    path = str(tmp_path / "session.ev3j")
+    recorder = Recorder(cache.simulator(line_follower), JournalWriter(path), ProjectCache.key(line_follower), checkpoint_period=500000, snapshot_period=2000000)
+    recorder.configure(line_follower_config)
+    recorder.start()
+    pacer = Pacer(recorder.simulator.runtime, Pacing.max_speed())
+    for tick in range(600):
+        recorder.tick(pacer)
+        if tick == 100:
+            recorder.trigger("buttonEvent", {"button": "brick.buttonEnter", "event": "ButtonEvent.Pressed"})
+        if tick % 50 == 0:
+            recorder.run_steps(100)
+    recorder.close()
+    simulator = recorder.simulator
+
+    replayer = Replayer(line_follower, path, cache.directory)
+    replayed, result = replayer.replay(strict=True)
+    assert result.verified
+    assert result.checkpoints > 10
+    assert replayed.time == simulator.time
+    assert replayed.brick.state_hash() == simulator.brick.state_hash()
+    assert replayed.brick.chassis.pose == simulator.brick.chassis.pose
+
+    # Seeking to a snapshot verifies the checkpoints after it
+    assert replayer.snapshot_times
+    until = replayer.snapshot_times[-1] + 1000000
+    seeked, result = replayer.replay(until=until, strict=True)
+    assert result.verified
+    assert result.checkpoints > 0
+    assert result.records < len(replayer.records)
+    assert seeked.time <= until
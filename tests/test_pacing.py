@@ -0,0 +1,31 @@
+import time
+
+from toolkit.ev3.simulation.pacing import Pacer, Pacing
+
+from tests.conftest import read_example
+
+
+def test_max_speed_runs_pending_timers_right_away(cache, line_follower, line_follower_config):
+    # Without a world, the branch waits for the color sensor for good while
+    # the physics timer of the spinning motors is still pending
+    del line_follower_config["world"]
+    simulator = cache.simulator(line_follower)
+    simulator.brick.configure(line_follower_config)
+    simulator.start()
+    pacer = Pacer(simulator.runtime, Pacing.max_speed())
+
+    start = time.perf_counter()
+    for _ in range(120):
+        assert pacer.tick() is None
+    assert time.perf_counter() - start < 1.0
+    assert simulator.time >= 120 * pacer.tick_time
+
+
+def test_max_speed_waits_for_events_without_timers(cache):
+    simulator = cache.simulator(read_example("button-events.uf2"))
+    simulator.start()
+    pacer = Pacer(simulator.runtime, Pacing.max_speed())
+
+    pacer.tick()
+    assert simulator.runtime.next_deadline is None
+    assert pacer.tick() is not None
@@ -0,0 +1,74 @@
+import pytest
+
+from toolkit.ev3.simulation.block.block import Block
+from toolkit.ev3.simulation.block.source import BlockSource
+from toolkit.ev3.simulation.program import Program
+from toolkit.ev3.simulation.runtime import Runtime, Branch
+
+
+SOURCE = """<xml xmlns="http://www.w3.org/1999/xhtml">
+  <block type="start">
+    <statement name="HANDLER">
+      <block type="noop">
+        <next><block type="noop" disabled="true">
+          <next><block type="loop">
+            <statement name="DO"><block type="noop"></block></statement>
+          </block></next>
+        </block></next>
+      </block>
+    </statement>
+  </block>
+  <block type="unknown"></block>
+</xml>"""
+
+
+def noop(runtime: Runtime, block: Block, branch: Branch) -> None:
+    pass
+
+
+HANDLERS = {"start": noop, "noop": noop, "loop": noop}
+
+
+def test_chains_are_compiled_in_order():
+    source = BlockSource(SOURCE)
+    program = Program(source, HANDLERS)
+    start, unknown = source.blocks
+    first = start.statements["HANDLER"]
+    disabled = first.next
+    loop = disabled.next
+    body = loop.statements["DO"]
+
+    # Each chain is followed by the chains of its statements, before the next root
+    blocks = [start, first, disabled, loop, body, unknown]
+    assert [instruction.block for instruction in program.instructions] == blocks
+    assert [program.entry(block) for block in blocks] == list(range(len(blocks)))
+    assert all(program.block(block.id) is block for block in blocks)
+    assert [instruction.next for instruction in program.instructions] == [-1, 2, 3, -1, -1, -1]
+    assert [instruction.disabled for instruction in program.instructions] == [False, False, True, False, False, False]
+
+
+def test_missing_handlers_raise_once_invoked():
+    source = BlockSource(SOURCE)
+    program = Program(source, HANDLERS)
+    instruction = program.instructions[program.entry(source.blocks[1])]
+    with pytest.raises(Exception, match="No block handler registered for type 'unknown'"):
+        instruction.handler(None, instruction.block, None)
+
+
+def test_branches_start_at_the_entry_of_their_block():
+    source = BlockSource(SOURCE)
+    runtime = Runtime(source)
+    invoked = []
+    for type, handler in HANDLERS.items():
+        runtime.register_handler(type, handler)
+    runtime.register_handler("noop", lambda runtime, block, branch: invoked.append(block))
+    first = source.blocks[0].statements["HANDLER"]
+    loop = first.next.next
+    branch = runtime.add_branch(loop.statements["DO"])
+    assert branch.pc == runtime.program.entry(loop.statements["DO"]) == 4
+
+    # Disabled blocks take a step without being invoked, then the branch completes
+    runtime.add_branch(first)
+    statistics = runtime.run_steps(10)
+    assert (statistics.executed, statistics.completed_branches) == (4, 2)
+    assert invoked == [loop.statements["DO"], first]
@@ -0,0 +1,76 @@
+import os
+from glob import glob
+from typing import List
+
+import pytest
+
+from toolkit.pxt import project
+from toolkit.pxt.project import find_aligned, META_MAGIC
+from toolkit.uf2.uf2 import UF2
+from tests.conftest import EXAMPLES_DIRECTORY
+
+
+def scan(payload: bytes, magic: bytes, alignment: int) -> List[int]:
+    """Find every aligned offset of a magic number by comparing each aligned slice."""
+    return [offset for offset in range(0, len(payload), alignment) if payload[offset:offset + len(magic)] == magic]
+
+
+def create_payload(size: int) -> bytearray:
+    """Create a payload with aligned, misaligned and truncated magic numbers throughout."""
+    payload = bytearray(size)
+    for offset in range(0, size - 16, size // 8):
+        payload[offset:offset + 8] = META_MAGIC
+        payload[offset + 3:offset + 11] = META_MAGIC
+    payload[size - 4:] = META_MAGIC[:4]
+    return payload
+
+
+def example_payloads() -> List[bytes]:
+    payloads = []
+    for path in sorted(glob(os.path.join(EXAMPLES_DIRECTORY, "*.uf2"))):
+        with UF2.open(path) as uf2:
+            payloads.append(bytes(uf2.assemble()))
+    return payloads
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_find_aligned_matches_scan(monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(project, "numpy", None)
+    payloads = example_payloads() + [create_payload(size) for size in (4096, 4100, 65536)]
+    for payload in payloads:
+        for alignment in (8, 16, 32):
+            assert list(find_aligned(payload, META_MAGIC, alignment)) == scan(payload, META_MAGIC, alignment)
+        assert list(find_aligned(memoryview(payload), META_MAGIC, 16)) == scan(payload, META_MAGIC, 16)
+    assert any(scan(payload, META_MAGIC, 16) for payload in payloads)
+
+
+def test_project_parses_lazily_once(monkeypatch):
+    parses: List[str] = []
+    loads = project.json.loads
+    monkeypatch.setattr(project.json, "loads", lambda text, *args, **kwargs: parses.append("json") or loads(text, *args, **kwargs))
+
+    with UF2.open(os.path.join(EXAMPLES_DIRECTORY, "example.uf2")) as uf2:
+        assemble = uf2.assemble
+        monkeypatch.setattr(uf2, "assemble", lambda: parses.append("assemble") or assemble())
+
+        parsed = project.Project(uf2)
+        assert parses == []
+
+        # The meta block is found and parsed on first access only
+        meta = parsed.meta
+        assert parses == ["assemble", "json"]
+        assert parsed.meta is meta
+
+        # The source meta and the source are decompressed and parsed together
+        source_meta = parsed.source_meta
+        assert parses == ["assemble", "json", "json", "json"]
+        assert parsed.source_meta is source_meta
+        source = parsed.source
+        assert parsed.source is source
+        assert parses == ["assemble", "json", "json", "json"]
+
+        pxt = parsed.pxt
+        assert parses == ["assemble", "json", "json", "json", "json"]
+        assert parsed.pxt is pxt
+        assert parses == ["assemble", "json", "json", "json", "json"]
@@ -0,0 +1,218 @@
+from typing import List
+
+from toolkit.ev3.simulation.block.block import Block
+from toolkit.ev3.simulation.block.source import BlockSource
+from toolkit.ev3.simulation.runtime import Runtime, Branch, Event
+
+
+SOURCE = """<xml xmlns="http://www.w3.org/1999/xhtml">
+  <block type="start">
+    <statement name="HANDLER">
+      <block type="noop">
+        <next><block type="wait">
+          <next><block type="noop" disabled="true">
+            <next><block type="noop"></block></next>
+          </block></next>
+        </block></next>
+      </block>
+    </statement>
+  </block>
+</xml>"""
+
+
+def create_runtime(source: str = SOURCE) -> Runtime:
+    """Create a started runtime with handlers recording the blocks they invoke, which wait for a "go" event."""
+    runtime = Runtime(BlockSource(source))
+    invoked: List[str] = []
+    runtime.globals["invoked"] = invoked
+
+    def handle_start(runtime: Runtime, block: Block, branch: Branch) -> None:
+        runtime.register_event_handler("start", block.statements["HANDLER"])
+
+    def handle_noop(runtime: Runtime, block: Block, branch: Branch) -> None:
+        invoked.append("noop")
+
+    def handle_wait(runtime: Runtime, block: Block, branch: Branch) -> None:
+        invoked.append("wait")
+        branch.lock = Event(event="go", parameters={})
+
+    runtime.register_handler("start", handle_start)
+    runtime.register_handler("noop", handle_noop)
+    runtime.register_handler("wait", handle_wait)
+    runtime.start()
+    return runtime
+
+
+def test_run_statistics_count_steps():
+    runtime = create_runtime()
+    runtime.trigger_event("start")
+
+    # The branch runs up to the wait, and is then blocked
+    statistics = runtime.run_steps(10)
+    assert (statistics.steps, statistics.executed, statistics.locked, statistics.completed_branches) == (2, 2, 0, 0)
+    assert statistics.blocked and not statistics.idle and not statistics.condition_met
+    assert runtime.globals["invoked"] == ["noop", "wait"]
+
+    # The disabled block takes a step without being invoked
+    runtime.trigger_event("go")
+    statistics = runtime.run_steps(10)
+    assert (statistics.steps, statistics.executed, statistics.locked, statistics.completed_branches) == (2, 2, 0, 1)
+    assert statistics.idle and not statistics.blocked
+    assert runtime.globals["invoked"] == ["noop", "wait", "noop"]
+
+
+def test_run_statistics_count_locked_branches():
+    runtime = create_runtime()
+    runtime.trigger_event("start")
+    # A branch locked outside of a block takes a step to be set aside
+    runtime.branches[0].lock = Event(event="go", parameters={})
+    statistics = runtime.run_steps(10)
+    assert (statistics.steps, statistics.executed, statistics.locked, statistics.completed_branches) == (1, 0, 1, 0)
+    assert statistics.blocked
+    assert runtime.globals["invoked"] == []
+
+
+def test_run_until_condition_is_met():
+    runtime = create_runtime()
+    runtime.trigger_event("start")
+    statistics = runtime.run_until(lambda: len(runtime.globals["invoked"]) == 1, 10)
+    assert statistics.condition_met
+    assert (statistics.steps, statistics.executed) == (1, 1)
+
+
+def test_run_steps_matches_step():
+    stepped = create_runtime()
+    ran = create_runtime()
+    for runtime in [stepped, ran]:
+        runtime.trigger_event("start")
+
+    results = [stepped.step() for _ in range(2)]
+    statistics = ran.run_steps(2)
+    assert statistics.steps == len(results)
+    assert statistics.completed_branches == sum(result.completed_branch for result in results)
+    assert stepped.globals["invoked"] == ran.globals["invoked"]
+    assert [(branch.pc, branch.step, branch.lock) for branch in stepped.branches] == [(branch.pc, branch.step, branch.lock) for branch in ran.branches]
+
+
+def test_events_are_compared_by_value():
+    event = Event(event="go", parameters={"port": "A", "speed": 1})
+    assert event == Event(event="go", parameters={"speed": 1, "port": "A"})
+    assert hash(event) == hash(Event(event="go", parameters={"speed": 1, "port": "A"}))
+    assert event != Event(event="go", parameters={"port": "B", "speed": 1})
+    assert event != Event(event="stop", parameters={"port": "A", "speed": 1})
+
+
+def test_triggering_only_wakes_waiting_branches():
+    runtime = create_runtime()
+    root = runtime.program.instructions[0].block.statements["HANDLER"]
+    waits = {port: Event(event="go", parameters={"port": port}) for port in "AB"}
+    branches = {}
+    for port, event in waits.items():
+        for _ in range(2):
+            branch = runtime.add_branch(root)
+            branch.lock = event
+            branches.setdefault(port, []).append(branch)
+    released = []
+    runtime.register_wait_listener(lambda event, waiting: released.append(event) if not waiting else None)
+    assert runtime.run_steps(10).locked == 4
+
+    # Only the branches waiting for the triggered event are released
+    runtime.trigger_event("go", port="A")
+    assert released == [waits["A"]]
+    assert [branch.lock for branch in branches["A"]] == [None, None]
+    assert [branch.lock for branch in branches["B"]] == [waits["B"], waits["B"]]
+    # Branches are dataclasses, so compare them by identity
+    assert list(map(id, runtime.branches)) == list(map(id, branches["A"] + branches["B"]))
+
+    # Events without waiting branches release nothing
+    runtime.trigger_event("go", port="C")
+    assert released == [waits["A"]]
+
+
+def test_ready_branches_run_in_order():
+    runtime = create_runtime()
+    order = []
+    runtime.register_handler("noop", lambda runtime, block, branch: order.append(branch))
+    runtime.register_handler("wait", lambda runtime, block, branch: order.append(branch) or setattr(branch, "lock", Event(event="go", parameters={})))
+    root = runtime.program.instructions[0].block.statements["HANDLER"]
+    branches = [runtime.add_branch(root) for _ in range(3)]
+
+    # Each branch takes a step in turn, up to the wait
+    assert runtime.run_steps(6).executed == 6
+    assert list(map(id, order)) == list(map(id, branches + branches))
+    assert runtime.is_blocked
+
+    # Released branches keep their order, queued behind the ready ones
+    late = runtime.add_branch(root)
+    runtime.trigger_event("go")
+    assert list(map(id, runtime.branches)) == list(map(id, [late] + branches))
+    statistics = runtime.run_steps(100)
+    # The released branches step over the disabled block while the late one
+    # runs up to the wait
+    assert list(map(id, order[6:])) == list(map(id, [late, late] + branches))
+    assert statistics.completed_branches == 3
+
+
+def test_blocked_only_while_all_branches_wait_for_events():
+    runtime = create_runtime()
+    assert not runtime.is_blocked and not runtime.is_runnable
+
+    root = runtime.program.instructions[0].block.statements["HANDLER"]
+    branch = runtime.add_branch(root)
+    assert not runtime.is_blocked and runtime.is_runnable
+    assert runtime.run_steps(10).blocked
+    assert runtime.is_blocked and not runtime.is_runnable
+
+    # A sleeping branch wakes once the simulated time passes
+    sleeper = runtime.add_branch(root)
+    runtime.sleep(sleeper, 100)
+    runtime.run_steps(1)
+    assert not runtime.is_blocked and runtime.is_runnable
+
+    runtime.trigger_event("go")
+    assert branch.lock is None and not runtime.is_blocked
+
+
+def test_timers_expire_by_deadline_then_order():
+    runtime = create_runtime()
+    expired = []
+    for delay, name in [(300, "a"), (100, "b"), (100, "c"), (200, "d")]:
+        runtime.call_later(delay, lambda name=name: expired.append((name, runtime.time)))
+    assert runtime.next_deadline == 100
+
+    # Timers with the same deadline expire in the order they were set
+    runtime.advance_time(250)
+    assert expired == [("b", 100), ("c", 100), ("d", 200)]
+    assert runtime.time == 250
+    assert runtime.next_deadline == 300
+
+    runtime.advance_time(100)
+    assert expired[3:] == [("a", 300)]
+    assert runtime.time == 350
+    assert runtime.next_deadline is None
+
+
+def test_sleeping_branches_wake_once_their_timers_expire():
+    runtime = create_runtime()
+    root = runtime.program.instructions[0].block.statements["HANDLER"]
+    branch = runtime.add_branch(root)
+    runtime.sleep(branch, 1000)
+    # Callbacks set after a branch sleeps for the same duration run after it wakes
+    woken = []
+    runtime.call_later(1000, lambda: woken.append(branch.lock is None))
+    runtime.run_steps(1)
+
+    runtime.advance_time(999)
+    assert branch.lock is not None and woken == []
+    runtime.advance_time(1)
+    assert branch.lock is None and woken == [True]
+
+
+def test_run_steps_jumps_to_the_next_deadline():
+    runtime = create_runtime()
+    root = runtime.program.instructions[0].block.statements["HANDLER"]
+    runtime.sleep(runtime.add_branch(root), 5000)
+    # Nothing runs until the branch wakes, so the time jumps straight to it
+    statistics = runtime.run_steps(3)
+    assert (statistics.locked, statistics.executed) == (1, 2)
+    assert runtime.time == 5000
@@ -0,0 +1,65 @@
+import pytest
+
+from toolkit.ev3.simulation.scenarios import Scenario, ScenarioEvent, ScenarioRunner, run_scenario
+from tests.conftest import read_example
+
+
+CONFIG = {"sensors": {"1": "touch"}}
+
+
+def press(time: int, button: str) -> ScenarioEvent:
+    return ScenarioEvent(time=time, event="buttonEvent", parameters={"button": "brick.button{}".format(button), "event": "ButtonEvent.Pressed"})
+
+
+def test_events_are_injected_on_time(cache, monkeypatch):
+    simulator = cache.simulator(read_example("button-events.uf2"))
+    simulator.brick.configure(CONFIG)
+    simulator.start()
+    snapshot = simulator.snapshot()
+
+    triggered = []
+    trigger_event = simulator.runtime.trigger_event
+    monkeypatch.setattr(simulator.runtime, "trigger_event", lambda _event, **parameters: triggered.append((simulator.time, parameters["button"])) or trigger_event(_event, **parameters))
+    scenario = Scenario(
+        name="buttons",
+        # Events are sorted by time
+        events=[press(350000, "Up"), ScenarioEvent(time=250000, port="1", readings={"pressed": True}), press(150000, "Enter")],
+        duration=500000,
+        sample_period=100000
+    )
+    result = run_scenario(simulator, snapshot, scenario)
+
+    assert result.error is None
+    assert result.time == 500000
+    assert triggered == [(150000, "brick.buttonEnter"), (350000, "brick.buttonUp")]
+    assert result.console == "Enter pressed\nUp pressed\n"
+    # Samples are evenly spaced, including the start and the end
+    assert [sample["time"] for sample in result.trace] == [0, 100000, 200000, 300000, 400000, 500000]
+    assert [sample["sensors"]["1"].get("pressed") for sample in result.trace] == [None, None, None, True, True, True]
+
+
+def test_scenarios_restart_from_the_snapshot(cache):
+    simulator = cache.simulator(read_example("button-events.uf2"))
+    simulator.start()
+    snapshot = simulator.snapshot()
+    scenario = Scenario(name="enter", events=[press(0, "Enter")], duration=200000)
+    first = run_scenario(simulator, snapshot, scenario)
+    second = run_scenario(simulator, snapshot, scenario)
+    assert first.console == second.console == "Enter pressed\n"
+    assert (first.steps, first.time, first.trace) == (second.steps, second.time, second.trace)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_runner_returns_results_in_order(tmp_path, processes):
+    buttons = ["Enter", "Left", "Up", "Right", "Down"]
+    scenarios = [
+        Scenario(name=button, events=[press(100000 * (index + 1), button)], duration=600000, sample_period=200000)
+        for index, button in enumerate(buttons)
+    ]
+    runner = ScenarioRunner(read_example("button-events.uf2"), CONFIG, processes=processes, cache_directory=str(tmp_path / "cache"))
+    results = runner.run(scenarios)
+
+    assert [result.name for result in results] == buttons
+    assert [result.console for result in results] == ["{} pressed\n".format(button) for button in buttons]
+    assert all(result.error is None and result.time == 600000 for result in results)
+    assert all([sample["time"] for sample in result.trace] == [0, 200000, 400000, 600000] for result in results)
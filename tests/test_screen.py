@@ -0,0 +1,29 @@
+import random
+
+from toolkit.ev3.simulation.screen import Framebuffer, SCREEN_WIDTH, SCREEN_HEIGHT
+
+
+def test_blit_matches_drawing_pixels():
+    generator = random.Random(1)
+    for _ in range(100):
+        framebuffer = Framebuffer()
+        for _ in range(50):
+            framebuffer.set_pixel(generator.randrange(SCREEN_WIDTH), generator.randrange(SCREEN_HEIGHT))
+        expected = framebuffer.to_list()
+
+        width = generator.choice([8, 16, generator.randint(1, 40)])
+        height = generator.randint(1, 20)
+        stride = (width + 7) // 8
+        bitmap = bytes(generator.randrange(256) for _ in range(stride * height))
+        x = generator.choice([0, 8, generator.randint(-45, SCREEN_WIDTH + 10)])
+        y = generator.randint(-25, SCREEN_HEIGHT + 5)
+        transparent = generator.random() < 0.3
+        framebuffer.blit(bitmap, width, height, x, y, transparent)
+
+        # Draw the bitmap pixel by pixel, as the screen was drawn originally
+        for row in range(height):
+            for column in range(width):
+                if 0 <= x + column < SCREEN_WIDTH and 0 <= y + row < SCREEN_HEIGHT:
+                    bit = bool(bitmap[row * stride + column // 8] & (0x80 >> (column % 8)))
+                    expected[y + row][x + column] = (expected[y + row][x + column] or bit) if transparent else bit
+        assert framebuffer.to_list() == expected
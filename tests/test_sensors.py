@@ -0,0 +1,91 @@
+from toolkit.pxt.project import Project
+from toolkit.ev3.simulation.simulator import Simulator
+from toolkit.ev3.simulation.block.source import BlockSource
+from toolkit.ev3.simulation.runtime import Runtime, Event
+from toolkit.ev3.simulation.sensor_events import ThresholdIndex, SensorEvents, BELOW, ABOVE
+
+
+def create_simulator(blocks: str) -> Simulator:
+    """Create a started simulator running blocks on start."""
+    project = Project.from_sources({"name": "test"}, {}, {})
+    simulator = Simulator(project, BlockSource("""<xml xmlns="http://www.w3.org/1999/xhtml">
+      <block type="pxt-on-start"><statement name="HANDLER">{}</statement></block>
+    </xml>""".format(blocks)))
+    simulator.start()
+    return simulator
+
+
+def test_light_detected_event_releases_pause():
+    simulator = create_simulator("""<block type="colorPauseUntilLightDetected">
+      <field name="this">sensors.color3</field>
+      <field name="mode">LightIntensityMode.Reflected</field>
+      <field name="condition">Light.Dark</field>
+    </block>""")
+    assert simulator.run_steps(10).blocked
+
+    # Events are matched by all their parameters, including the condition
+    parameters = {"mode": "LightIntensityMode.Reflected", "sensor": "sensors.color3"}
+    simulator.runtime.trigger_event("colorOnLightDetected", condition="Light.Bright", **parameters)
+    assert simulator.run_steps(10).blocked
+    simulator.runtime.trigger_event("colorOnLightDetected", condition="Light.Dark", **parameters)
+    assert simulator.run_steps(10).completed_branches == 1
+
+
+def light_event(condition: str) -> Event:
+    return Event(event="colorOnLightDetected", parameters={"sensor": "sensors.color1", "mode": "LightIntensityMode.Reflected", "condition": condition})
+
+
+def test_threshold_crossings():
+    dark = light_event("Light.Dark")
+    bright = light_event("Light.Bright")
+    near = Event(event="near", parameters={})
+    index = ThresholdIndex()
+    index.add(20, BELOW, dark)
+    index.add(80, ABOVE, bright)
+    index.add(10, BELOW, near)
+
+    # Falling below thresholds, in the order of the thresholds
+    assert index.crossings(50, 15) == [dark]
+    assert index.crossings(50, 5) == [near, dark]
+    assert index.crossings(15, 50) == []
+    # Rising above thresholds
+    assert index.crossings(50, 90) == [bright]
+    assert index.crossings(90, 50) == []
+    # Readings at a threshold are neither below nor above it
+    assert index.crossings(50, 20) == []
+    assert index.crossings(20, 19) == [dark]
+    assert index.crossings(50, 80) == []
+    assert index.crossings(80, 81) == [bright]
+    # The first reading crosses every threshold it satisfies
+    assert index.crossings(None, 15) == [dark]
+    assert index.crossings(None, 90) == [bright]
+
+    index.remove(20, BELOW, dark)
+    assert index.crossings(50, 15) == []
+    assert len(index) == 2
+    index.remove(80, ABOVE, bright)
+    index.remove(10, BELOW, near)
+    assert len(index) == 0
+
+
+def test_sensor_events_are_dropped_once_no_longer_waited_for():
+    runtime = Runtime(BlockSource("""<xml xmlns="http://www.w3.org/1999/xhtml"><block type="noop"></block></xml>"""))
+    events = SensorEvents(runtime)
+    dark = light_event("Light.Dark")
+    bright = light_event("Light.Bright")
+    block = runtime.program.instructions[0].block
+
+    # Branches waiting for the same event index it once
+    for event in [dark, dark, bright]:
+        runtime.add_branch(block).lock = event
+    runtime.run_steps(10)
+    assert set(events.events) == {dark, bright}
+    assert events.detect("1", {"reflected": (50, 10)}) == [dark]
+
+    # A handler keeps the event indexed once its waiting branches are released
+    runtime.register_event_handler(bright.event, block, **bright.parameters)
+    runtime.trigger(dark)
+    runtime.trigger(bright)
+    assert events.events == [bright]
+    assert events.detect("1", {"reflected": (50, 10)}) == []
+    assert events.detect("1", {"reflected": (50, 90)}) == [bright]
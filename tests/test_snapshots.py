@@ -0,0 +1,56 @@
+import pickle
+
+from tests.conftest import read_example
+
+
+def test_restored_line_follower_matches_continuous_run(cache, line_follower, line_follower_config):
+    continuous = cache.simulator(line_follower)
+    continuous.brick.configure(line_follower_config)
+    continuous.start()
+    continuous.run_for(1000000, 100000)
+    # Snapshots are sent to other processes, so restore a pickled one
+    snapshot = pickle.loads(pickle.dumps(continuous.snapshot()))
+
+    # The world is shared rather than captured, so it is configured again
+    restored = cache.simulator(line_follower)
+    restored.brick.configure(line_follower_config)
+    restored.restore(snapshot)
+    assert restored.time == continuous.time
+    assert restored.brick.state_hash() == continuous.brick.state_hash()
+
+    for simulator in [continuous, restored]:
+        simulator.runtime.trigger_event("buttonEvent", button="brick.buttonEnter", event="ButtonEvent.Pressed")
+    for _ in range(3):
+        pose = continuous.brick.chassis.pose
+        assert restored.run_for(500000, 100000) == continuous.run_for(500000, 100000)
+        assert continuous.brick.chassis.pose != pose
+        assert restored.time == continuous.time
+        assert restored.brick.state_hash() == continuous.brick.state_hash()
+        assert restored.brick.chassis.pose == continuous.brick.chassis.pose
+
+
+def test_restored_button_events_match_continuous_run(cache, capsys):
+    data = read_example("button-events.uf2")
+    continuous = cache.simulator(data)
+    continuous.start()
+    continuous.runtime.trigger_event("buttonEvent", button="brick.buttonEnter", event="ButtonEvent.Pressed")
+    continuous.run_steps(100)
+    # Capture a branch which is ready but did not run yet
+    continuous.runtime.trigger_event("buttonEvent", button="brick.buttonLeft", event="ButtonEvent.Pressed")
+    snapshot = continuous.snapshot()
+    capsys.readouterr()
+
+    outputs = []
+    for simulator in [continuous, None]:
+        if simulator is None:
+            # Restoring need not start the simulator, as its handlers are restored
+            simulator = cache.simulator(data)
+            simulator.restore(snapshot)
+        statistics = [simulator.run_steps(100)]
+        simulator.runtime.trigger_event("buttonEvent", button="brick.buttonUp", event="ButtonEvent.Pressed")
+        simulator.runtime.trigger_event("buttonEvent", button="brick.buttonDown", event="ButtonEvent.Pressed")
+        statistics.append(simulator.run_steps(100))
+        outputs.append((statistics, capsys.readouterr().out))
+
+    assert outputs[0] == outputs[1]
+    assert outputs[0][1] == "Left pressed\nUp pressed\nDown pressed\n"
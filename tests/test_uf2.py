@@ -0,0 +1,120 @@
+import os
+import mmap
+import random
+from glob import glob
+from typing import Dict, Tuple
+
+import pytest
+
+from toolkit.uf2 import uf2
+from toolkit.uf2.uf2 import UF2
+from toolkit.uf2.block import Block, BLOCK_SIZE, block_struct, MAGIC_NUMBER_0, MAGIC_NUMBER_1, MAGIC_NUMBER_END, FILE_CONTAINER
+from tests.conftest import EXAMPLES_DIRECTORY, read_example
+
+
+ARCHIVES = [os.path.basename(path) for path in sorted(glob(os.path.join(EXAMPLES_DIRECTORY, "*.uf2")))] + ["synthetic"]
+
+
+def test_open_closes_mapping_of_invalid_archive(tmp_path, monkeypatch, line_follower):
+    mappings = []
+
+    class RecordingMemoryMap(mmap.mmap):
+        def __init__(self, *args, **kwargs) -> None:
+            mappings.append(self)
+
+    monkeypatch.setattr(uf2, "MemoryMap", RecordingMemoryMap)
+    data = bytearray(line_follower)
+    # Corrupt the first magic number of the fourth block
+    data[3 * BLOCK_SIZE] ^= 0xff
+    path = tmp_path / "invalid.uf2"
+    path.write_bytes(data)
+
+    with pytest.raises(Exception, match="magic number"):
+        UF2.open(str(path))
+    assert len(mappings) == 1
+    assert mappings[0].closed
+
+
+def create_archive(files: Dict[str, int]) -> bytes:
+    """Create an archive of files of the given sizes with numbered payloads, its blocks stored out of order."""
+    blocks = []
+    for filename, size in files.items():
+        for address in range(0, size, 256):
+            payload = bytes((address // 256 + i) % 256 for i in range(min(256, size - address)))
+            data = (payload + filename.encode() + b"\x00").ljust(476, b"\x00")
+            blocks.append((address, len(payload), size, data))
+    packed = [
+        block_struct.pack(MAGIC_NUMBER_0, MAGIC_NUMBER_1, FILE_CONTAINER, address, payload_size, number, len(blocks), size, data, MAGIC_NUMBER_END)
+        for number, (address, payload_size, size, data) in enumerate(blocks)
+    ]
+    random.Random(1).shuffle(packed)
+    return b"".join(packed)
+
+
+def load_archive(tmp_path, name: str) -> Tuple[bytes, str]:
+    """The bytes and path of an example archive, or of a synthetic one."""
+    if name != "synthetic":
+        return (read_example(name), os.path.join(EXAMPLES_DIRECTORY, name))
+    archive = create_archive({"Projects/a.elf": 4000, "Projects/b.rbf": 256, "Projects/c.txt": 10})
+    path = tmp_path / "synthetic.uf2"
+    path.write_bytes(archive)
+    return (archive, str(path))
+
+
+def open_archive(path: str, method: str) -> UF2:
+    if method == "parse":
+        with open(path, "rb") as file:
+            return UF2.parse(file.read())
+    return getattr(UF2, method)(path)
+
+
+def concatenate_payloads(archive: bytes) -> bytes:
+    """Extract the payloads of an archive by concatenating them in the order of their block numbers, as done originally."""
+    blocks = sorted((Block(archive[offset:offset + BLOCK_SIZE]) for offset in range(0, len(archive), BLOCK_SIZE)), key=lambda block: block.block_number)
+    return b"".join(block.data[:block.payload_size] for block in blocks)
+
+
+@pytest.mark.parametrize("method", ["parse", "read", "open"])
+@pytest.mark.parametrize("name", ARCHIVES)
+def test_assembly_matches_concatenation(tmp_path, method, name):
+    archive, path = load_archive(tmp_path, name)
+    with open_archive(path, method) as opened:
+        assert opened.extract_bytes() == concatenate_payloads(archive)
+        assert opened.extract_binary() == concatenate_payloads(archive)
+
+
+def write_payloads(archive: bytes) -> Dict[str, bytes]:
+    """Extract the files of an archive by writing each payload at its address in turn."""
+    files: Dict[str, bytearray] = {}
+    for offset in range(0, len(archive), BLOCK_SIZE):
+        block = Block(archive[offset:offset + BLOCK_SIZE])
+        file = files.setdefault(block.filename, bytearray(block.file_size))
+        file[block.target_address:block.target_address + block.payload_size] = block.data[:block.payload_size]
+    return files
+
+
+@pytest.mark.parametrize("method", ["parse", "read", "open"])
+@pytest.mark.parametrize("name", ARCHIVES)
+def test_reassembly_matches_writing_payloads(tmp_path, method, name):
+    archive, path = load_archive(tmp_path, name)
+    expected = write_payloads(archive)
+    with open_archive(path, method) as opened:
+        assert {filename: bytes(data) for filename, data in opened.extract_files().items()} == expected
+        assert {filename: bytes(data) for filename, data in opened.stream_files()} == expected
+        assert all(file.is_complete for file in opened.reassemble_files().values())
+
+
+def test_reassembly_tracks_missing_ranges():
+    archive = create_archive({"Projects/a.elf": 1000})
+    blocks = [archive[offset:offset + BLOCK_SIZE] for offset in range(0, len(archive), BLOCK_SIZE)]
+    # Drop the block holding bytes 256 to 512
+    missing = [block for block in blocks if Block(block).target_address == 256][0]
+    opened = UF2.parse(b"".join(block for block in blocks if block is not missing))
+
+    expected = write_payloads(archive)["Projects/a.elf"]
+    file = opened.reassemble_files()["Projects/a.elf"]
+    assert not file.is_complete
+    assert file.missing_ranges == [(256, 512)]
+    assert bytes(file.data) == expected[:256] + bytes(256) + expected[512:]
+    # Incomplete files are streamed last
+    assert [filename for filename, _ in opened.stream_files()] == ["Projects/a.elf"]
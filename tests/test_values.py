@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from toolkit.uf2.uf2 import UF2
+from toolkit.pxt.project import Project
+from toolkit.ev3.simulation.block.source import BlockSource
+from toolkit.ev3.simulation.brick import StatusLightPattern
+from toolkit.ev3.simulation.runtime import Runtime
+from toolkit.ev3.simulation.simulator import Simulator
+from toolkit.ev3.simulation.lib.utilities import get_all_handlers
+from tests.conftest import EXAMPLES_DIRECTORY
+
+
+SOURCE = """<xml xmlns="http://www.w3.org/1999/xhtml">
+  <variables><variable type="" id="delay">delay</variable></variables>
+  <block type="pxt-on-start">
+    <statement name="HANDLER">
+      <block type="device_pause">
+        <value name="pause">{}</value>
+      </block>
+    </statement>
+  </block>
+</xml>"""
+
+NUMBER_TYPES = {"math_number", "math_whole_number", "math_number_minmax", "motorSpeedPicker", "motorTurnRatioPicker", "timePicker"}
+
+
+def run(source: str) -> Runtime:
+    runtime = Runtime(BlockSource(source))
+    for call, handler in get_all_handlers().items():
+        runtime.register_handler(call, handler)
+    runtime.start()
+    runtime.trigger_event("pxt-on-start")
+    runtime.run_steps(10)
+    return runtime
+
+
+def test_constant_values_are_evaluated():
+    runtime = run(SOURCE.format('<shadow type="timePicker"><field name="ms">100</field></shadow>'))
+    assert runtime.time == 100000
+
+
+def test_unresolved_values_raise():
+    # Blocks such as variables are not folded into constants
+    with pytest.raises(Exception, match="Unimplemented value type 'variables_get'"):
+        run(SOURCE.format('<block type="variables_get"><field name="VAR" id="delay">delay</field></block>'))
+
+
+def test_constants_are_bound_when_compiled():
+    runtime = Runtime(BlockSource(SOURCE.format('<shadow type="timePicker"><field name="ms">100</field></shadow>')))
+    for call, handler in get_all_handlers().items():
+        runtime.register_handler(call, handler)
+    pause = [instruction for instruction in runtime.program.instructions if instruction.block.type == "device_pause"][0]
+    assert pause.handler.keywords == {"ms": 100}
+
+
+def test_decimal_numbers_are_folded_into_floats():
+    runtime = run(SOURCE.format('<shadow type="timePicker"><field name="ms">1.5</field></shadow>'))
+    assert runtime.time == 1500
+
+
+@pytest.mark.parametrize("name", ["example.uf2", "advanced-example.uf2", "line-follower.uf2"])
+def test_example_numbers_are_folded_into_integers(name):
+    with UF2.open(os.path.join(EXAMPLES_DIRECTORY, name)) as uf2:
+        source = BlockSource(Project(uf2).file_by_name("main.blocks"))
+    values = [value for instruction in Runtime(source).program.instructions for value in instruction.block.values.values()]
+    numbers = [value for value in values if value.shadow.type in NUMBER_TYPES]
+    assert len(numbers) > 0
+    assert all(type(value.constant) is int for value in numbers)
+
+
+@pytest.mark.parametrize("name", ["example.uf2", "advanced-example.uf2"])
+def test_example_lights_are_set_from_pattern_field(name):
+    # The examples define the pattern of the lights as a field rather than a value
+    with UF2.open(os.path.join(EXAMPLES_DIRECTORY, name)) as uf2:
+        simulator = Simulator(Project(uf2))
+    program = simulator.runtime.program
+    lights = [instruction for instruction in program.instructions if instruction.block.type == "setLights"]
+    assert len(lights) > 0
+    for instruction in lights:
+        instruction.handler(simulator.runtime, instruction.block, None)
+        assert simulator.runtime.globals["brick"].status_light_pattern == StatusLightPattern(instruction.block.fields["pattern"].value)
@@ -0,0 +1,120 @@
+import time
+import asyncio
+import itertools
+import threading
+import multiprocessing
+from typing import Any
+
+from toolkit.ev3.simulation.chassis import ChassisPoses
+from toolkit.ev3.simulation.workers import Worker, Session, StepBudget, Request, serve
+
+
+def test_worker_stops_after_its_loop_closed(tmp_path, monkeypatch, line_follower):
+    exceptions = []
+    monkeypatch.setattr(threading, "excepthook", exceptions.append)
+
+    loop = asyncio.new_event_loop()
+    worker = Worker(0, str(tmp_path / "cache"))
+    worker.start(loop)
+    assert loop.run_until_complete(worker.request("session", "create", data=line_follower))
+    # The reader still receives the end of the pipe once the loop closed
+    loop.close()
+    worker.stop()
+
+    for thread in threading.enumerate():
+        if thread.name == "simulation-worker-0-reader":
+            thread.join(5)
+    assert exceptions == []
+
+
+def test_charged_steps_delay_taking_steps():
+    now = [0.0]
+    budget = StepBudget(1000, 500, clock=lambda: now[0])
+    budget.charge(800)
+    assert budget.take(100) == 0
+    assert budget.wait_time(100) == 0.4
+    # The debt is bounded by the burst
+    budget.charge(10000)
+    assert budget.available == -500
+    now[0] = 1.0
+    assert budget.take(1000) == 500
+
+
+def test_frames_report_steps_run_autonomously(cache, line_follower, line_follower_config):
+    session = Session(cache.simulator(line_follower))
+    session.start(line_follower_config)
+    session.run(pacing="max", frame_rate=60, window=1)
+
+    frames = []
+    for _ in range(20):
+        session.tick()
+        time.sleep(1 / 60)
+        frames.append(session.take_frame("session"))
+
+    assert frames[0].diff is not None and frames[0].steps > 0
+    # Frames still report steps while the client falls behind, if any ran
+    reported = [frame for frame in frames[1:] if frame is not None]
+    assert reported
+    assert all(frame.diff is None and frame.steps > 0 for frame in reported)
+
+
+def test_sessions_sharing_poses_only_move_once_updated(cache, line_follower, line_follower_config):
+    poses = ChassisPoses()
+    first, second = (Session(cache.simulator(line_follower, poses)) for _ in range(2))
+    for session in (first, second):
+        session.start(line_follower_config)
+        session.begin_steps(100, diff=False)
+    while first.is_stepping or second.is_stepping:
+        stepping = [session for session in (first, second) if session.is_stepping]
+        for session in stepping:
+            session.run_steps()
+        poses.update()
+        for session in stepping:
+            session.sync()
+            session.take_steps_result()
+    second_pose = second.simulator.brick.chassis.pose
+    # Both robots are found in the shared poses
+    assert first.simulator.brick.poses.pose(second.simulator.brick.chassis.index) == second_pose
+
+    first_pose = first.simulator.brick.chassis.pose
+    first.begin_steps(100, diff=False)
+    first.run_steps()
+    # The robot stopped once it moved, and only moves once the poses are updated
+    assert first.simulator.brick.is_moved
+    assert first.take_steps_result() is None
+    assert first.simulator.brick.chassis.pose == first_pose
+    poses.update()
+    first.sync()
+    assert first.simulator.brick.chassis.pose != first_pose
+    assert second.simulator.brick.chassis.pose == second_pose
+
+
+def test_step_requests_span_rounds(tmp_path, line_follower, line_follower_config):
+    connection, worker_connection = multiprocessing.Pipe()
+    worker = threading.Thread(target=serve, args=(worker_connection, str(tmp_path / "cache")), daemon=True)
+    worker.start()
+    ids = itertools.count()
+
+    def request(session: str, command: str, **arguments: Any) -> Any:
+        request = Request(next(ids), session, command, arguments)
+        connection.send(request)
+        reply = connection.recv()
+        assert reply.id == request.id and reply.error is None
+        return reply.result
+
+    for session in ("first", "second"):
+        request(session, "create", data=line_follower)
+        request(session, "start", config=line_follower_config)
+    request("second", "step", count=500, diff=False)
+    second = request("second", "diff")["chassis"]
+
+    result = request("first", "step", count=2000)
+    assert result["steps"] > 0
+    assert result["diff"]["chassis"] != second
+    # Stepping one session does not move the robots of the others
+    assert "chassis" not in request("second", "diff")
+
+    request("first", "close")
+    request("second", "close")
+    connection.send(None)
+    worker.join(5)
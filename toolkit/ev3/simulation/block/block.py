@@ -1,4 +1,4 @@
-from typing import TypedDict, Optional, Dict
+from typing import TypedDict, Optional, Dict, Any
 from dataclasses import dataclass
 
 @dataclass
@@ -23,6 +23,10 @@ class BlockShadow():
 class BlockValue():
     name: str
     shadow: BlockShadow
+    # The value of the shadow, folded into a typed constant when parsed
+    constant: Any = None
+    # Whether or not the shadow's type is known and could be folded
+    resolved: bool = False
 
 # TODO: Needs more test cases to verify implementation
 @dataclass
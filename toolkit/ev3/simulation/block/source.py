@@ -1,14 +1,49 @@
+import logging
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element
-from typing import Dict, Iterator, List
+from typing import Dict, Iterator, List, Tuple, Callable, Any, Union
 
 from toolkit.ev3.simulation.block.block import Block, BlockField, BlockShadow, BlockValue, BlockVariableDefinition
 
+log = logging.getLogger(__name__)
+
+
+def parse_number(text: str) -> Union[int, float]:
+    """Parse a number as an integer if possible, otherwise as a float."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_boolean(text: str) -> bool:
+    """Parse a boolean such as "TRUE" or "false"."""
+    return text.lower() == "true"
+
+
+# The field holding the value of each type of shadow and how to parse it
+constant_fields: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    "math_number": ("NUM", parse_number),
+    "math_whole_number": ("NUM", parse_number),
+    "math_number_minmax": ("SLIDER", parse_number),
+    "motorSpeedPicker": ("speed", parse_number),
+    "motorTurnRatioPicker": ("turnratio", parse_number),
+    "timePicker": ("ms", parse_number),
+    "text": ("TEXT", str),
+    "colorEnumPicker": ("color", str),
+    "screen_image_picker": ("image", str),
+    "mood_image_picker": ("mood", str),
+    "logic_boolean": ("BOOL", parse_boolean),
+    "toggleOnOff": ("on", parse_boolean),
+}
+
 class BlockSource:
     """Abstraction for a block source, such as the main.block XML file."""
     def __init__(self, source: str) -> None:
         self.__variables: Dict[str, BlockVariableDefinition] = {}
         self.__blocks: List[Block] = []
+        # Number of parsed blocks, used to give each block a unique id
+        self.__block_count = 0
 
         ElementTree.register_namespace("", "http://www.w3.org/1999/xhtml")
         root = ElementTree.fromstring(source)
@@ -59,11 +94,13 @@ class BlockSource:
                     name=child.attrib["name"],
                     shadow=block_shadow
                 )
+                self.__fold_constant(value)
                 values[value.name] = value
             elif self.__clean_tag_name(child) == "next":
                 next = self.__parse_block(child[0])
+        self.__block_count += 1
         return Block(
-            id=len(self.__blocks),
+            id=self.__block_count - 1,
             statements=statements,
             fields=fields,
             values=values,
@@ -74,6 +111,28 @@ class BlockSource:
             disabled=element.attrib["disabled"] if "disabled" in element.attrib else False
         )
 
+    def __fold_constant(self, value: BlockValue) -> None:
+        """Resolve the value of a shadow into a typed constant, once."""
+        if value.shadow.type not in constant_fields:
+            log.warning("Unable to fold value '{}' of unknown type '{}' into a constant".format(value.name, value.shadow.type))
+            return
+
+        field_name, parse = constant_fields[value.shadow.type]
+        if field_name not in value.shadow.fields:
+            log.debug("Unable to fold value of type '{}' without field '{}'".format(value.shadow.type, field_name))
+            return
+
+        text = value.shadow.fields[field_name].value
+        # Empty text fields have no text at all
+        if text is None and parse is str:
+            text = ""
+
+        try:
+            value.constant = parse(text)
+            value.resolved = True
+        except (TypeError, ValueError):
+            log.debug("Unable to fold value '{}' of type '{}'".format(text, value.shadow.type))
+
     def __clean_tag_name(self, element: Element) -> str:
         if "{http://www.w3.org/1999/xhtml}" in element.tag:
             return element.tag[len("{http://www.w3.org/1999/xhtml}"):]
@@ -1,59 +1,340 @@
 import json
+import math
+import hashlib
+import logging
 from enum import Enum
-from typing import Dict, Optional, List, Any, Union
+from functools import partial
+from dataclasses import dataclass
+from typing import Dict, Optional, Any, Union, Callable, Tuple
 
 from toolkit.ev3.simulation.runtime import Runtime
+from toolkit.ev3.simulation.chassis import Chassis, ChassisPoses
+from toolkit.ev3.simulation.world import World
+from toolkit.ev3.simulation.screen import Framebuffer, SCREEN_WIDTH, SCREEN_HEIGHT, LINE_HEIGHT
+from toolkit.ev3.simulation.images import Bitmap
+from toolkit.ev3.simulation.changes import ChangeTracker
+from toolkit.ev3.simulation.sensor_events import SensorEvents, LIGHT_DARK_THRESHOLD, LIGHT_BRIGHT_THRESHOLD, ULTRASONIC_NEAR_THRESHOLD, ULTRASONIC_FAR_THRESHOLD
+
+
+log = logging.getLogger(__name__)
+
+
+# Period of the physics updates in microseconds
+PHYSICS_PERIOD = 5000
+
+# Maximum angular velocity in degrees per second at full speed, per motor type
+MOTOR_MAX_VELOCITY = {
+    "large": 1050.0,
+    "medium": 1560.0
+}
+# Angular acceleration in degrees per second squared when driven
+MOTOR_ACCELERATION = {
+    "large": 6000.0,
+    "medium": 12000.0
+}
+# Angular deceleration in degrees per second squared when braking or coasting
+MOTOR_BRAKE_DECELERATION = 40000.0
+MOTOR_COAST_DECELERATION = 3000.0
+
+
+class MoveUnit(str, Enum):
+    ROTATIONS = "MoveUnit.Rotations"
+    DEGREES = "MoveUnit.Degrees"
+    SECONDS = "MoveUnit.Seconds"
+    MILLISECONDS = "MoveUnit.MilliSeconds"
 
 
 class Motor:
     def __init__(self, type: str) -> None:
         self.__type = type
+        # Speed in percent, as set by the program
         self.__speed = 0
-        self.__angle = 0
-        self.__count = 0
+        # Angular velocity in degrees per second
+        self.__velocity = 0.0
+        self.__angle = 0.0
+        self.__count = 0.0
+        # Total rotation in degrees, unaffected by resets
+        self.__position = 0.0
+        self.__brake = False
+        # The remaining degrees or microseconds of the current schedule
+        self.__schedule_unit: Optional[MoveUnit] = None
+        self.__schedule_remaining = 0.0
+        # Whether or not a schedule ended since the last update
+        self.__schedule_ended = False
+        # Invoked whenever the motor is commanded, such as to start physics updates
+        self.__on_change: Optional[Callable[[], None]] = None
+
+        self.__max_velocity = MOTOR_MAX_VELOCITY.get(type, MOTOR_MAX_VELOCITY["large"])
+        self.__acceleration = MOTOR_ACCELERATION.get(type, MOTOR_ACCELERATION["large"])
 
     @property
     def type(self) -> str:
         """Motor type."""
         return self.__type
 
+    @property
+    def speed(self) -> int:
+        """Speed in percent."""
+        return self.__speed
+
+    @property
+    def velocity(self) -> float:
+        """Angular velocity in degrees per second."""
+        return self.__velocity
+
+    @property
+    def angle(self) -> int:
+        """Angle in degrees."""
+        return int(self.__angle)
+
+    @property
+    def count(self) -> int:
+        """Tacho count in degrees."""
+        return int(self.__count)
+
+    @property
+    def position(self) -> float:
+        """Total rotation in degrees, unaffected by resets."""
+        return self.__position
+
+    @property
+    def brake(self) -> bool:
+        """Whether or not the motor brakes when stopped, rather than coasting."""
+        return self.__brake
+
+    @property
+    def is_scheduled(self) -> bool:
+        """Whether or not the motor runs a schedule."""
+        return self.__schedule_unit is not None
+
+    @property
+    def is_busy(self) -> bool:
+        """Whether or not the motor runs a schedule, or one ended without being reported yet."""
+        return self.__schedule_unit is not None or self.__schedule_ended
+
+    @property
+    def is_active(self) -> bool:
+        """Whether or not the motor is moving or about to."""
+        return self.__speed != 0 or self.__velocity != 0.0 or self.__schedule_ended
+
     def to_dict(self) -> Dict[str, Union[str, int, bool, None]]:
         return {
             "type": self.__type,
             "speed": self.__speed,
-            "angle": self.__angle,
-            "count": self.__count
+            "angle": self.angle,
+            "count": self.count,
+            "brake": self.__brake
         }
 
+    def snapshot(self) -> Tuple[Any, ...]:
+        """Capture the state of the motor as a tuple."""
+        return (
+            self.__type, self.__speed, self.__velocity, self.__angle, self.__count, self.__position, self.__brake,
+            None if self.__schedule_unit is None else self.__schedule_unit.value, self.__schedule_remaining, self.__schedule_ended
+        )
+
+    @staticmethod
+    def from_snapshot(state: Tuple[Any, ...]) -> "Motor":
+        """Create a motor from the state captured by snapshot."""
+        type, speed, velocity, angle, count, position, brake, unit, remaining, ended = state
+        motor = Motor(type)
+        motor.__speed = speed
+        motor.__velocity = velocity
+        motor.__angle = angle
+        motor.__count = count
+        motor.__position = position
+        motor.__brake = brake
+        motor.__schedule_unit = None if unit is None else MoveUnit(unit)
+        motor.__schedule_remaining = remaining
+        motor.__schedule_ended = ended
+        return motor
+
+    def attach(self, on_change: Optional[Callable[[], None]]) -> None:
+        """Set the callback invoked whenever the motor is commanded."""
+        self.__on_change = on_change
+
     def set_speed(self, speed: int) -> None:
         """Set speed."""
+        self.__cancel_schedule()
         self.__speed = speed
+        self.__changed()
+
+    def set_schedule(self, unit: str, speed: int, value: float) -> None:
+        """Run at a speed for a number of rotations, degrees, seconds or milliseconds, then stop."""
+        self.__cancel_schedule()
+        unit = MoveUnit(unit)
+        if unit == MoveUnit.ROTATIONS:
+            remaining = abs(value) * 360.0
+        elif unit == MoveUnit.DEGREES:
+            remaining = float(abs(value))
+        elif unit == MoveUnit.SECONDS:
+            remaining = abs(value) * 1000000.0
+        else:
+            remaining = abs(value) * 1000.0
 
-    def set_schedule(self, unit, speed, value) -> None:
-        """??"""
+        # Negative values run the motor backwards
+        self.__speed = -speed if value < 0 else speed
+        if remaining > 0 and self.__speed != 0:
+            self.__schedule_unit = unit
+            self.__schedule_remaining = remaining
+        else:
+            self.__speed = 0
+        self.__changed()
 
     def stop(self) -> None:
         """Stop the motor."""
+        self.__cancel_schedule()
         self.__speed = 0
+        self.__changed()
 
     def reset(self) -> None:
         """Reset the motor."""
-        self.__angle = 0
+        self.__cancel_schedule()
+        self.__speed = 0
+        self.__velocity = 0.0
+        self.__angle = 0.0
+        self.__count = 0.0
+        self.__changed()
 
     def clear_count(self) -> None:
         """Clear the count."""
-        self.__count = 0
+        self.__count = 0.0
 
-    def set_brake_mode(self, mode: str) -> None:
+    def set_brake_mode(self, mode: bool) -> None:
         """Set brake mode."""
-        # TODO: Implement
+        self.__brake = bool(mode)
+
+    def update(self, duration: float) -> bool:
+        """Integrate the motor's motion over a duration in seconds, returning whether or not a schedule ended."""
+        target = self.__speed * self.__max_velocity / 100
+        velocity = self.__velocity
+        if velocity != target:
+            if self.__speed != 0:
+                rate = self.__acceleration
+            elif self.__brake:
+                rate = MOTOR_BRAKE_DECELERATION
+            else:
+                rate = MOTOR_COAST_DECELERATION
+            change = max(-rate * duration, min(rate * duration, target - velocity))
+            self.__velocity = velocity + change
+            # Trapezoidal integration of the ramp
+            delta = (velocity + self.__velocity) / 2 * duration
+        else:
+            delta = velocity * duration
+        self.__angle += delta
+        self.__count += delta
+        self.__position += delta
+
+        unit = self.__schedule_unit
+        if unit is not None:
+            if unit == MoveUnit.ROTATIONS or unit == MoveUnit.DEGREES:
+                self.__schedule_remaining -= abs(delta)
+            else:
+                self.__schedule_remaining -= duration * 1000000
+            if self.__schedule_remaining <= 0:
+                self.__cancel_schedule()
+                self.__speed = 0
+
+        ended = self.__schedule_ended
+        self.__schedule_ended = False
+        return ended
+
+    def __cancel_schedule(self) -> None:
+        if self.__schedule_unit is not None:
+            self.__schedule_unit = None
+            self.__schedule_remaining = 0.0
+            self.__schedule_ended = True
+
+    def __changed(self) -> None:
+        if self.__on_change is not None:
+            self.__on_change()
+
+# Maximum distance in centimeters measured by the ultrasonic sensor
+ULTRASONIC_MAX_DISTANCE = 255
+# Radius in millimeters of the touch sensor's bumper
+TOUCH_RADIUS = 10.0
+
+# Mounting of the sensors relative to the center of the chassis, as the
+# distance forwards and to the left in millimeters and the angle in degrees
+SENSOR_MOUNTS = {
+    "color": (60.0, 0.0, 0.0),
+    "ultrasonic": (70.0, 0.0, 0.0),
+    "touch": (90.0, 0.0, 0.0)
+}
+
 
 class Sensor:
-    def __init__(self, type: str) -> None:
-        pass
+    def __init__(self, type: str, mount: Tuple[float, float, float] = None) -> None:
+        self.__type = type
+        self.__mount = SENSOR_MOUNTS.get(type, (0.0, 0.0, 0.0)) if mount is None else mount
+        # The latest readings by name
+        self.__values: Dict[str, Union[str, int, bool, None]] = {}
+
+    @property
+    def type(self) -> str:
+        """Sensor type."""
+        return self.__type
+
+    @property
+    def mount(self) -> Tuple[float, float, float]:
+        """The distance forwards and to the left of the chassis' center in millimeters and the angle in degrees."""
+        return self.__mount
+
+    @property
+    def values(self) -> Dict[str, Union[str, int, bool, None]]:
+        """The latest readings by name."""
+        return self.__values
+
+    @property
+    def light_condition(self) -> Optional[str]:
+        """The detected reflected light condition, if either dark or bright."""
+        reflected = self.__values.get("reflected")
+        if reflected is None:
+            return None
+        if reflected < LIGHT_DARK_THRESHOLD:
+            return "Light.Dark"
+        if reflected > LIGHT_BRIGHT_THRESHOLD:
+            return "Light.Bright"
+        return None
+
+    @property
+    def proximity(self) -> Optional[str]:
+        """The detected ultrasonic event, if an object is either near or far."""
+        distance = self.__values.get("distance")
+        if distance is None:
+            return None
+        if distance < ULTRASONIC_NEAR_THRESHOLD:
+            return "UltrasonicSensorEvent.ObjectNear"
+        if distance > ULTRASONIC_FAR_THRESHOLD:
+            return "UltrasonicSensorEvent.ObjectFar"
+        return None
 
     def to_dict(self) -> Dict[str, Union[str, int, bool, None]]:
-        return {}
+        data: Dict[str, Union[str, int, bool, None]] = {"type": self.__type}
+        data.update(self.__values)
+        return data
+
+    def snapshot(self) -> Tuple[Any, ...]:
+        """Capture the type, mount and readings of the sensor as a tuple."""
+        return (self.__type, self.__mount, dict(self.__values))
+
+    @staticmethod
+    def from_snapshot(state: Tuple[Any, ...]) -> "Sensor":
+        """Create a sensor from the state captured by snapshot."""
+        type, mount, values = state
+        sensor = Sensor(type, mount)
+        sensor.__values.update(values)
+        return sensor
+
+    def update(self, values: Dict[str, Union[str, int, bool, None]]) -> Dict[str, Tuple[Any, Any]]:
+        """Update the readings, returning the old and new value of each changed reading."""
+        changes = {}
+        for name, value in values.items():
+            old = self.__values.get(name)
+            if old != value or name not in self.__values:
+                changes[name] = (old, value)
+                self.__values[name] = value
+        return changes
 
 class StatusLightPattern(str, Enum):
     ORANGE = "StatusLight.Orange"
@@ -67,9 +348,28 @@ class StatusLightPattern(str, Enum):
     RED_PULSE = "StatusLight.RedPulse"
     ORANGE_PULSE = "StatusLight.OrangePulse"
 
+@dataclass(frozen=True)
+class BrickSnapshot:
+    """The state of a brick, leaving out its world which is shared rather than copied."""
+    # States of the connected motors and sensors by port, as captured by them
+    motors: Dict[str, Optional[Tuple[Any, ...]]]
+    sensors: Dict[str, Optional[Tuple[Any, ...]]]
+    status_light_pattern: str
+    # Packed pixels of the screen
+    screen: bytes
+    # Ports of the left and right motor and the pose of the chassis, if any
+    chassis: Optional[Tuple[str, str, float, float, float]]
+    ticking: bool
+    busy: bool
+
+
 class Brick:
-    def __init__(self, runtime: Runtime) -> None:
+    def __init__(self, runtime: Runtime, poses: ChassisPoses = None) -> None:
         self.__runtime = runtime
+        # Poses shared with other robots, such as by a server updating the
+        # robots of its sessions at once, or None for the chassis to update
+        # its own pose
+        self.__poses = poses
 
         self.__motors: Dict[str, Optional[Motor]] = {
             "A": None,
@@ -85,12 +385,36 @@ class Brick:
             "4": None
         }
 
-        self.__screen_width = 178
-        self.__screen_height = 128
-        self.__screen = [[False for x in range(self.__screen_width)] for y in range(self.__screen_height)]
+        # Versions of the brick's components, to only send changes to clients
+        self.__tracker = ChangeTracker()
+        self.__motor_components = {port: "motors.{}".format(port) for port in self.__motors}
+        self.__screen = Framebuffer(SCREEN_WIDTH, SCREEN_HEIGHT, self.__tracker)
+        # Callbacks of the motors of each port once commanded
+        self.__motor_callbacks = {port: partial(self.__on_motor_change, port) for port in self.__motors}
+        for port in self.__motors:
+            self.__tracker.mark("motors.{}".format(port))
+        for port in self.__sensors:
+            self.__tracker.mark("sensors.{}".format(port))
+        self.__tracker.mark("statusLightPattern")
+        self.__tracker.mark("chassis")
 
         self.__status_light_pattern = StatusLightPattern.OFF
 
+        # The chassis driven by a pair of motors, if any, and whether or not
+        # it moved since the shared poses were last updated
+        self.__chassis: Optional[Chassis] = None
+        self.__moved = False
+        # The world the chassis moves in, if any
+        self.__world: Optional[World] = None
+        # Sensor events waited for, triggered as readings cross their conditions
+        self.__sensor_events = SensorEvents(runtime)
+
+        # Whether or not a physics update is scheduled
+        self.__ticking = False
+        runtime.register_callback("brick.tick", self.__tick)
+        # Whether or not the brick holds a runtime activity for busy motors
+        self.__busy = False
+
     @property
     def motors(self) -> Dict[str, Optional[Motor]]:
         return self.__motors
@@ -100,21 +424,172 @@ class Brick:
         return self.__sensors
 
     @property
-    def screen(self) -> List[List[bool]]:
+    def screen(self) -> Framebuffer:
         return self.__screen
 
     @property
     def status_light_pattern(self) -> StatusLightPattern:
         return self.__status_light_pattern
 
+    @property
+    def chassis(self) -> Optional[Chassis]:
+        return self.__chassis
+
+    @property
+    def world(self) -> Optional[World]:
+        return self.__world
+
+    @property
+    def poses(self) -> Optional[ChassisPoses]:
+        """The poses shared with other robots, if any, which their owner updates before calling sense_moved."""
+        return self.__poses
+
+    @property
+    def is_moved(self) -> bool:
+        """Whether or not the chassis moved since the shared poses were last updated."""
+        return self.__moved
+
+    def set_chassis(self, chassis: Optional[Chassis]) -> None:
+        """Set the chassis driven by a pair of motors, such as one whose pose is updated along with other robots."""
+        self.__release_chassis()
+        self.__chassis = chassis
+        self.__tracker.mark("chassis")
+        self.sense()
+        self.__update_busy()
+
+    def set_world(self, world: Optional[World]) -> None:
+        """Set the world the chassis moves in, placing the chassis at the world's start."""
+        self.__world = world
+        if world is not None and self.__chassis is not None:
+            self.__chassis.poses.set_pose(self.__chassis.index, *world.start)
+            self.__tracker.mark("chassis")
+        self.sense()
+        self.__update_busy()
+
+    def pair_motors(self, left_port: str, right_port: str) -> Chassis:
+        """Ensure that a chassis is driven by a pair of motors, creating one with the default geometry if needed."""
+        chassis = self.__chassis
+        if chassis is None or chassis.left_port != left_port or chassis.right_port != right_port:
+            log.debug("Pairing motors '{}' and '{}' as a chassis".format(left_port, right_port))
+            self.__release_chassis()
+            chassis = Chassis(left_port, right_port, self.__poses)
+            if self.__world is not None:
+                chassis.poses.set_pose(chassis.index, *self.__world.start)
+            self.__chassis = chassis
+            self.__tracker.mark("chassis")
+            self.sense()
+            self.__update_busy()
+        return chassis
+
+    @property
+    def version(self) -> int:
+        """The version of the brick's state, increasing with every change."""
+        return self.__tracker.version
+
+    def connect_motor(self, port: str, motor: Optional[Motor]) -> None:
+        """Connect a motor to a port, or disconnect it."""
+        if port not in self.__motors:
+            raise Exception("No such motor port '{}'".format(port))
+        self.__motors[port] = motor
+        self.__tracker.mark("motors.{}".format(port))
+        self.__update_busy()
+
+    def connect_sensor(self, port: str, sensor: Optional[Sensor]) -> None:
+        """Connect a sensor to a port, or disconnect it."""
+        if port not in self.__sensors:
+            raise Exception("No such sensor port '{}'".format(port))
+        self.__sensors[port] = sensor
+        self.__tracker.mark("sensors.{}".format(port))
+        self.sense()
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        """Connect the motors and sensors of a config, such as one sent by a client, and set its world if any."""
+        for port, type in config.get("motors", {}).items():
+            self.connect_motor(port, Motor(type))
+        for port, type in config.get("sensors", {}).items():
+            self.connect_sensor(port, Sensor(type))
+        # An optional world lets the sensors read the surroundings of the robot
+        if config.get("world") is not None:
+            self.set_world(World.from_dict(config["world"]))
+
+    def diff_since(self, version: int) -> Dict[str, Any]:
+        """The components of the brick's state which changed after a version, along with the current version."""
+        diff: Dict[str, Any] = {"version": self.__tracker.version}
+        for component in self.__tracker.changed_since(version):
+            if component == "statusLightPattern":
+                diff["statusLightPattern"] = self.__status_light_pattern
+            elif component == "chassis":
+                diff["chassis"] = None if self.__chassis is None else self.__chassis.to_dict()
+            elif component == "screen":
+                diff["screen"] = dict(self.__screen.rows_since(version))
+            else:
+                kind, port = component.split(".")
+                item = (self.__motors if kind == "motors" else self.__sensors)[port]
+                diff.setdefault(kind, {})[port] = None if item is None else item.to_dict()
+        return diff
+
     def to_dict(self) -> str:
         data = {
             "statusLightPattern": self.__status_light_pattern,
             "motors": {port: (None if motor is None else motor.to_dict()) for port, motor in self.__motors.items()},
             "sensors": {port: (None if sensor is None else sensor.to_dict()) for port, sensor in self.__sensors.items()},
+            "chassis": None if self.__chassis is None else self.__chassis.to_dict(),
         }
         return data
 
+    def snapshot(self) -> BrickSnapshot:
+        """Capture the state of the brick."""
+        chassis = self.__chassis
+        return BrickSnapshot(
+            motors={port: (None if motor is None else motor.snapshot()) for port, motor in self.__motors.items()},
+            sensors={port: (None if sensor is None else sensor.snapshot()) for port, sensor in self.__sensors.items()},
+            status_light_pattern=self.__status_light_pattern.value,
+            screen=bytes(self.__screen.buffer),
+            chassis=None if chassis is None else (chassis.left_port, chassis.right_port) + chassis.pose,
+            ticking=self.__ticking,
+            busy=self.__busy
+        )
+
+    def state_hash(self) -> bytes:
+        """A hash of the state of the motors, sensors, status light, screen and chassis, such as to verify replays."""
+        snapshot = self.snapshot()
+        digest = hashlib.blake2b(digest_size=8)
+        # Floats are represented exactly, so equal states have equal hashes
+        digest.update(repr((snapshot.motors, snapshot.sensors, snapshot.status_light_pattern, snapshot.chassis)).encode())
+        digest.update(snapshot.screen)
+        return digest.digest()
+
+    def restore(self, snapshot: BrickSnapshot) -> None:
+        """Restore the state of a snapshot along with the runtime's, marking every component as changed."""
+        for port, state in snapshot.motors.items():
+            self.__motors[port] = None if state is None else Motor.from_snapshot(state)
+            self.__tracker.mark("motors.{}".format(port))
+        for port, state in snapshot.sensors.items():
+            self.__sensors[port] = None if state is None else Sensor.from_snapshot(state)
+            self.__tracker.mark("sensors.{}".format(port))
+        self.__status_light_pattern = StatusLightPattern(snapshot.status_light_pattern)
+        self.__tracker.mark("statusLightPattern")
+        self.__screen.load(snapshot.screen)
+
+        if snapshot.chassis is None:
+            self.__release_chassis()
+            self.__chassis = None
+        else:
+            left_port, right_port, x, y, heading = snapshot.chassis
+            chassis = self.__chassis
+            if chassis is None or chassis.left_port != left_port or chassis.right_port != right_port:
+                self.__release_chassis()
+                chassis = Chassis(left_port, right_port, self.__poses)
+                self.__chassis = chassis
+            chassis.poses.set_pose(chassis.index, x, y, heading)
+        self.__moved = False
+        self.__tracker.mark("chassis")
+
+        # The physics timer and activity are restored along with the runtime
+        self.__ticking = snapshot.ticking
+        self.__busy = snapshot.busy
+        self.__sensor_events.reset()
+
     def press_backspace(self) -> None:
         """Press the backspace key."""
         self.__runtime.trigger_event("buttonEvent", button="brick.buttonEnter", event="ButtonEvent.Pressed")
@@ -146,26 +621,176 @@ class Brick:
         self.__runtime.trigger_event("buttonEvent", button="brick.buttonDown", event="ButtonEvent.Released")
 
     def print(self, text: str, line: int=None) -> None:
-        """Print a string."""
+        """Print a string on a line, counting from 1."""
         line = 0 if line is None else line
-        # TODO: implement
+        self.__screen.text(str(text), 0, max(line - 1, 0) * LINE_HEIGHT)
+
+    def show_image(self, bitmap: Bitmap, x: int=0, y: int=0) -> None:
+        """Clear the screen and show an image."""
+        self.__screen.clear()
+        self.__screen.blit(bitmap.data, bitmap.width, bitmap.height, x, y)
 
     def clear_screen(self, line: int=None) -> None:
-        """Clear the screen."""
+        """Clear the screen or a line, counting from 1."""
         if line is None:
-            self.__screen = [[False for x in range(self.__screen_width)] for y in range(self.__screen_height)]
+            self.__screen.clear()
         else:
-            self.__screen[line] = [False for x in range(self.__screen_width)]
+            self.__screen.clear(max(line - 1, 0) * LINE_HEIGHT, LINE_HEIGHT)
 
     def set_status_light_pattern(self, pattern: StatusLightPattern) -> None:
         self.__status_light_pattern = pattern
+        self.__tracker.mark("statusLightPattern")
 
-    def get_motor(self, port: str, type: str=None) -> None:
+    def get_motor(self, port: str, type: str=None) -> Motor:
         """Ensure that a motor is connected."""
         if port not in self.__motors:
             raise Exception("No such motor port '{}'".format(port))
-        if self.__motors[port] is None:
+        motor = self.__motors[port]
+        if motor is None:
             raise Exception("No motor connected to port '{}'".format(port))
-        if type is not None and type != self.__motors[port].type:
-            raise Exception("Port mismatch - expected '{}' but got '{}'".format(self.__motors[port].type, type))
-        return self.__motors[port]
+        if type is not None and type != motor.type:
+            raise Exception("Port mismatch - expected '{}' but got '{}'".format(motor.type, type))
+        motor.attach(self.__motor_callbacks[port])
+        return motor
+
+    def update(self, duration: int) -> None:
+        """Update the physics of all motors over a duration of simulated time in microseconds."""
+        self.__update(duration)
+
+    def __update(self, duration: int) -> bool:
+        """Update the physics of all motors, returning whether or not any motor is still active."""
+        seconds = duration / 1000000
+        chassis = self.__chassis
+        if chassis is not None:
+            left = self.__motors[chassis.left_port]
+            right = self.__motors[chassis.right_port]
+            left_position = 0.0 if left is None else left.position
+            right_position = 0.0 if right is None else right.position
+
+        # Track whether motors are still active or busy along the way rather
+        # than visiting them again afterwards
+        sensing = self.__world is not None and chassis is not None
+        active = False
+        busy = False
+        for port, motor in self.__motors.items():
+            if motor is not None and motor.is_active:
+                self.__tracker.mark(self.__motor_components[port])
+                if motor.update(seconds):
+                    self.__runtime.trigger_event("motorReady", port=port)
+                if motor.is_active:
+                    active = True
+                    busy = busy or motor.is_busy
+
+        if chassis is not None:
+            left_delta = 0.0 if left is None else left.position - left_position
+            right_delta = 0.0 if right is None else right.position - right_position
+            if left_delta != 0.0 or right_delta != 0.0:
+                chassis.move(left_delta, right_delta)
+                if chassis.owns_poses:
+                    self.__tracker.mark("chassis")
+                    self.sense()
+                else:
+                    # Shared poses only move once their owner updates them
+                    self.__moved = True
+        # A chassis sharing poses cannot sense anything new once it moved,
+        # until its owner updates them
+        self.__set_busy(busy or (active and sensing and not self.__moved))
+        return active
+
+    def sense(self) -> None:
+        """Read the sensors at the chassis' pose in the world, triggering the events of detected changes."""
+        world = self.__world
+        chassis = self.__chassis
+        if world is None or chassis is None:
+            return
+
+        x, y, heading = chassis.pose
+        heading = math.radians(heading)
+        cos = math.cos(heading)
+        sin = math.sin(heading)
+        for port, sensor in self.__sensors.items():
+            if sensor is None:
+                continue
+            forward, left, angle = sensor.mount
+            sensor_x = x + forward * cos - left * sin
+            sensor_y = y + forward * sin + left * cos
+            if sensor.type == "color":
+                reflected, color = world.sample(sensor_x, sensor_y)
+                values = {"reflected": reflected, "color": color}
+            elif sensor.type == "ultrasonic":
+                distance = world.raycast(sensor_x, sensor_y, heading + math.radians(angle), ULTRASONIC_MAX_DISTANCE * 10)
+                values = {"distance": ULTRASONIC_MAX_DISTANCE if distance is None else int(distance / 10)}
+            elif sensor.type == "touch":
+                values = {"pressed": world.collides(sensor_x, sensor_y, TOUCH_RADIUS)}
+            else:
+                continue
+            self.update_sensor(port, values)
+
+    def sense_moved(self) -> None:
+        """Read the sensors once the shared poses were updated, if the chassis moved since they were last updated."""
+        if self.__moved:
+            self.__moved = False
+            self.__tracker.mark("chassis")
+            self.sense()
+            self.__update_busy()
+
+    def update_sensor(self, port: str, values: Dict[str, Union[str, int, bool, None]]) -> None:
+        """Update the readings of a sensor, such as by a client, triggering the events of detected changes."""
+        sensor = self.__sensors[port]
+        if sensor is None:
+            raise Exception("No sensor connected to port '{}'".format(port))
+        changes = sensor.update(values)
+        if changes:
+            self.__tracker.mark("sensors.{}".format(port))
+            for event in self.__sensor_events.detect(port, changes):
+                self.__runtime.trigger(event)
+
+    def __release_chassis(self) -> None:
+        """Free the index of the chassis in the shared poses, if any, such as once it is replaced."""
+        chassis = self.__chassis
+        if chassis is not None and self.__poses is not None and chassis.poses is self.__poses:
+            self.__poses.remove(chassis.index)
+        self.__moved = False
+
+    def __on_motor_change(self, port: str) -> None:
+        """Start the physics updates once a motor is commanded."""
+        self.__tracker.mark(self.__motor_components[port])
+        # Only the commanded motor changed, so the others need only be visited
+        # once it no longer keeps the brick busy on its own
+        motor = self.__motors[port]
+        if motor is not None and (motor.is_busy or (motor.is_active and self.__world is not None and self.__chassis is not None and not self.__moved)):
+            self.__set_busy(True)
+        elif self.__busy:
+            self.__update_busy()
+        if not self.__ticking:
+            self.__ticking = True
+            self.__runtime.call_later(PHYSICS_PERIOD, self.__tick)
+
+    def __tick(self) -> None:
+        """Update the physics, continuing for as long as any motor is active."""
+        self.__ticking = False
+        if self.__update(PHYSICS_PERIOD):
+            self.__ticking = True
+            self.__runtime.call_later(PHYSICS_PERIOD, self.__tick)
+
+    def __update_busy(self) -> None:
+        """Keep the simulated time running while motors run schedules which branches may wait for.
+
+        Motors moving the chassis in a world keep it running as well, as the
+        sensors read the moving robot's surroundings, but only until a chassis
+        sharing poses moved, as it only senses once they are updated.
+        """
+        motors = [motor for motor in self.__motors.values() if motor is not None]
+        busy = any(motor.is_busy for motor in motors)
+        if not busy and self.__world is not None and self.__chassis is not None and not self.__moved:
+            busy = any(motor.is_active for motor in motors)
+        self.__set_busy(busy)
+
+    def __set_busy(self, busy: bool) -> None:
+        """Hold a runtime activity while busy."""
+        if busy != self.__busy:
+            self.__busy = busy
+            if busy:
+                self.__runtime.begin_activity()
+            else:
+                self.__runtime.end_activity()
@@ -0,0 +1,134 @@
+import os
+import pickle
+import hashlib
+import logging
+from collections import OrderedDict
+from tempfile import NamedTemporaryFile
+from typing import Tuple, Optional, Union
+
+from toolkit.uf2.uf2 import UF2
+from toolkit.pxt.project import Project
+from toolkit.ev3.simulation.block.source import BlockSource
+from toolkit.ev3.simulation.simulator import Simulator
+from toolkit.ev3.simulation.chassis import ChassisPoses
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "ev3-emulator-toolkit")
+
+# Bump whenever the format of cached entries changes to invalidate old entries
+CACHE_VERSION = 3
+
+
+class ProjectCache:
+    """Content-addressed cache of extracted project sources and parsed block sources."""
+    def __init__(self, directory: str = DEFAULT_CACHE_DIRECTORY, max_size: int = 64 * 1024 * 1024, max_memory_entries: int = 32) -> None:
+        self.__directory = directory
+        # Maximum total size of the cached entries on disk, in bytes
+        self.__max_size = max_size
+        # Recently used entries kept in memory, most recently used last
+        self.__memory: "OrderedDict[str, Tuple[Project, BlockSource]]" = OrderedDict()
+        self.__max_memory_entries = max_memory_entries
+
+        os.makedirs(self.__directory, exist_ok=True)
+
+    @property
+    def directory(self) -> str:
+        """The directory holding the cached entries."""
+        return self.__directory
+
+    @staticmethod
+    def key(data: Union[bytes, memoryview]) -> str:
+        """The cache key of a UF2 archive's bytes."""
+        return "{}-{}".format(hashlib.sha256(data).hexdigest(), CACHE_VERSION)
+
+    def load(self, data: Union[bytes, memoryview]) -> Tuple[Project, BlockSource]:
+        """Load the project and its parsed main source of a UF2 archive's bytes, parsing it on a miss."""
+        key = self.key(data)
+
+        entry = self.__memory.get(key)
+        if entry is not None:
+            self.__memory.move_to_end(key)
+            return entry
+
+        entry = self.__read(key)
+        if entry is None:
+            log.debug("Cache miss for {}".format(key))
+            project = Project(UF2.parse(data))
+            main = BlockSource(project.file_by_name("main.blocks"))
+            entry = (project, main)
+            self.__write(key, project, main)
+        else:
+            log.debug("Cache hit for {}".format(key))
+
+        self.__memory[key] = entry
+        if len(self.__memory) > self.__max_memory_entries:
+            self.__memory.popitem(last=False)
+        return entry
+
+    def simulator(self, data: Union[bytes, memoryview], poses: ChassisPoses = None) -> Simulator:
+        """Create a simulator for a UF2 archive's bytes, optionally sharing poses with other simulators."""
+        project, main = self.load(data)
+        return Simulator(project, main, poses)
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        self.__memory.clear()
+        for filename in os.listdir(self.__directory):
+            if filename.endswith(".pickle"):
+                os.remove(os.path.join(self.__directory, filename))
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.__directory, "{}.pickle".format(key))
+
+    def __read(self, key: str) -> Optional[Tuple[Project, BlockSource]]:
+        """Read an entry from disk, marking it as recently used."""
+        path = self.__path(key)
+        try:
+            with open(path, "rb") as file:
+                meta, source_meta, source, main = pickle.load(file)
+            # The modification time is used to track the least recently used entries
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            log.warning("Unable to read cache entry {}".format(path), exc_info=True)
+            return None
+
+        return (Project.from_sources(meta, source_meta, source), main)
+
+    def __write(self, key: str, project: Project, main: BlockSource) -> None:
+        """Write an entry to disk atomically and evict the least recently used entries."""
+        file = NamedTemporaryFile(dir=self.__directory, suffix=".tmp", delete=False)
+        try:
+            with file:
+                pickle.dump((project.meta, project.source_meta, project.source, main), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(file.name, self.__path(key))
+        except BaseException:
+            # Do not leave partially written entries behind
+            try:
+                os.remove(file.name)
+            except FileNotFoundError:
+                pass
+            raise
+        self.__evict()
+
+    def __evict(self) -> None:
+        """Remove the least recently used entries until the cache fits its size."""
+        entries = []
+        for entry in os.scandir(self.__directory):
+            if entry.name.endswith(".pickle"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.__max_size:
+                break
+            log.debug("Evicting cache entry {}".format(path))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
@@ -0,0 +1,128 @@
+import json
+import struct
+import logging
+from typing import Dict, List, Any, Tuple
+
+log = logging.getLogger(__name__)
+
+# Tags of the sections of packed diffs
+SECTION_STATUS_LIGHT = ord("L")
+SECTION_MOTOR = ord("M")
+SECTION_NO_MOTOR = ord("m")
+SECTION_SENSOR = ord("S")
+SECTION_NO_SENSOR = ord("s")
+SECTION_CHASSIS = ord("C")
+SECTION_NO_CHASSIS = ord("c")
+SECTION_SCREEN_ROW = ord("R")
+
+# Version of the state, followed by the number of sections
+header_struct = struct.Struct("<QH")
+# Port, type, speed, angle, count and brake mode of a motor
+motor_struct = struct.Struct("<cc?hii")
+# Position and heading of the chassis
+chassis_struct = struct.Struct("<fff")
+# Length of a string or JSON encoded value
+length_struct = struct.Struct("<H")
+
+MOTOR_TYPES = {"large": b"L", "medium": b"M"}
+
+
+class ChangeTracker:
+    """Versions of the components of a state, each bumped to a new version of the whole state once the component changes."""
+    def __init__(self) -> None:
+        self.__version = 0
+        # The version at which each component last changed
+        self.__versions: Dict[str, int] = {}
+
+    @property
+    def version(self) -> int:
+        """The latest version."""
+        return self.__version
+
+    def mark(self, component: str) -> int:
+        """Mark a component as changed, returning the new version."""
+        self.__version += 1
+        self.__versions[component] = self.__version
+        return self.__version
+
+    def changed_since(self, version: int) -> List[str]:
+        """The components which changed after a version."""
+        return [component for component, changed in self.__versions.items() if changed > version]
+
+
+def pack_diff(diff: Dict[str, Any]) -> bytes:
+    """Pack a diff of the brick's state into a compact binary encoding."""
+    sections: List[bytes] = []
+
+    def pack_string(value: str) -> bytes:
+        data = value.encode()
+        return length_struct.pack(len(data)) + data
+
+    if "statusLightPattern" in diff:
+        sections.append(bytes([SECTION_STATUS_LIGHT]) + pack_string(diff["statusLightPattern"]))
+    for port, motor in diff.get("motors", {}).items():
+        if motor is None:
+            sections.append(bytes([SECTION_NO_MOTOR]) + port.encode())
+        else:
+            sections.append(bytes([SECTION_MOTOR]) + motor_struct.pack(
+                port.encode(), MOTOR_TYPES.get(motor["type"], b"?"), motor["brake"], int(motor["speed"]), motor["angle"], motor["count"]
+            ))
+    for port, sensor in diff.get("sensors", {}).items():
+        if sensor is None:
+            sections.append(bytes([SECTION_NO_SENSOR]) + port.encode())
+        else:
+            # Readings differ by sensor type, so they are encoded as JSON
+            sections.append(bytes([SECTION_SENSOR]) + port.encode() + pack_string(json.dumps(sensor, separators=(",", ":"))))
+    if "chassis" in diff:
+        chassis = diff["chassis"]
+        if chassis is None:
+            sections.append(bytes([SECTION_NO_CHASSIS]))
+        else:
+            sections.append(bytes([SECTION_CHASSIS]) + chassis_struct.pack(chassis["x"], chassis["y"], chassis["heading"]))
+    for y, row in diff.get("screen", {}).items():
+        sections.append(bytes([SECTION_SCREEN_ROW, y]) + row)
+
+    return header_struct.pack(diff["version"], len(sections)) + b"".join(sections)
+
+
+def unpack_diff(data: bytes, stride: int = 23) -> Dict[str, Any]:
+    """Unpack a diff packed by pack_diff, given the number of bytes per screen row."""
+    version, count = header_struct.unpack_from(data, 0)
+    offset = header_struct.size
+    diff: Dict[str, Any] = {"version": version}
+    types = {value: key for key, value in MOTOR_TYPES.items()}
+
+    def unpack_string(offset: int) -> Tuple[str, int]:
+        length, = length_struct.unpack_from(data, offset)
+        start = offset + length_struct.size
+        return (bytes(data[start:start + length]).decode(), start + length)
+
+    for _ in range(count):
+        tag = data[offset]
+        offset += 1
+        if tag == SECTION_STATUS_LIGHT:
+            diff["statusLightPattern"], offset = unpack_string(offset)
+        elif tag == SECTION_MOTOR:
+            port, type, brake, speed, angle, count = motor_struct.unpack_from(data, offset)
+            offset += motor_struct.size
+            diff.setdefault("motors", {})[port.decode()] = {"type": types.get(type, "unknown"), "speed": speed, "angle": angle, "count": count, "brake": brake}
+        elif tag == SECTION_NO_MOTOR or tag == SECTION_NO_SENSOR:
+            diff.setdefault("motors" if tag == SECTION_NO_MOTOR else "sensors", {})[chr(data[offset])] = None
+            offset += 1
+        elif tag == SECTION_SENSOR:
+            port = chr(data[offset])
+            value, offset = unpack_string(offset + 1)
+            diff.setdefault("sensors", {})[port] = json.loads(value)
+        elif tag == SECTION_CHASSIS:
+            x, y, heading = chassis_struct.unpack_from(data, offset)
+            offset += chassis_struct.size
+            diff["chassis"] = {"x": x, "y": y, "heading": heading}
+        elif tag == SECTION_NO_CHASSIS:
+            diff["chassis"] = None
+        elif tag == SECTION_SCREEN_ROW:
+            y = data[offset]
+            diff.setdefault("screen", {})[y] = bytes(data[offset + 1:offset + 1 + stride])
+            offset += 1 + stride
+        else:
+            raise Exception("Got unknown section '{}' in packed diff".format(tag))
+    return diff
@@ -0,0 +1,195 @@
+import math
+import logging
+from array import array
+from typing import List, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+log = logging.getLogger(__name__)
+
+# Geometry of the EV3 educator robot in millimeters
+DEFAULT_WHEEL_DIAMETER = 56.0
+DEFAULT_TRACK_WIDTH = 114.0
+
+# Arrays of the poses, in the order they are stored
+POSE_FIELDS = ("x", "y", "heading", "wheel_diameter", "track_width", "left", "right")
+
+
+class ChassisPoses:
+    """Poses of differential-drive chassis stored as one array per field, so that all of them can be integrated at once.
+
+    Wheel rotations are accumulated per chassis and integrated into the poses
+    by update, using NumPy if available.
+    """
+    def __init__(self, capacity: int = 16) -> None:
+        self.__count = 0
+        self.__capacity = max(capacity, 1)
+        self.__arrays = {name: self.__allocate(self.__capacity) for name in POSE_FIELDS}
+        # Indices of removed chassis, reused by the next chassis added
+        self.__free: List[int] = []
+
+    def __len__(self) -> int:
+        return self.__count - len(self.__free)
+
+    @staticmethod
+    def __allocate(size: int) -> "array":
+        if numpy is not None:
+            return numpy.zeros(size, dtype=numpy.float64)
+        return array("d", bytes(8 * size))
+
+    def add(self, x: float = 0.0, y: float = 0.0, heading: float = 0.0, wheel_diameter: float = DEFAULT_WHEEL_DIAMETER, track_width: float = DEFAULT_TRACK_WIDTH) -> int:
+        """Add a chassis at a position in millimeters with a heading in degrees, returning its index."""
+        if self.__free:
+            index = self.__free.pop()
+            for name, value in zip(POSE_FIELDS, (x, y, math.radians(heading), wheel_diameter, track_width, 0.0, 0.0)):
+                self.__arrays[name][index] = value
+            return index
+
+        if self.__count == self.__capacity:
+            # Grow all arrays by doubling their capacity
+            self.__capacity *= 2
+            for name, values in self.__arrays.items():
+                grown = self.__allocate(self.__capacity)
+                grown[:self.__count] = values[:self.__count]
+                self.__arrays[name] = grown
+
+        index = self.__count
+        self.__count += 1
+        for name, value in zip(POSE_FIELDS, (x, y, math.radians(heading), wheel_diameter, track_width, 0.0, 0.0)):
+            self.__arrays[name][index] = value
+        return index
+
+    def remove(self, index: int) -> None:
+        """Remove a chassis, such as once its robot is gone, so that its index can be reused."""
+        arrays = self.__arrays
+        # Removed chassis are still integrated, but no longer move
+        arrays["left"][index] = 0.0
+        arrays["right"][index] = 0.0
+        self.__free.append(index)
+
+    def pose(self, index: int) -> Tuple[float, float, float]:
+        """The position in millimeters and heading in degrees of a chassis."""
+        arrays = self.__arrays
+        return (float(arrays["x"][index]), float(arrays["y"][index]), math.degrees(arrays["heading"][index]))
+
+    def set_pose(self, index: int, x: float, y: float, heading: float) -> None:
+        """Place a chassis at a position in millimeters with a heading in degrees, dropping its accumulated rotations."""
+        arrays = self.__arrays
+        arrays["x"][index] = x
+        arrays["y"][index] = y
+        arrays["heading"][index] = math.radians(heading)
+        arrays["left"][index] = 0.0
+        arrays["right"][index] = 0.0
+
+    def accumulate(self, index: int, left: float, right: float) -> None:
+        """Accumulate rotations of the left and right wheels of a chassis in degrees, to be integrated by the next update."""
+        arrays = self.__arrays
+        arrays["left"][index] += left
+        arrays["right"][index] += right
+
+    def update(self) -> None:
+        """Integrate the accumulated wheel rotations of all chassis into their poses."""
+        if self.__count == 0:
+            return
+        if numpy is not None:
+            self.__update_vectorized()
+        else:
+            self.__update_sequential()
+
+    def __update_vectorized(self) -> None:
+        count = self.__count
+        x, y, heading, wheel_diameter, track_width, left, right = (self.__arrays[name][:count] for name in POSE_FIELDS)
+
+        # Distances travelled by the wheels
+        circumference = wheel_diameter * (math.pi / 360)
+        left_distance = left * circumference
+        right_distance = right * circumference
+        distance = (left_distance + right_distance) / 2
+        rotation = (right_distance - left_distance) / track_width
+
+        # Move along the mean heading of the update
+        mean_heading = heading + rotation / 2
+        x += distance * numpy.cos(mean_heading)
+        y += distance * numpy.sin(mean_heading)
+        heading += rotation
+        left[:] = 0
+        right[:] = 0
+
+    def __update_sequential(self) -> None:
+        x, y, heading, wheel_diameter, track_width, left, right = (self.__arrays[name] for name in POSE_FIELDS)
+        for i in range(self.__count):
+            if left[i] == 0 and right[i] == 0:
+                continue
+            circumference = wheel_diameter[i] * (math.pi / 360)
+            left_distance = left[i] * circumference
+            right_distance = right[i] * circumference
+            distance = (left_distance + right_distance) / 2
+            rotation = (right_distance - left_distance) / track_width[i]
+
+            mean_heading = heading[i] + rotation / 2
+            x[i] += distance * math.cos(mean_heading)
+            y[i] += distance * math.sin(mean_heading)
+            heading[i] += rotation
+            left[i] = 0
+            right[i] = 0
+
+
+class Chassis:
+    """A differential-drive chassis driven by two motors, with its pose stored in shared poses."""
+    def __init__(self, left_port: str, right_port: str, poses: ChassisPoses = None, index: int = None) -> None:
+        self.__left_port = left_port
+        self.__right_port = right_port
+        # Poses are shared when given, such as by a server updating many robots at once
+        self.__owns_poses = poses is None
+        self.__poses = ChassisPoses(1) if poses is None else poses
+        self.__index = self.__poses.add() if index is None else index
+
+    @property
+    def left_port(self) -> str:
+        """The port of the left motor."""
+        return self.__left_port
+
+    @property
+    def right_port(self) -> str:
+        """The port of the right motor."""
+        return self.__right_port
+
+    @property
+    def poses(self) -> ChassisPoses:
+        """The poses the chassis' pose is stored in."""
+        return self.__poses
+
+    @property
+    def index(self) -> int:
+        """The index of the chassis in its poses."""
+        return self.__index
+
+    @property
+    def owns_poses(self) -> bool:
+        """Whether or not the chassis updates its poses itself, rather than them being shared."""
+        return self.__owns_poses
+
+    @property
+    def pose(self) -> Tuple[float, float, float]:
+        """The position in millimeters and heading in degrees."""
+        return self.__poses.pose(self.__index)
+
+    def to_dict(self) -> dict:
+        x, y, heading = self.pose
+        return {
+            "leftPort": self.__left_port,
+            "rightPort": self.__right_port,
+            "x": x,
+            "y": y,
+            "heading": heading
+        }
+
+    def move(self, left: float, right: float) -> None:
+        """Move by rotations of the left and right wheels in degrees."""
+        self.__poses.accumulate(self.__index, left, right)
+        if self.__owns_poses:
+            self.__poses.update()
@@ -0,0 +1,126 @@
+import os
+import json
+import base64
+import logging
+from functools import lru_cache
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from toolkit.ev3.simulation.screen import Framebuffer, SCREEN_WIDTH, SCREEN_HEIGHT, FONT_HEIGHT
+
+
+log = logging.getLogger(__name__)
+
+# Directories or PXT resource files (.jres) holding the EV3 images, separated
+# by the path separator
+IMAGE_PATH_VARIABLE = "EV3_IMAGE_PATH"
+
+# Images shown by the moods of PXT, by mood
+MOOD_IMAGES = {
+    "moods.sleeping": "images.eyesSleeping",
+    "moods.awake": "images.eyesAwake",
+    "moods.tired": "images.eyesTiredMiddle",
+    "moods.angry": "images.eyesAngry",
+    "moods.sad": "images.eyesTear",
+    "moods.dizzy": "images.eyesDizzy",
+    "moods.knockedOut": "images.eyesKnockedOut",
+    "moods.middleLeft": "images.eyesMiddleLeft",
+    "moods.middleRight": "images.eyesMiddleRight",
+    "moods.love": "images.eyesLove",
+    "moods.winking": "images.eyesWinking",
+    "moods.neutral": "images.eyesNeutral"
+}
+
+# Reverses the bits of a byte, as RGF images store the leftmost pixel in the
+# least significant bit
+REVERSED_BITS = bytes(int("{:08b}".format(value)[::-1], 2) for value in range(256))
+
+
+@dataclass(frozen=True)
+class Bitmap:
+    width: int
+    height: int
+    # Packed rows of (width + 7) // 8 bytes, the leftmost pixel of a byte being
+    # its most significant bit
+    data: bytes
+
+
+def decode_rgf(data: bytes) -> Bitmap:
+    """Decode an image of the EV3's RGF format, a width and height byte followed by packed rows."""
+    if len(data) < 2:
+        raise Exception("Got truncated RGF image of {} bytes".format(len(data)))
+    width = data[0]
+    height = data[1]
+    size = (width + 7) // 8 * height
+    if len(data) < 2 + size:
+        raise Exception("Got truncated RGF image of {}x{} pixels with {} bytes".format(width, height, len(data)))
+    return Bitmap(width=width, height=height, data=bytes(data[2:2 + size]).translate(REVERSED_BITS))
+
+
+def placeholder(name: str) -> Bitmap:
+    """A bitmap showing the name of an image which is not available."""
+    framebuffer = Framebuffer(SCREEN_WIDTH, SCREEN_HEIGHT)
+    framebuffer.text(name.split(".")[-1], 4, (SCREEN_HEIGHT - FONT_HEIGHT) // 2)
+    return Bitmap(width=SCREEN_WIDTH, height=SCREEN_HEIGHT, data=bytes(framebuffer.buffer))
+
+
+class ImageLibrary:
+    """Raw EV3 images by name, read from directories of .rgf files or PXT resource files (.jres)."""
+    def __init__(self, paths: List[str]) -> None:
+        self.__paths = paths
+        # Encoded images of the resource files, read once needed
+        self.__resources: Optional[Dict[str, bytes]] = None
+
+    @property
+    def paths(self) -> List[str]:
+        """The directories and resource files holding the images."""
+        return self.__paths
+
+    def read(self, name: str) -> Optional[bytes]:
+        """The encoded image of a name such as 'images.expressionsBigSmile', if available."""
+        short_name = name.split(".")[-1]
+        for path in self.__paths:
+            if os.path.isdir(path):
+                for filename in (name, short_name):
+                    file_path = os.path.join(path, "{}.rgf".format(filename))
+                    if os.path.isfile(file_path):
+                        with open(file_path, "rb") as file:
+                            return file.read()
+        return self.__read_resources().get(short_name)
+
+    def __read_resources(self) -> Dict[str, bytes]:
+        if self.__resources is None:
+            self.__resources = {}
+            for path in self.__paths:
+                if not path.endswith(".jres") or not os.path.isfile(path):
+                    continue
+                with open(path, "r") as file:
+                    resources = json.load(file)
+                for key, value in resources.items():
+                    # The entry '*' holds the defaults of the resources
+                    if key == "*":
+                        continue
+                    data = value["data"] if isinstance(value, dict) else value
+                    self.__resources[key] = base64.b64decode(data)
+        return self.__resources
+
+
+library = ImageLibrary([path for path in os.environ.get(IMAGE_PATH_VARIABLE, "").split(os.pathsep) if path])
+
+
+def set_image_paths(paths: List[str]) -> None:
+    """Read the images from other directories or resource files, dropping the decoded images."""
+    global library
+    library = ImageLibrary(paths)
+    load_image.cache_clear()
+
+
+# Images are decoded once and shared by all simulations of the process
+@lru_cache(maxsize=256)
+def load_image(name: str) -> Bitmap:
+    """The decoded image of a name, or a placeholder if it is not available."""
+    data = library.read(name)
+    if data is None:
+        log.warning("Image '{}' is not available, set {} to a directory or resource file holding it".format(name, IMAGE_PATH_VARIABLE))
+        return placeholder(name)
+    return decode_rgf(data)
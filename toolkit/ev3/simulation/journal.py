@@ -0,0 +1,311 @@
+import os
+import json
+import struct
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional, Iterator, Any, BinaryIO
+
+from toolkit.ev3.simulation.simulator import Simulator, Snapshot
+from toolkit.ev3.simulation.runtime import RunStatistics
+from toolkit.ev3.simulation.pacing import Pacer
+from toolkit.ev3.simulation.chassis import ChassisPoses
+from toolkit.ev3.simulation.cache import ProjectCache, DEFAULT_CACHE_DIRECTORY
+
+
+log = logging.getLogger(__name__)
+
+JOURNAL_MAGIC = b"EV3J"
+JOURNAL_VERSION = 1
+
+# Tags of the records of journals
+RECORD_PROJECT = ord("P")
+RECORD_CONFIG = ord("C")
+RECORD_START = ord("S")
+RECORD_EVENT = ord("E")
+RECORD_READINGS = ord("R")
+RECORD_STEPS = ord("T")
+RECORD_RUN_UNTIL = ord("U")
+RECORD_CHECKPOINT = ord("H")
+RECORD_SNAPSHOT = ord("K")
+RECORD_SYNC = ord("Y")
+
+# Magic and version of the format at the start of a journal
+header_struct = struct.Struct("<4sH")
+# Tag, simulated time in microseconds and length of the payload of a record
+record_struct = struct.Struct("<BQI")
+# Number of steps run
+steps_struct = struct.Struct("<I")
+# Simulated time to run until and the maximum number of steps
+run_until_struct = struct.Struct("<QI")
+
+# Default periods of simulated time in microseconds between two checkpoints
+# of the brick's state hash and between two snapshots
+DEFAULT_CHECKPOINT_PERIOD = 1000000
+DEFAULT_SNAPSHOT_PERIOD = 10000000
+
+
+@dataclass(frozen=True)
+class JournalRecord:
+    # Offset of the record in the journal
+    offset: int
+    tag: int
+    # Simulated time in microseconds at which the record was written
+    time: int
+    payload: bytes
+
+
+class JournalWriter:
+    """An append-only journal of the external inputs of a simulation, written to a file."""
+    def __init__(self, path: str) -> None:
+        self.__path = path
+        exists = os.path.isfile(path) and os.path.getsize(path) > 0
+        self.__file: BinaryIO = open(path, "ab")
+        if not exists:
+            self.__file.write(header_struct.pack(JOURNAL_MAGIC, JOURNAL_VERSION))
+            self.__file.flush()
+
+    @property
+    def path(self) -> str:
+        """The path of the journal."""
+        return self.__path
+
+    def write(self, tag: int, time: int, payload: bytes = b"") -> None:
+        """Append a record, flushing it so that it survives crashes of the process."""
+        self.__file.write(record_struct.pack(tag, time, len(payload)) + payload)
+        self.__file.flush()
+
+    def close(self) -> None:
+        """Close the journal."""
+        self.__file.close()
+
+
+def read_journal(path: str) -> Iterator[JournalRecord]:
+    """Read the records of a journal, stopping at a truncated record such as one written while crashing."""
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < header_struct.size:
+        raise Exception("Got truncated journal '{}'".format(path))
+    magic, version = header_struct.unpack_from(data, 0)
+    if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+        raise Exception("Got unsupported journal '{}' of version {}".format(path, version))
+
+    offset = header_struct.size
+    while offset < len(data):
+        if offset + record_struct.size > len(data):
+            log.warning("Ignoring truncated record at offset {} of journal '{}'".format(offset, path))
+            return
+        tag, time, length = record_struct.unpack_from(data, offset)
+        start = offset + record_struct.size
+        if start + length > len(data):
+            log.warning("Ignoring truncated record at offset {} of journal '{}'".format(offset, path))
+            return
+        yield JournalRecord(offset=offset, tag=tag, time=time, payload=data[start:start + length])
+        offset = start + length
+
+
+def encode_json(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+class Recorder:
+    """Drive a simulator while recording its external inputs with their simulated time to an optional journal.
+
+    The hash of the brick's state is recorded periodically as a checkpoint,
+    and snapshots of the simulation are recorded less often to seek replays.
+    Bricks sharing poses with other robots are checkpointed once synced, as
+    their chassis only move and sense then.
+    """
+    def __init__(self, simulator: Simulator, writer: Optional[JournalWriter] = None, project_key: Optional[str] = None, checkpoint_period: int = DEFAULT_CHECKPOINT_PERIOD, snapshot_period: int = DEFAULT_SNAPSHOT_PERIOD) -> None:
+        self.__simulator = simulator
+        self.__writer = writer
+        self.__checkpoint_period = checkpoint_period
+        self.__snapshot_period = snapshot_period
+        self.__next_checkpoint = simulator.time + checkpoint_period
+        self.__next_snapshot = simulator.time + snapshot_period
+        if writer is not None and project_key is not None:
+            writer.write(RECORD_PROJECT, simulator.time, project_key.encode())
+
+    @property
+    def simulator(self) -> Simulator:
+        """The simulator."""
+        return self.__simulator
+
+    @property
+    def writer(self) -> Optional[JournalWriter]:
+        """The journal written to, if any."""
+        return self.__writer
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        """Connect the motors and sensors and set the world of a config."""
+        self.__record(RECORD_CONFIG, encode_json(config))
+        self.__simulator.brick.configure(config)
+
+    def start(self) -> None:
+        """Start the simulation."""
+        self.__record(RECORD_START)
+        self.__simulator.start()
+        self.__checkpoint()
+
+    def trigger(self, event: str, parameters: Dict[str, Any]) -> None:
+        """Trigger an event, such as a button press."""
+        self.__record(RECORD_EVENT, encode_json([event, parameters]))
+        self.__simulator.runtime.trigger_event(event, **parameters)
+
+    def update_sensor(self, port: str, readings: Dict[str, Any]) -> None:
+        """Update the readings of a sensor."""
+        self.__record(RECORD_READINGS, encode_json([port, readings]))
+        self.__simulator.brick.update_sensor(port, readings)
+
+    def run_steps(self, count: int) -> RunStatistics:
+        """Execute up to count steps."""
+        self.__record(RECORD_STEPS, steps_struct.pack(count))
+        statistics = self.__simulator.run_steps(count)
+        if self.__simulator.brick.poses is None:
+            self.__checkpoint()
+        return statistics
+
+    def tick(self, pacer: Pacer) -> Optional[float]:
+        """Run a tick of a pacer of the simulator, returning when the next one is due as Pacer.tick does."""
+        self.__record(RECORD_RUN_UNTIL, run_until_struct.pack(self.__simulator.time + pacer.tick_time, pacer.max_steps_per_tick))
+        due = pacer.tick()
+        if self.__simulator.brick.poses is None:
+            self.__checkpoint()
+        return due
+
+    def sync(self) -> None:
+        """Read the sensors of a brick sharing poses once they were updated, as Brick.sense_moved does."""
+        self.__record(RECORD_SYNC)
+        self.__simulator.brick.sense_moved()
+        self.__checkpoint()
+
+    def close(self) -> None:
+        """Record a final checkpoint and close the journal."""
+        if self.__writer is not None:
+            self.__writer.write(RECORD_CHECKPOINT, self.__simulator.time, self.__simulator.brick.state_hash())
+            self.__writer.close()
+            self.__writer = None
+
+    def __record(self, tag: int, payload: bytes = b"") -> None:
+        if self.__writer is not None:
+            self.__writer.write(tag, self.__simulator.time, payload)
+
+    def __checkpoint(self) -> None:
+        """Record the hash of the brick's state and a snapshot once their periods passed."""
+        writer = self.__writer
+        time = self.__simulator.time
+        if writer is None or time < self.__next_checkpoint:
+            return
+        if time >= self.__next_snapshot:
+            writer.write(RECORD_SNAPSHOT, time, self.__simulator.snapshot().to_bytes())
+            self.__next_snapshot = time + self.__snapshot_period
+        writer.write(RECORD_CHECKPOINT, time, self.__simulator.brick.state_hash())
+        self.__next_checkpoint = time + self.__checkpoint_period
+
+
+@dataclass
+class ReplayResult:
+    # Number of records applied
+    records: int = 0
+    steps: int = 0
+    # Simulated time in microseconds at the end
+    time: int = 0
+    checkpoints: int = 0
+    # Simulated time, expected and actual hash of each mismatching checkpoint
+    mismatches: List[Tuple[int, str, str]] = field(default_factory=list)
+
+    @property
+    def verified(self) -> bool:
+        """Whether or not all checkpoints matched."""
+        return len(self.mismatches) == 0
+
+
+class Replayer:
+    """Re-execute the journal of a simulation as fast as possible, verifying the state of the brick at its checkpoints."""
+    def __init__(self, data: bytes, path: str, cache_directory: str = DEFAULT_CACHE_DIRECTORY) -> None:
+        self.__data = data
+        self.__cache = ProjectCache(cache_directory)
+        self.__records = list(read_journal(path))
+        for record in self.__records:
+            if record.tag == RECORD_PROJECT and record.payload.decode() != ProjectCache.key(data):
+                raise Exception("Journal '{}' was recorded for another project".format(path))
+        # Journals of bricks sharing poses are replayed with poses of their own
+        self.__shares_poses = any(record.tag == RECORD_SYNC for record in self.__records)
+
+    @property
+    def records(self) -> List[JournalRecord]:
+        """The records of the journal."""
+        return self.__records
+
+    @property
+    def snapshot_times(self) -> List[int]:
+        """The simulated times of the snapshots, which replays can seek to quickly."""
+        return [record.time for record in self.__records if record.tag == RECORD_SNAPSHOT]
+
+    def replay(self, until: Optional[int] = None, strict: bool = False) -> Tuple[Simulator, ReplayResult]:
+        """Replay the journal up to the last record at or before a simulated time, or all of it.
+
+        Replays up to a time seek to the last snapshot before it, if any, while
+        full replays verify every checkpoint. Mismatching checkpoints are
+        collected, or raised if strict.
+        """
+        simulator = self.__cache.simulator(self.__data, ChassisPoses(1) if self.__shares_poses else None)
+        start = 0
+        # Seek to the last snapshot, applying the config as it is not part of snapshots
+        if until is not None:
+            for index, record in enumerate(self.__records):
+                if record.time > until:
+                    break
+                if record.tag == RECORD_SNAPSHOT:
+                    start = index
+        if start > 0:
+            for record in self.__records[:start]:
+                if record.tag == RECORD_CONFIG:
+                    simulator.brick.configure(json.loads(record.payload))
+            simulator.restore(Snapshot.from_bytes(self.__records[start].payload))
+            log.debug("Seeked to the snapshot at {}us".format(self.__records[start].time))
+
+        result = ReplayResult()
+        runtime = simulator.runtime
+        for record in self.__records[start:]:
+            if until is not None and record.time > until:
+                break
+            if record.time != simulator.time:
+                log.warning("Record at offset {} was written at {}us, but replayed at {}us".format(record.offset, record.time, simulator.time))
+            tag = record.tag
+            if tag == RECORD_STEPS:
+                count, = steps_struct.unpack(record.payload)
+                result.steps += simulator.run_steps(count).steps
+            elif tag == RECORD_RUN_UNTIL:
+                target, max_steps = run_until_struct.unpack(record.payload)
+                result.steps += runtime.run_until(None, max_steps, target).steps
+                runtime.advance_time(target - runtime.time)
+            elif tag == RECORD_EVENT:
+                event, parameters = json.loads(record.payload)
+                runtime.trigger_event(event, **parameters)
+            elif tag == RECORD_READINGS:
+                port, readings = json.loads(record.payload)
+                simulator.brick.update_sensor(port, readings)
+            elif tag == RECORD_CHECKPOINT:
+                result.checkpoints += 1
+                actual = simulator.brick.state_hash()
+                if actual != record.payload:
+                    mismatch = (record.time, record.payload.hex(), actual.hex())
+                    if strict:
+                        raise Exception("State of the brick at {}us hashed to {} rather than {}".format(record.time, mismatch[2], mismatch[1]))
+                    log.warning("State of the brick at {}us hashed to {} rather than {}".format(record.time, mismatch[2], mismatch[1]))
+                    result.mismatches.append(mismatch)
+            elif tag == RECORD_SYNC:
+                simulator.brick.poses.update()
+                simulator.brick.sense_moved()
+            elif tag == RECORD_CONFIG:
+                simulator.brick.configure(json.loads(record.payload))
+            elif tag == RECORD_START:
+                simulator.start()
+            elif tag == RECORD_PROJECT or tag == RECORD_SNAPSHOT:
+                pass
+            else:
+                raise Exception("Got unknown record '{}' at offset {}".format(tag, record.offset))
+            result.records += 1
+
+        result.time = simulator.time
+        return (simulator, result)
@@ -6,22 +6,19 @@ from inspect import getmembers, ismethod
 
 from toolkit.ev3.simulation.block.block import Block, BlockValue
 from toolkit.ev3.simulation.runtime import Runtime, Branch
-from toolkit.ev3.simulation.lib.utilities import call_handler, evaluate_value
+from toolkit.ev3.simulation.lib.utilities import call_handler
 
 log = logging.getLogger(__name__)
 
 
-@call_handler("console_log")
-def handle_console_log(runtime: Runtime, block: Block, branch: Branch) -> None:
-    text = block.values["text"].shadow.fields["TEXT"].value
+@call_handler("console_log", values=["text"])
+def handle_console_log(runtime: Runtime, block: Block, branch: Branch, text: Any) -> None:
     text = "" if text is None else text
     log.debug("Logging {}".format(text))
     print(text)
 
 
-@call_handler("consoleLogValue")
-def handle_console_log_value(runtime: Runtime, block: Block, branch: Branch) -> None:
-    name = evaluate_value(block.values["name"])
-    value = evaluate_value(block.values["value"])
+@call_handler("consoleLogValue", values=["name", "value"])
+def handle_console_log_value(runtime: Runtime, block: Block, branch: Branch, name: Any, value: Any) -> None:
     log.debug("Logging value {}={}".format(name, value))
     print("{}={}".format(name, value))
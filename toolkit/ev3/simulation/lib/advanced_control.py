@@ -6,7 +6,7 @@ from inspect import getmembers, ismethod
 
 from toolkit.ev3.simulation.block.block import Block, BlockValue
 from toolkit.ev3.simulation.runtime import Runtime, Branch
-from toolkit.ev3.simulation.lib.utilities import call_handler, evaluate_value
+from toolkit.ev3.simulation.lib.utilities import call_handler
 
 
 log = logging.getLogger(__name__)
@@ -17,10 +17,8 @@ def handle_control_run_in_parallel(runtime: Runtime, block: Block, branch: Branc
     runtime.add_branch(block.statements["HANDLER"])
 
 
-@call_handler("controlWaitUs")
-def handle_control_wait_us(runtime: Runtime, block: Block, branch: Branch) -> None:
+@call_handler("controlWaitUs", values={"micros": "us"})
+def handle_control_wait_us(runtime: Runtime, block: Block, branch: Branch, us: int) -> None:
     #  {'type': 'control_wait_us', 'values': {'micros': BlockValue(name='micros', shadow=BlockShadow(type='math_number', fields={'NUM': BlockField(name='NUM', id=None, variable_type=None, value='4')}))}, 'fields': {}, 'statements': {}}
-    us = evaluate_value(block.values["micros"])
-    # TODO: Actually implement lock
-    branch.lock = Event(event="interrupt", parameters={})
+    runtime.sleep(branch, int(us))
     log.debug("Sleeping for {}μs".format(us))
@@ -6,7 +6,7 @@ from inspect import getmembers, ismethod
 
 from toolkit.ev3.simulation.block.block import Block, BlockValue
 from toolkit.ev3.simulation.runtime import Runtime, Branch
-from toolkit.ev3.simulation.lib.utilities import call_handler, evaluate_value
+from toolkit.ev3.simulation.lib.utilities import call_handler
 
 log = logging.getLogger(__name__)
 
@@ -6,8 +6,9 @@ from inspect import getmembers, ismethod
 
 from toolkit.ev3.simulation.block.block import Block, BlockValue
 from toolkit.ev3.simulation.runtime import Runtime, Branch
-from toolkit.ev3.simulation.lib.utilities import call_handler, evaluate_value
+from toolkit.ev3.simulation.lib.utilities import call_handler
 from toolkit.ev3.simulation.brick import StatusLightPattern
+from toolkit.ev3.simulation.images import load_image, MOOD_IMAGES
 
 
 log = logging.getLogger(__name__)
@@ -20,37 +21,30 @@ def handle_brick_show_ports(runtime: Runtime, block: Block, branch: Branch) -> N
 
 @call_handler("setLights")
 def handle_set_lights(runtime: Runtime, block: Block, branch: Branch) -> None:
-    pattern = evaluate_value(block.values["pattern"])
+    pattern = block.fields["pattern"].value
     runtime.globals["brick"].set_status_light_pattern(StatusLightPattern(pattern))
 
 
-@call_handler("screenShowImage")
-def handle_screen_show_image(runtime: Runtime, block: Block, branch: Branch) -> None:
-    image = evaluate_value(block.values["image"])
+@call_handler("screenShowImage", values=["image"])
+def handle_screen_show_image(runtime: Runtime, block: Block, branch: Branch, image: str) -> None:
     log.debug("Showing image {}".format(image))
+    runtime.globals["brick"].show_image(load_image(image))
 
 
-@call_handler("screenPrint")
-def handle_screen_print(runtime: Runtime, block: Block, branch: Branch) -> None:
-    text = evaluate_value(block.values["text"])
-    line = evaluate_value(block.values["line"])
+@call_handler("screenPrint", values=["text", "line"])
+def handle_screen_print(runtime: Runtime, block: Block, branch: Branch, text: Any, line: int) -> None:
     runtime.globals["brick"].clear_screen(line=line)
     runtime.globals["brick"].print(text, line=line)
 
 
-@call_handler("screenShowNumber")
-def handle_screen_show_number(runtime: Runtime, block: Block, branch: Branch) -> None:
-    name = evaluate_value(block.values["name"])
-    line = evaluate_value(block.values["line"])
+@call_handler("screenShowNumber", values=["name", "line"])
+def handle_screen_show_number(runtime: Runtime, block: Block, branch: Branch, name: Any, line: int) -> None:
     runtime.globals["brick"].clear_screen(line=line)
-    runtime.globals["brick"].print("{}={}".format(name, text), line=0)
+    runtime.globals["brick"].print(str(name), line=line)
 
 
-@call_handler("screenShowValue")
-def handle_screen_show_value(runtime: Runtime, block: Block, branch: Branch) -> None:
-    name = evaluate_value(block.values["name"])
-    line = evaluate_value(block.values["line"])
-    text = evaluate_value(block.values["text"])
+@call_handler("screenShowValue", values=["name", "line", "text"])
+def handle_screen_show_value(runtime: Runtime, block: Block, branch: Branch, name: Any, line: int, text: Any) -> None:
     runtime.globals["brick"].clear_screen(line=line)
     runtime.globals["brick"].print("{}={}".format(name, text), line=line)
 
@@ -60,10 +54,12 @@ def handle_screen_clear_screen(runtime: Runtime, block: Block, branch: Branch) -
     runtime.globals["brick"].clear_screen()
 
 
-@call_handler("moodShow")
-def handle_mood_show(runtime: Runtime, block: Block, branch: Branch) -> None:
-    mood = block.values["mood"].shadow.fields["mood"].value
+@call_handler("moodShow", values=["mood"])
+def handle_mood_show(runtime: Runtime, block: Block, branch: Branch, mood: str) -> None:
     log.debug("Showing mood '{}'".format(mood))
+    if mood not in MOOD_IMAGES:
+        raise Exception("Got unsupported mood '{}'".format(mood))
+    runtime.globals["brick"].show_image(load_image(MOOD_IMAGES[mood]))
 
 
 @call_handler("buttonEvent")
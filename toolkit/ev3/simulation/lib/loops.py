@@ -5,8 +5,8 @@ from typing import Dict, Set, List, Callable, Any, Optional
 from inspect import getmembers, ismethod
 
 from toolkit.ev3.simulation.block.block import Block, BlockValue
-from toolkit.ev3.simulation.runtime import Runtime, Branch, Event
-from toolkit.ev3.simulation.lib.utilities import call_handler, evaluate_value
+from toolkit.ev3.simulation.runtime import Runtime, Branch
+from toolkit.ev3.simulation.lib.utilities import call_handler
 
 log = logging.getLogger(__name__)
 
@@ -25,11 +25,9 @@ def handle_pxt_controls_for(runtime: Runtime, block: Block, branch: Branch) -> N
     pass
 
 
-@call_handler("device_pause")
-def handle_device_pause(runtime: Runtime, block: Block, branch: Branch) -> None:
-    ms = evaluate_value(block.values["pause"])
-    # TODO: Actually implement lock
-    branch.lock = Event(event="interrupt", parameters={})
+@call_handler("device_pause", values={"pause": "ms"})
+def handle_device_pause(runtime: Runtime, block: Block, branch: Branch, ms: int) -> None:
+    runtime.sleep(branch, int(ms * 1000))
     log.debug("Sleeping for {}ms".format(ms))
 
 
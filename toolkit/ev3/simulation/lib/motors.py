@@ -1,15 +1,17 @@
 import sys
 import logging
 import re
-from functools import wraps
+from functools import wraps, lru_cache
 from typing import Dict, Set, List, Callable, Any, Optional, Tuple
 from inspect import getmembers, ismethod
 
 from toolkit.ev3.simulation.block.block import Block, BlockValue
-from toolkit.ev3.simulation.runtime import Runtime, Branch
-from toolkit.ev3.simulation.lib.utilities import call_handler, evaluate_value
+from toolkit.ev3.simulation.runtime import Runtime, Branch, Event
+from toolkit.ev3.simulation.lib.utilities import call_handler
 
 
+# Labels are constant fields, so each one only needs to be parsed once
+@lru_cache(maxsize=None)
 def parse_motor_label(label: str) -> List[Tuple[str, str]]:
     if (label.split(".")[0] != "motors" and label.split(".")[0] != "motor") or "." not in label:
         raise Exception("Got unsupported motor label '{}'".format(label))
@@ -31,42 +33,66 @@ def parse_motor_label(label: str) -> List[Tuple[str, str]]:
     return [(port, type) for port in ports]
 
 
-@call_handler("motorRun")
-def handle_motor_run(runtime: Runtime, block: Block, branch: Branch) -> None:
+def pause_until_ready(runtime: Runtime, branch: Branch, motor_label: str) -> None:
+    """Lock a branch until the first motor of a label completes its schedule, if running one."""
+    port, type = parse_motor_label(motor_label)[0]
+    if runtime.globals["brick"].get_motor(port, type).is_busy:
+        branch.lock = Event(event="motorReady", parameters={"port": port})
+
+
+def steer(speed: int, turn_ratio: int) -> Tuple[float, float]:
+    """The speeds of the left and right motors when steering with a turn ratio between -200 and 200, as done by PXT."""
+    turn_ratio = max(-200, min(200, turn_ratio))
+    if turn_ratio < 0:
+        return (speed * (100 + turn_ratio) / 100, speed)
+    return (speed, speed * (100 - turn_ratio) / 100)
+
+
+def run_motor_pair(runtime: Runtime, motor_label: str, speed_left: float, speed_right: float) -> None:
+    """Run a pair of motors driving a chassis, the first one being the left motor."""
+    motors = parse_motor_label(motor_label)
+    if len(motors) != 2:
+        raise Exception("Expected a pair of motors but got '{}'".format(motor_label))
+    (left_port, left_type), (right_port, right_type) = motors
+
+    brick = runtime.globals["brick"]
+    brick.pair_motors(left_port, right_port)
+    brick.get_motor(left_port, left_type).set_speed(speed_left)
+    brick.get_motor(right_port, right_type).set_speed(speed_right)
+
+
+@call_handler("motorRun", values=["speed"])
+def handle_motor_run(runtime: Runtime, block: Block, branch: Branch, speed: int) -> None:
     motor_label = block.fields["motor"].value
-    speed = evaluate_value(block.values["speed"])
     for port, type in parse_motor_label(motor_label):
         runtime.globals["brick"].get_motor(port, type).set_speed(speed)
 
 
-@call_handler("motorSchedule")
-def handle_motor_schedule(runtime: Runtime, block: Block, branch: Branch) -> None:
+@call_handler("motorSchedule", values=["speed", "value"])
+def handle_motor_schedule(runtime: Runtime, block: Block, branch: Branch, speed: int, value: int) -> None:
     motor_label = block.fields["motor"].value
     unit = block.fields["unit"].value
-    speed = evaluate_value(block.values["speed"])
-    value = evaluate_value(block.values["value"])
-    for port, type in parse_motor_label(motor_label):
-        runtime.globals["brick"].get_motor(port, type).set_schedule(unit, speed, value)
+    motors = [runtime.globals["brick"].get_motor(port, type) for port, type in parse_motor_label(motor_label)]
+    for motor in motors:
+        motor.set_schedule(unit, speed, value)
+    # The motors run the same schedule, so pause until the first one completes
+    pause_until_ready(runtime, branch, motor_label)
 
 
-@call_handler("motorPairTank")
-def handle_motor_pair_tank(runtime: Runtime, block: Block, branch: Branch) -> None:
+@call_handler("motorPairTank", values={"speedLeft": "speed_left", "speedRight": "speed_right"})
+def handle_motor_pair_tank(runtime: Runtime, block: Block, branch: Branch, speed_left: int, speed_right: int) -> None:
     motor_label = block.fields["motors"].value
-    speed_left = block.values["speedLeft"].shadow.fields["speed"].value
-    speed_right = block.values["speedRight"].shadow.fields["speed"].value
-    # TODO: Implement
+    run_motor_pair(runtime, motor_label, speed_left, speed_right)
 
-@call_handler("motorPairSteer")
-def handle_motor_pair_steer(runtime: Runtime, block: Block, branch: Branch) -> None:
+@call_handler("motorPairSteer", values={"turnRatio": "turn_ratio", "speed": "speed"})
+def handle_motor_pair_steer(runtime: Runtime, block: Block, branch: Branch, turn_ratio: int, speed: int) -> None:
     chassis = block.fields["chassis"].value
-    turn_ratio = block.values["turnRatio"].shadow.fields["turnratio"].value
-    speed = block.values["speed"].shadow.fields["speed"].value
-    # TODO: Implement
+    run_motor_pair(runtime, chassis, *steer(speed, turn_ratio))
 
 @call_handler("motorPauseUntilRead")
 def handle_motor_pause_until_read(runtime: Runtime, block: Block, branch: Branch) -> None:
     motor_label = block.fields["motor"].value
-    # TODO: Implement
+    pause_until_ready(runtime, branch, motor_label)
 
 
 @call_handler("motorStop")
@@ -104,9 +130,8 @@ def handle_motor_clear_count(runtime: Runtime, block: Block, branch: Branch) ->
         runtime.globals["brick"].get_motor(port, type).clear_count()
 
 
-@call_handler("outputMotorSetBrakeMode")
-def handle_output_motor_set_brake_mode(runtime: Runtime, block: Block, branch: Branch) -> None:
+@call_handler("outputMotorSetBrakeMode", values={"brake": "mode"})
+def handle_output_motor_set_brake_mode(runtime: Runtime, block: Block, branch: Branch, mode: Any) -> None:
     motor_label = block.fields["motor"].value
-    mode = block.values["brake"].shadow.fields["on"].value
     for port, type in parse_motor_label(motor_label):
         runtime.globals["brick"].get_motor(port, type).set_brake_mode(mode)
@@ -6,12 +6,21 @@ from inspect import getmembers, ismethod
 
 from toolkit.ev3.simulation.block.block import Block, BlockValue
 from toolkit.ev3.simulation.runtime import Runtime, Branch, Event
-from toolkit.ev3.simulation.lib.utilities import call_handler, evaluate_value
+from toolkit.ev3.simulation.brick import Sensor
+from toolkit.ev3.simulation.sensor_events import parse_sensor_label
+from toolkit.ev3.simulation.lib.utilities import call_handler
 
 
 log = logging.getLogger(__name__)
 
 
+def find_sensor(runtime: Runtime, label: str) -> Optional[Sensor]:
+    """The sensor of a label, if one of the labelled type is connected."""
+    port, type = parse_sensor_label(label)
+    sensor = runtime.globals["brick"].sensors.get(port)
+    return sensor if sensor is not None and sensor.type == type else None
+
+
 @call_handler("buttonWaitUntil")
 def handle_button_wait_until(runtime: Runtime, block: Block, branch: Branch) -> None:
     button = block.fields["button"].value
@@ -20,10 +29,13 @@ def handle_button_wait_until(runtime: Runtime, block: Block, branch: Branch) ->
     log.debug("Locking branch, waiting for event {}".format(branch.lock))
 
 
-@call_handler("colorpauseUntilColorDetectedDetected")
-def handle_colorpause_until_color_detected_detected(runtime: Runtime, block: Block, branch: Branch) -> None:
-    color = evaluate_value(block.values["color"])
+@call_handler("colorpauseUntilColorDetectedDetected", values=["color"])
+def handle_colorpause_until_color_detected_detected(runtime: Runtime, block: Block, branch: Branch, color: Any) -> None:
     sensor = block.fields["this"].value
+    # Like PXT, don't wait if the color is already detected
+    connected_sensor = find_sensor(runtime, sensor)
+    if connected_sensor is not None and connected_sensor.values.get("color") == color:
+        return
     branch.lock = Event(event="colorOnColorDetected", parameters={"color": color, "sensor": sensor})
     log.debug("Locking branch, waiting for event {}".format(branch.lock))
 
@@ -33,7 +45,12 @@ def handle_color_pause_until_light_detected(runtime: Runtime, block: Block, bran
     #  {'type': 'colorPauseUntilLightDetected', 'values': {}, 'fields': {'this': BlockField(name='this', id=None, variable_type=None, value='sensors.color3'), 'mode': BlockField(name='mode', id=None, variable_type=None, value='LightIntensityMode.Reflected'), 'condition': BlockField(name='condition', id=None, variable_type=None, value='Light.Dark')}, 'statements': {}}
     mode = block.fields["mode"].value
     sensor = block.fields["this"].value
-    branch.lock = Event(event="colorOnLightDetected", parameters={"mode": mode, "sensor": sensor})
+    condition = block.fields["condition"].value
+    # Like PXT, don't wait if the condition is already detected
+    connected_sensor = find_sensor(runtime, sensor)
+    if connected_sensor is not None and mode == "LightIntensityMode.Reflected" and connected_sensor.light_condition == condition:
+        return
+    branch.lock = Event(event="colorOnLightDetected", parameters={"mode": mode, "condition": condition, "sensor": sensor})
     log.debug("Locking branch, waiting for event {}".format(branch.lock))
 
 
@@ -2,19 +2,19 @@ import sys
 import logging
 import os
 from functools import wraps
-from typing import Dict, Set, List, Callable, Any, Optional
+from typing import Dict, Set, List, Callable, Any, Optional, Sequence, Union
 from inspect import getmembers, ismethod
 from glob import glob
 
-from toolkit.ev3.simulation.block.block import BlockValue
-
 log = logging.getLogger(__name__)
 __handlers: Dict[str, Callable[..., Any]] = {}
 
 
-def call_handler(call: str) -> Callable[..., Any]:
-    """Register a call handler."""
+def call_handler(call: str, values: Union[Sequence[str], Dict[str, str]] = ()) -> Callable[..., Any]:
+    """Register a call handler, to which the constants of the given values of its block are passed as keyword arguments, optionally mapped to other parameter names."""
     def decorator(handler: Callable[..., Any]) -> Any:
+        # Looked up by the program, which binds the constants once when compiling a block
+        handler.values = dict(values) if isinstance(values, dict) else {name: name for name in values}  # type: ignore
         __handlers[call] = handler
         return handler
     return decorator
@@ -24,26 +24,3 @@ def get_all_handlers() -> Dict[str, Callable[... , Any]]:
     """Get all available call handlers."""
     return __handlers
 
-
-def evaluate_value(value: BlockValue) -> Any:
-    if value.shadow.type == "math_number":
-        return int(value.shadow.fields["NUM"].value)
-    elif value.shadow.type == "motorSpeedPicker":
-        return int(value.shadow.fields["speed"].value)
-    elif value.shadow.type == "timePicker":
-        return int(value.shadow.fields["ms"].value)
-    elif value.shadow.type == "text":
-        return value.shadow.fields["TEXT"].value
-    elif value.shadow.type == "colorEnumPicker":
-        return value.shadow.fields["color"].value
-    elif value.shadow.type == "screen_image_picker":
-        return value.shadow.fields["image"].value
-    elif value.shadow.type == "math_number_minmax":
-        if "SLIDER" in value.shadow.fields:
-            return int(value.shadow.fields["SLIDER"].value)
-        else:
-            log.debug(value.shadow)
-            raise Exception("Unimplemented math_number_minmax subtype '{}'".format(value.shadow.type))
-
-    log.debug(value.shadow)
-    raise Exception("Unimplemented value type '{}'".format(value.shadow.type))
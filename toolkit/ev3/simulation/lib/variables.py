@@ -6,15 +6,14 @@ from inspect import getmembers, ismethod
 
 from toolkit.ev3.simulation.block.block import Block, BlockValue
 from toolkit.ev3.simulation.runtime import Runtime, Branch
-from toolkit.ev3.simulation.lib.utilities import call_handler, evaluate_value
+from toolkit.ev3.simulation.lib.utilities import call_handler
 
 
 log = logging.getLogger(__name__)
 
 
-@call_handler("variablesSet")
-def handle_variables_set(runtime: Runtime, block: Block, branch: Branch) -> None:
+@call_handler("variablesSet", values={"VALUE": "value"})
+def handle_variables_set(runtime: Runtime, block: Block, branch: Branch, value: Any) -> None:
     id = block.fields["VAR"].id
-    value = evaluate_value(block.values["VALUE"])
     log.debug("Setting variable '{}' to '{}'".format(id, value))
     runtime.set_variable(id, value)
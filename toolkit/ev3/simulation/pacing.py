@@ -0,0 +1,229 @@
+import time
+import logging
+from typing import Callable, Optional
+from dataclasses import dataclass
+
+from toolkit.ev3.simulation.runtime import Runtime
+
+
+log = logging.getLogger(__name__)
+
+# Remaining time in seconds until a tick which is waited for by spinning
+# rather than sleeping, as sleeping is not precise enough for short waits
+SPIN_THRESHOLD = 0.0005
+# Lag in ticks after which the pacer gives up on catching up and continues
+# from the current time instead
+MAX_LAG_TICKS = 10
+
+
+@dataclass(frozen=True)
+class Pacing:
+    # Simulated time per wall-clock time, or None to run as fast as possible
+    scale: Optional[float]
+    # Number of ticks per second of simulated time at maximum speed, or of
+    # wall-clock time otherwise
+    tick_rate: float = 60.0
+
+    @property
+    def is_max_speed(self) -> bool:
+        """Whether or not the simulation runs as fast as possible."""
+        return self.scale is None
+
+    @property
+    def tick_period(self) -> float:
+        """The duration of a tick in seconds."""
+        return 1 / self.tick_rate
+
+    @staticmethod
+    def realtime(tick_rate: float = 60.0) -> "Pacing":
+        """Run the simulated time along with the wall-clock time."""
+        return Pacing(scale=1.0, tick_rate=tick_rate)
+
+    @staticmethod
+    def scaled(scale: float, tick_rate: float = 60.0) -> "Pacing":
+        """Run the simulated time scale times faster than the wall-clock time."""
+        if scale <= 0:
+            raise Exception("The scale must be positive, got {}".format(scale))
+        return Pacing(scale=scale, tick_rate=tick_rate)
+
+    @staticmethod
+    def max_speed(tick_rate: float = 60.0) -> "Pacing":
+        """Run the simulated time as fast as possible."""
+        return Pacing(scale=None, tick_rate=tick_rate)
+
+    @staticmethod
+    def parse(value: str, tick_rate: float = 60.0) -> "Pacing":
+        """Parse a pacing mode, either 'realtime', 'max' or a scale such as '2' or '2x'."""
+        if value == "realtime":
+            return Pacing.realtime(tick_rate)
+        if value in ("max", "max-speed"):
+            return Pacing.max_speed(tick_rate)
+        try:
+            return Pacing.scaled(float(value.rstrip("x")), tick_rate)
+        except ValueError:
+            raise Exception("Unknown pacing mode '{}'".format(value))
+
+
+@dataclass
+class PacingStatistics:
+    ticks: int = 0
+    steps: int = 0
+    # Elapsed wall-clock time in seconds
+    elapsed: float = 0.0
+    # Elapsed simulated time in microseconds
+    simulated: int = 0
+    # Delay of the ticks behind their schedule in seconds
+    total_lag: float = 0.0
+    max_lag: float = 0.0
+    # Number of times the pacer fell too far behind and skipped ticks
+    resyncs: int = 0
+
+    @property
+    def steps_per_second(self) -> float:
+        """Achieved steps per second of wall-clock time."""
+        return self.steps / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def ticks_per_second(self) -> float:
+        """Achieved ticks per second of wall-clock time."""
+        return self.ticks / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mean_lag(self) -> float:
+        """Mean delay of the ticks behind their schedule in seconds."""
+        return self.total_lag / self.ticks if self.ticks > 0 else 0.0
+
+    @property
+    def achieved_scale(self) -> float:
+        """Achieved simulated time per wall-clock time."""
+        return self.simulated / 1000000 / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class Pacer:
+    """Drive a runtime in ticks of simulated time, paced against the wall-clock time."""
+    def __init__(self, runtime: Runtime, pacing: Pacing, max_steps_per_tick: int = 10000) -> None:
+        self.__runtime = runtime
+        self.__pacing = pacing
+        # Upper bound of steps per tick, so that busy branches cannot stall ticks
+        self.__max_steps_per_tick = max_steps_per_tick
+        self.__statistics = PacingStatistics()
+        # Estimated overshoot of sleeping in seconds, subtracted from sleeps
+        self.__oversleep = 0.0
+        # Simulated time per tick in microseconds
+        period = pacing.tick_period
+        self.__tick_time = int(period * (1 if pacing.is_max_speed else pacing.scale) * 1000000)
+        # Wall-clock and simulated time of the first tick, set once it runs
+        self.__start: Optional[float] = None
+        self.__start_time = 0
+        # Schedule anchor, moved forward whenever the pacer falls too far
+        # behind, and the time at which the next tick is due
+        self.__anchor = 0.0
+        self.__anchor_ticks = 0
+        self.__deadline = 0.0
+
+    @property
+    def pacing(self) -> Pacing:
+        """The pacing mode."""
+        return self.__pacing
+
+    @property
+    def tick_time(self) -> int:
+        """The simulated time per tick in microseconds."""
+        return self.__tick_time
+
+    @property
+    def max_steps_per_tick(self) -> int:
+        """The upper bound of steps per tick."""
+        return self.__max_steps_per_tick
+
+    @property
+    def statistics(self) -> PacingStatistics:
+        """The statistics since the pacer started running."""
+        return self.__statistics
+
+    @property
+    def is_started(self) -> bool:
+        """Whether or not the pacer ran its first tick."""
+        return self.__start is not None
+
+    def tick(self, end_time: Optional[int] = None) -> Optional[float]:
+        """Run a single tick of simulated time, but never beyond end_time if specified.
+
+        Returns the wall-clock time of time.perf_counter() at which the next
+        tick is due, or None if it may run right away. This lets a caller
+        interleave the ticks of several pacers, or wait for other things.
+        """
+        runtime = self.__runtime
+        pacing = self.__pacing
+        statistics = self.__statistics
+        period = pacing.tick_period
+
+        now = time.perf_counter()
+        if self.__start is None:
+            self.__start = now
+            self.__start_time = runtime.time
+            self.__anchor = now
+            self.__anchor_ticks = 0
+        elif not pacing.is_max_speed:
+            lag = max(0.0, now - self.__deadline)
+            statistics.total_lag += lag
+            statistics.max_lag = max(statistics.max_lag, lag)
+            if lag > MAX_LAG_TICKS * period:
+                log.debug("Fell behind by {:.1f}ms, skipping ticks".format(lag * 1000))
+                statistics.resyncs += 1
+                self.__anchor = now
+                self.__anchor_ticks = statistics.ticks
+
+        target_time = runtime.time + self.__tick_time
+        if end_time is not None:
+            target_time = min(target_time, end_time)
+        result = runtime.run_until(None, self.__max_steps_per_tick, target_time)
+        # Busy branches may keep the runtime from reaching the tick's time
+        runtime.advance_time(target_time - runtime.time)
+
+        statistics.ticks += 1
+        statistics.steps += result.steps
+        statistics.simulated = runtime.time - self.__start_time
+        statistics.elapsed = time.perf_counter() - self.__start
+
+        if pacing.is_max_speed:
+            if not runtime.is_runnable and runtime.next_deadline is None and end_time is None:
+                # Only external events can change anything, so wait for them
+                return time.perf_counter() + period
+            return None
+        self.__deadline = self.__anchor + (statistics.ticks - self.__anchor_ticks) * period
+        return self.__deadline
+
+    def run(self, duration: Optional[int] = None, on_tick: Optional[Callable[[PacingStatistics], None]] = None, should_stop: Optional[Callable[[], bool]] = None) -> PacingStatistics:
+        """Run ticks for a duration of simulated time in microseconds, or until stopped.
+
+        The callback on_tick is invoked after each tick, such as to update a frontend.
+        """
+        runtime = self.__runtime
+        end_time = None if duration is None else runtime.time + duration
+        while should_stop is None or not should_stop():
+            if end_time is not None and runtime.time >= end_time:
+                break
+            deadline = self.tick(end_time)
+            if on_tick is not None:
+                on_tick(self.__statistics)
+            if deadline is not None:
+                self.__wait(deadline)
+        return self.__statistics
+
+    def __wait(self, deadline: float) -> None:
+        """Wait until a deadline, sleeping for most of the time and spinning for the rest."""
+        now = time.perf_counter()
+        remaining = deadline - now
+        if remaining <= 0:
+            return
+
+        sleep = remaining - SPIN_THRESHOLD - self.__oversleep
+        if sleep > 0:
+            time.sleep(sleep)
+            # Track how much longer sleeps take than requested
+            oversleep = time.perf_counter() - now - sleep
+            self.__oversleep = max(0.0, 0.9 * self.__oversleep + 0.1 * oversleep)
+
+        while time.perf_counter() < deadline:
+            pass
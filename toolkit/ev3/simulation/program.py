@@ -0,0 +1,107 @@
+import re
+from functools import partial
+from typing import Dict, List, Callable, Any, Optional
+from dataclasses import dataclass
+
+from toolkit.ev3.simulation.block.block import Block
+from toolkit.ev3.simulation.block.source import BlockSource
+
+
+@dataclass
+class Instruction:
+    __slots__ = ("block", "handler", "disabled", "next")
+    # The block the instruction was compiled from
+    block: Block
+    # The resolved block handler
+    handler: Callable[..., None]
+    disabled: bool
+    # Index of the next instruction of the chain, or -1 at the end of the chain
+    next: int
+
+
+def missing_handler(type: str) -> Callable[..., None]:
+    """Create a handler for a block type without an implementation, which raises once invoked."""
+    def handle(runtime: Any, block: Block, branch: Any) -> None:
+        print("\n\n# To implement this call, use the following generated stub and place it in the correct category under tools/ev3/simulation/lib")
+        print("@call_handler(\"{}\")\ndef handle_{}(runtime: Runtime, block: Block, branch: Branch) -> None:".format(block.type, re.sub(r'(?<!^)(?=[A-Z])', '_', block.type).lower()))
+        values = {
+            "type": block.type,
+            "values": block.values,
+            "fields": block.fields,
+            "statements": block.statements
+        }
+        print("\t# {}\n\n".format(values))
+        raise Exception("No block handler registered for type '{}'".format(block.type))
+    return handle
+
+
+def unresolved_value(name: str) -> Callable[..., None]:
+    """Create a handler for a block with a value that is missing or not folded into a constant, which raises once invoked."""
+    def handle(runtime: Any, block: Block, branch: Any) -> None:
+        if name not in block.values:
+            raise Exception("Missing value '{}' of block type '{}'".format(name, block.type))
+        raise Exception("Unimplemented value type '{}'".format(block.values[name].shadow.type))
+    return handle
+
+
+def bind_values(handler: Callable[..., None], block: Block) -> Callable[..., None]:
+    """Bind the constants of the values a handler takes to it, so they are looked up once when compiling rather than on every call."""
+    constants: Dict[str, Any] = {}
+    for name, parameter in getattr(handler, "values", {}).items():
+        value = block.values.get(name)
+        # Blocks such as variables are not folded into constants
+        if value is None or not value.resolved:
+            return unresolved_value(name)
+        constants[parameter] = value.constant
+    return partial(handler, **constants) if len(constants) > 0 else handler
+
+
+class Program:
+    """A block source compiled into a flat array of instructions, one chain after the other."""
+    def __init__(self, source: BlockSource, handlers: Dict[str, Callable[..., None]]) -> None:
+        self.__instructions: List[Instruction] = []
+        # Index of the instruction compiled from a block, by block id
+        self.__entries: Dict[int, int] = {}
+        # Compiled blocks by id
+        self.__blocks: Dict[int, Block] = {}
+
+        for block in source.blocks:
+            self.__compile_chain(block, handlers)
+
+    @property
+    def instructions(self) -> List[Instruction]:
+        """All instructions."""
+        return self.__instructions
+
+    def entry(self, block: Block) -> int:
+        """The index of the instruction compiled from a block."""
+        return self.__entries[block.id]
+
+    def block(self, id: int) -> Block:
+        """The compiled block of an id."""
+        return self.__blocks[id]
+
+    def __compile_chain(self, block: Block, handlers: Dict[str, Callable[..., None]]) -> None:
+        """Compile a chain of blocks into consecutive instructions, followed by their statements."""
+        chain: List[Block] = []
+        current: Optional[Block] = block
+        while current is not None:
+            chain.append(current)
+            current = current.next
+
+        for current in chain:
+            index = len(self.__instructions)
+            self.__entries[current.id] = index
+            self.__blocks[current.id] = current
+            handler = bind_values(handlers[current.type], current) if current.type in handlers else missing_handler(current.type)
+            self.__instructions.append(Instruction(
+                block=current,
+                handler=handler,
+                disabled=bool(current.disabled),
+                next=-1 if current.next is None else index + 1
+            ))
+
+        for current in chain:
+            for statement in current.statements.values():
+                if statement is not None:
+                    self.__compile_chain(statement, handlers)
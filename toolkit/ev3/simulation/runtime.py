@@ -1,37 +1,57 @@
+import heapq
 import logging
-import re
-from typing import Dict, Set, List, Callable, Any, Optional, Union
+from typing import Dict, Set, List, Callable, Any, Optional, Union, Tuple, FrozenSet
 from queue import Queue
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
 
 from toolkit.ev3.simulation.block.block import Block
 from toolkit.ev3.simulation.block.source import BlockSource
+from toolkit.ev3.simulation.program import Program
 
 
 log = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Event:
     event: str
     parameters: Dict[str, Union[str, int]]
+    # The key identifying the event and its hash, computed once as events are
+    # compared whenever one is triggered
+    key: Tuple[str, FrozenSet[Tuple[str, Union[str, int]]]] = field(init=False, repr=False)
+    hash: int = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        key = (self.event, frozenset(self.parameters.items()))
+        object.__setattr__(self, "key", key)
+        object.__setattr__(self, "hash", hash(key))
+
+    def __hash__(self) -> int:
+        return self.hash
 
-    def __hash__(self) -> bytes:
-        return hash((self.event, hash(frozenset(self.parameters.items()))))
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # String hashes differ between processes, so recompute them when unpickled
+        return (Event, (self.event, self.parameters))
 
     def __eq__(self, other: "Event") -> bool:
-        if other is None:
+        if self is other:
+            return True
+        if not isinstance(other, Event):
             return False
 
-        return hash(other) == hash(self)
+        return self.hash == other.hash and self.key == other.key
 
 @dataclass
 class Branch:
     root: Block
     step: int
-    current_block: Block
+    # Index of the current instruction in the compiled program
+    pc: int
     parent_branch: Optional["Branch"]
     lock: Event
+    # The event which caused the branch to be added, if any
+    trigger: Optional[Event] = None
 
     @property
     def id(self) -> int:
@@ -42,6 +62,53 @@ class StepResult:
     processed_branch: Branch
     completed_branch: bool
 
+@dataclass
+class RunStatistics:
+    # Number of steps taken
+    steps: int
+    # Number of steps which executed a block
+    executed: int
+    # Number of steps spent on locked branches
+    locked: int
+    # Number of branches which completed
+    completed_branches: int
+    # Whether or not the condition was met, when running until a condition
+    condition_met: bool
+    # Whether or not there were no branches left to run
+    idle: bool
+    # Whether or not the remaining branches are all waiting for events
+    blocked: bool
+
+@dataclass(frozen=True)
+class RuntimeSnapshot:
+    """The state of a runtime, referring to blocks by id so that the compiled blocks are shared rather than copied."""
+    # Simulated time in microseconds
+    time: int
+    variables: Dict[str, Any]
+    # Ids of the handler blocks by event
+    event_handlers: Dict[Event, Tuple[int, ...]]
+    repeating_events: Dict[Event, int]
+    # Ids of the blocks of functions by name
+    functions: Dict[str, int]
+    # Branches as the id of their root block, step, pc, index of their parent
+    # branch (or -1), lock and trigger
+    branches: Tuple[Tuple[int, int, int, int, Optional[Event], Optional[Event]], ...]
+    # Indices of the ready branches, and of the waiting branches by event
+    ready_branches: Tuple[int, ...]
+    waiting_branches: Dict[Event, Tuple[int, ...]]
+    blocked_branch_count: int
+    # Timers as deadline, sequence number and either an event or the name of
+    # a registered callback
+    timers: Tuple[Tuple[int, int, Union[Event, str]], ...]
+    timer_count: int
+    sleeping_branch_count: int
+    activity_count: int
+
+# Outcomes of a single step
+STEP_EXECUTED = 0
+STEP_LOCKED = 1
+STEP_COMPLETED = 2
+
 class Runtime:
     def __init__(self, source: BlockSource) -> None:
         self.__source = source
@@ -49,14 +116,45 @@ class Runtime:
         self.__variables: Dict[str, Any] = {}
         # Handlers for events
         self.__event_handlers: Dict[Event, Set[Block]] = {}
-
-        # The currently active branch
-        self.__current_branch = None
-        # All available branches
-        self.__branches: List[Branch] = []
+        # Events which are triggered again for a handler once its branch
+        # completes, along with the delay before doing so in microseconds
+        self.__repeating_events: Dict[Event, int] = {}
+
+        # Simulated time in microseconds
+        self.__time = 0
+        # Timers as a heap of deadlines, sequence numbers (to keep the order
+        # stable) and either the events waking sleeping branches or callbacks
+        self.__timers: List[Tuple[int, int, Union[Event, Callable[[], None]]]] = []
+        self.__timer_count = 0
+        # Number of timers of sleeping branches
+        self.__sleeping_branch_count = 0
+        # Number of ongoing time-driven activities, such as scheduled motors,
+        # which will trigger events once enough simulated time passes
+        self.__activity_count = 0
+
+        # The branch being processed
+        self.__current_branch: Optional[Branch] = None
+        # Branches which can run, in the order they will run
+        self.__ready_branches: "deque[Branch]" = deque()
+        # Locked branches by the event they are waiting for
+        self.__waiting_branches: Dict[Event, List[Branch]] = {}
+        # Number of locked branches
+        self.__blocked_branch_count = 0
+        # Invoked whenever branches start waiting for an event or a handler is
+        # registered for one, and whenever the waiting branches are released
+        self.__wait_listeners: List[Callable[[Event, bool], None]] = []
+        # Events of the completion of branches by the id of their root block,
+        # created once as branches complete on every iteration of loops
+        self.__completion_events: Dict[int, Event] = {}
+        # Callbacks of timers by name and the reverse, so that timers can be
+        # captured by snapshots
+        self.__callbacks: Dict[str, Callable[[], None]] = {}
+        self.__callback_names: Dict[Callable[[], None], str] = {}
 
         # Block handlers / function implementations
         self.__handlers: Dict[str, Callable[["Runtime", Block, Branch], None]] = {}
+        # The source compiled with the registered handlers, compiled on demand
+        self.__program: Optional[Program] = None
         # Declared functions
         self.__functions: Dict[str, Block] = {}
 
@@ -67,20 +165,55 @@ class Runtime:
             self.__variables[id] = None
 
     @property
-    def current_branch(self) -> int:
-        """The current branch being processed."""
-        return self.__current_branch
+    def current_branch(self) -> Optional[Branch]:
+        """The current branch being processed, or the next one to be processed."""
+        if self.__current_branch is not None:
+            return self.__current_branch
+        return self.__ready_branches[0] if self.__ready_branches else None
 
     @property
     def branches(self) -> List[Branch]:
-        """Currently available branches."""
-        return self.__branches
+        """Currently available branches, the ones that can run first."""
+        blocked_branches = [branch for branches in self.__waiting_branches.values() for branch in branches if branch.lock is not None]
+        return list(self.__ready_branches) + blocked_branches
+
+    @property
+    def is_runnable(self) -> bool:
+        """Whether or not there is a branch which can run, now or once enough simulated time passes."""
+        return len(self.__ready_branches) > 0 or self.__is_advancing
+
+    @property
+    def is_blocked(self) -> bool:
+        """Whether or not there are branches, but all of them are waiting for external events."""
+        return len(self.__ready_branches) == 0 and not self.__is_advancing and self.__blocked_branch_count > 0
+
+    @property
+    def __is_advancing(self) -> bool:
+        """Whether or not letting the simulated time pass may wake a branch."""
+        return len(self.__timers) > 0 and (self.__sleeping_branch_count > 0 or self.__activity_count > 0)
+
+    @property
+    def time(self) -> int:
+        """Simulated time in microseconds."""
+        return self.__time
+
+    @property
+    def next_deadline(self) -> Optional[int]:
+        """The simulated time at which the next timer expires, if any."""
+        return self.__timers[0][0] if self.__timers else None
 
     @property
     def globals(self) -> Dict[str, Any]:
         """Global values available in the runtime."""
         return self.__globals
 
+    @property
+    def program(self) -> Program:
+        """The compiled program."""
+        if self.__program is None:
+            self.__program = Program(self.__source, self.__handlers)
+        return self.__program
+
     @property
     def functions(self) -> Dict[str, Block] :
         """Defined functions."""
@@ -95,46 +228,118 @@ class Runtime:
         if not name in self.__functions:
             raise Exception("No such function '{}'".format(name))
 
-        current_branch = self.__branches[self.__current_branch]
+        current_branch = self.__current_branch
         # Create a branch for the function
         branch = self.add_branch(self.__functions[name])
         # Lock the current branch until the function's branch is completed
-        lock = Event(event="completed_branch_{}".format(branch.id), parameters={})
+        lock = self.__completion_event(branch.id)
         log.debug("Locking current branch '{}' until branch '{}' completes with lock {}".format(current_branch.id, branch.id, lock))
         current_branch.lock = lock
 
     def start(self) -> None:
         """Start the runtime. Needs to be called before evaluation, after handlers are registered."""
         # Evaluate root blocks (event handlers)
+        instructions = self.program.instructions
         for block in self.__source.blocks:
-            self.__invoke(block, None)
+            instruction = instructions[self.program.entry(block)]
+            log.info("Invoking block: {}".format(block.type))
+            instruction.handler(self, block, None)
 
     def set_variable(self, id: str, value: Any) -> None:
         """Set a variable by id."""
         self.__variables[id] = value
 
-    def add_branch(self, block: Block, parent_branch: Branch = None) -> Branch:
+    def add_branch(self, block: Block, parent_branch: Branch = None, trigger: Event = None) -> Branch:
         """Add a branch for evaluation."""
-        branch = Branch(root=block, step=0, current_block=block, parent_branch=parent_branch, lock=None)
-        self.__branches.append(branch)
-        if self.__current_branch is None:
-            self.__current_branch = 0
+        branch = Branch(root=block, step=0, pc=self.program.entry(block), parent_branch=parent_branch, lock=None, trigger=trigger)
+        self.__ready_branches.append(branch)
         return branch
 
+    def sleep(self, branch: Branch, duration: int) -> None:
+        """Lock a branch for a duration of simulated time in microseconds."""
+        self.__timer_count += 1
+        self.__sleeping_branch_count += 1
+        branch.lock = Event(event="timer", parameters={"timer": self.__timer_count})
+        heapq.heappush(self.__timers, (self.__time + max(duration, 0), self.__timer_count, branch.lock))
+
+    def call_later(self, delay: int, callback: Callable[[], None]) -> None:
+        """Invoke a callback once a delay of simulated time in microseconds passes, such as to update physics."""
+        self.__timer_count += 1
+        heapq.heappush(self.__timers, (self.__time + max(delay, 0), self.__timer_count, callback))
+
+    def register_callback(self, name: str, callback: Callable[[], None]) -> None:
+        """Register a callback of timers by name, such as a physics update, so that its timers can be restored from snapshots."""
+        self.__callbacks[name] = callback
+        self.__callback_names[callback] = name
+
+    def begin_activity(self) -> None:
+        """Begin a time-driven activity, letting the simulated time pass while no branch can run until it ends."""
+        self.__activity_count += 1
+
+    def end_activity(self) -> None:
+        """End a time-driven activity."""
+        self.__activity_count -= 1
+
+    def advance_time(self, duration: int) -> None:
+        """Advance the simulated time by a duration in microseconds, waking any branches whose timers expire."""
+        self.__advance_to(self.__time + duration)
+
+    def __advance_to(self, time: int) -> None:
+        """Advance the simulated time, expiring timers in the order of their deadlines."""
+        timers = self.__timers
+        while timers and timers[0][0] <= time:
+            deadline, _, target = heapq.heappop(timers)
+            self.__time = deadline
+            if isinstance(target, Event):
+                self.__sleeping_branch_count -= 1
+                self.__trigger(target)
+            else:
+                target()
+        self.__time = max(self.__time, time)
+
     def trigger_event(self, _event: str, **kwargs: Any) -> None:
         """Trigger an event by name."""
-        event = Event(event=_event, parameters=kwargs)
+        self.__trigger(Event(event=_event, parameters=kwargs))
 
-        if event in self.__event_handlers:
-            for handler in self.__event_handlers[event]:
-                self.add_branch(handler)
+    def trigger(self, event: Event) -> None:
+        """Trigger an event."""
+        self.__trigger(event)
+
+    def register_wait_listener(self, listener: Callable[[Event, bool], None]) -> None:
+        """Register a listener invoked with an event and True once it is waited for, or False once its waiting branches are released.
+
+        Registering an event handler counts as waiting for the event for good.
+        """
+        self.__wait_listeners.append(listener)
+        self.notify_waits(listener)
 
-        for branch in self.__branches:
-            if branch.lock == event:
-                log.debug("Unlocked branch '{}'".format(branch.id))
-                branch.lock = None
+    def notify_waits(self, listener: Callable[[Event, bool], None]) -> None:
+        """Invoke a listener with each event which is waited for or has a handler, such as to rebuild an index."""
+        for event in self.__event_handlers:
+            listener(event, True)
+        for event in self.__waiting_branches:
+            listener(event, True)
 
-        log.info("Triggered event '{}'".format(event))
+    def __trigger(self, event: Event) -> None:
+        """Trigger an event."""
+        if event in self.__event_handlers:
+            for handler in self.__event_handlers[event]:
+                self.add_branch(handler, trigger=event)
+
+        # Only the branches waiting for the event need to be visited
+        waiting_branches = self.__waiting_branches.pop(event, None)
+        if waiting_branches is not None:
+            for branch in waiting_branches:
+                if branch.lock == event:
+                    log.debug("Unlocked branch '{}'".format(branch.id))
+                    branch.lock = None
+                    self.__blocked_branch_count -= 1
+                    self.__ready_branches.append(branch)
+            for listener in self.__wait_listeners:
+                listener(event, False)
+
+        if log.isEnabledFor(logging.INFO):
+            log.info("Triggered event '{}'".format(event))
 
     def register_event_handler(self, _event: str, handler: Block, **kwargs: Any) -> None:
         """Register a handler for an event by name."""
@@ -142,66 +347,271 @@ class Runtime:
         if event not in self.__event_handlers:
             self.__event_handlers[event] = []
         self.__event_handlers[event].append(handler)
+        for listener in self.__wait_listeners:
+            listener(event, True)
         log.info("Registered event handler for event {}".format(event))
 
+    def repeat_event(self, _event: str, _delay: int = 0, **kwargs: Any) -> None:
+        """Restart a handler of an event by name whenever its branch completes, such as for forever.
+
+        The handler is restarted after a delay of simulated time in microseconds.
+        """
+        self.__repeating_events[Event(event=_event, parameters=kwargs)] = _delay
+
     def register_handler(self, type: str, handler: Callable[[Block, Branch], None]) -> None:
         """Register a handler for a type of call."""
         self.__handlers[type] = handler;
-
-    def __invoke(self, block: Block, branch: Branch) -> None:
-        """Invoke a block call."""
-        if block.type in self.__handlers:
-            log.info("Invoking block: {}".format(block.type))
-            self.__handlers[block.type](self, block, branch)
-        else:
-            print("\n\n# To implement this call, use the following generated stub and place it in the correct category under tools/ev3/simulation/lib")
-            print("@call_handler(\"{}\")\ndef handle_{}(runtime: Runtime, block: Block, branch: Branch) -> None:".format(block.type, re.sub(r'(?<!^)(?=[A-Z])', '_', block.type).lower()))
-            values = {
-                "type": block.type,
-                "values": block.values,
-                "fields": block.fields,
-                "statements": block.statements
-            }
-            print("\t# {}\n\n".format(values))
-            raise Exception("No block handler registered for type '{}'".format(block.type))
-
+        # Recompile with the new handler on demand
+        self.__program = None
+
+    def snapshot(self) -> RuntimeSnapshot:
+        """Capture the state of the runtime between steps."""
+        if self.__current_branch is not None:
+            raise Exception("Unable to snapshot the runtime while a branch is processed")
+
+        # Number the branches, including parents which already completed
+        indices: Dict[int, int] = {}
+        branches: List[Branch] = []
+
+        def number(branch: Optional[Branch]) -> int:
+            if branch is None:
+                return -1
+            index = indices.get(id(branch))
+            if index is None:
+                index = len(branches)
+                indices[id(branch)] = index
+                branches.append(branch)
+                number(branch.parent_branch)
+            return index
+
+        ready_branches = tuple(number(branch) for branch in self.__ready_branches)
+        waiting_branches = {event: tuple(number(branch) for branch in waiting) for event, waiting in self.__waiting_branches.items()}
+
+        timers = []
+        for deadline, sequence, target in self.__timers:
+            if not isinstance(target, Event):
+                if target not in self.__callback_names:
+                    raise Exception("Unable to snapshot timer of unregistered callback {}".format(target))
+                target = self.__callback_names[target]
+            timers.append((deadline, sequence, target))
+
+        return RuntimeSnapshot(
+            time=self.__time,
+            # Values of variables are numbers, strings and booleans, which are immutable
+            variables=dict(self.__variables),
+            event_handlers={event: tuple(block.id for block in handlers) for event, handlers in self.__event_handlers.items()},
+            repeating_events=dict(self.__repeating_events),
+            functions={name: block.id for name, block in self.__functions.items()},
+            branches=tuple(
+                (branch.root.id, branch.step, branch.pc, number(branch.parent_branch), branch.lock, branch.trigger)
+                for branch in branches
+            ),
+            ready_branches=ready_branches,
+            waiting_branches=waiting_branches,
+            blocked_branch_count=self.__blocked_branch_count,
+            timers=tuple(timers),
+            timer_count=self.__timer_count,
+            sleeping_branch_count=self.__sleeping_branch_count,
+            activity_count=self.__activity_count
+        )
+
+    def restore(self, snapshot: RuntimeSnapshot) -> None:
+        """Restore the state of a snapshot of a runtime of the same source, such as one taken by another process.
+
+        Wait listeners are not notified, as they are expected to rebuild their
+        state through notify_waits.
+        """
+        program = self.program
+        block = program.block
+
+        branches: List[Branch] = []
+        for root, step, pc, _, lock, trigger in snapshot.branches:
+            branches.append(Branch(root=block(root), step=step, pc=pc, parent_branch=None, lock=lock, trigger=trigger))
+        for branch, (_, _, _, parent, _, _) in zip(branches, snapshot.branches):
+            if parent != -1:
+                branch.parent_branch = branches[parent]
+
+        timers = []
+        for deadline, sequence, target in snapshot.timers:
+            if not isinstance(target, Event):
+                if target not in self.__callbacks:
+                    raise Exception("Unable to restore timer of unregistered callback '{}'".format(target))
+                target = self.__callbacks[target]
+            timers.append((deadline, sequence, target))
+        # The timers were captured in heap order
+        self.__timers = timers
+
+        self.__time = snapshot.time
+        self.__variables = dict(snapshot.variables)
+        self.__event_handlers = {event: [block(handler) for handler in handlers] for event, handlers in snapshot.event_handlers.items()}
+        self.__repeating_events = dict(snapshot.repeating_events)
+        self.__functions = {name: block(function) for name, function in snapshot.functions.items()}
+        self.__current_branch = None
+        self.__ready_branches = deque(branches[index] for index in snapshot.ready_branches)
+        self.__waiting_branches = {event: [branches[index] for index in waiting] for event, waiting in snapshot.waiting_branches.items()}
+        self.__blocked_branch_count = snapshot.blocked_branch_count
+        self.__timer_count = snapshot.timer_count
+        self.__sleeping_branch_count = snapshot.sleeping_branch_count
+        self.__activity_count = snapshot.activity_count
 
     def step(self) -> Optional[StepResult]:
-        """Execute one step."""
-        if self.__current_branch is None:
-            return
+        """Execute one step of the next branch which can run, jumping ahead to the next timer if none can."""
+        while not self.__ready_branches:
+            if not self.__is_advancing:
+                return
+            self.__advance_to(self.__timers[0][0])
+
+        processed_branch = self.__ready_branches[0]
+        outcome = self.__step()
+        return StepResult(processed_branch=processed_branch, completed_branch=outcome == STEP_COMPLETED)
+
+    def run_steps(self, count: int) -> RunStatistics:
+        """Execute up to count steps, stopping early if there are no branches which can run."""
+        return self.run_until(None, count)
+
+    def run_until(self, condition: Optional[Callable[[], bool]], max_steps: int, max_time: Optional[int] = None) -> RunStatistics:
+        """Execute steps until the condition is met, checked before each step, or up to max_steps steps.
+
+        Whenever no branch can run, the simulated time jumps ahead to the next
+        timer, but never beyond max_time if specified.
+        """
+        executed = 0
+        locked = 0
+        completed = 0
+        condition_met = False
+        # The instructions are dispatched directly rather than through __step,
+        # as this loop runs for every block
+        instructions = self.program.instructions
+        ready_branches = self.__ready_branches
+        popleft = ready_branches.popleft
+        append = ready_branches.append
+        wait = self.__wait
+        timers = self.__timers
+        logging_info = log.isEnabledFor(logging.INFO)
+        steps = 0
+        while steps < max_steps:
+            if not ready_branches:
+                if max_time is not None and (not timers or timers[0][0] > max_time):
+                    # Nothing can run before max_time, so let the time pass
+                    self.__advance_to(max_time)
+                    break
+                if not self.__is_advancing and max_time is None:
+                    break
+                self.__advance_to(timers[0][0])
+                continue
+            if condition is not None and condition():
+                condition_met = True
+                break
+            steps += 1
+
+            branch = popleft()
+            if branch.lock is not None:
+                # The branch was locked outside of a block, move it aside
+                wait(branch)
+                locked += 1
+                continue
+
+            pc = branch.pc
+            if pc != -1:
+                instruction = instructions[pc]
+                if not instruction.disabled:
+                    if logging_info:
+                        log.info("Invoking block: {}".format(instruction.block.type))
+                    self.__current_branch = branch
+                    instruction.handler(self, instruction.block, branch)
+                    self.__current_branch = None
+                pc = instruction.next
+
+            if pc != -1 or branch.lock is not None:
+                branch.step += 1
+                branch.pc = pc
+                if branch.lock is not None:
+                    wait(branch)
+                else:
+                    append(branch)
+                executed += 1
+            else:
+                self.__complete(branch)
+                completed += 1
+
+        return RunStatistics(
+            steps=steps,
+            executed=executed + completed,
+            locked=locked,
+            completed_branches=completed,
+            condition_met=condition_met,
+            idle=not ready_branches and not self.__is_advancing and self.__blocked_branch_count == 0,
+            blocked=self.is_blocked
+        )
+
+    def __completion_event(self, id: int) -> Event:
+        """The event triggered once a branch of a root block completes."""
+        event = self.__completion_events.get(id)
+        if event is None:
+            event = Event(event="completed_branch_{}".format(id), parameters={})
+            self.__completion_events[id] = event
+        return event
+
+    def __wait(self, branch: Branch) -> None:
+        """Make a locked branch wait for its lock to be triggered."""
+        self.__blocked_branch_count += 1
+        waiting_branches = self.__waiting_branches.get(branch.lock)
+        if waiting_branches is None:
+            self.__waiting_branches[branch.lock] = [branch]
+            for listener in self.__wait_listeners:
+                listener(branch.lock, True)
+        else:
+            waiting_branches.append(branch)
 
-        processed_branch = self.__branches[self.__current_branch]
+    def __step(self) -> int:
+        """Execute one step of the next branch which can run, which must exist."""
+        processed_branch = self.__ready_branches.popleft()
 
         if processed_branch.lock is not None:
+            # The branch was locked outside of a block, move it aside
             log.debug("Branch is locked")
-            # Move on to the next branch
-            self.__current_branch = (self.__current_branch + 1) % len(self.__branches)
-            return StepResult(processed_branch=processed_branch, completed_branch=False)
-
-        # Process the call for the current branch
-        if not processed_branch.current_block.disabled:
-            self.__invoke(processed_branch.current_block, processed_branch)
+            self.__wait(processed_branch)
+            return STEP_LOCKED
+
+        # Process the call for the current branch. A branch at the end of its
+        # chain (pc of -1) was locked by its last block and is now completed
+        pc = processed_branch.pc
+        if pc != -1:
+            instruction = self.program.instructions[pc]
+            if not instruction.disabled:
+                if log.isEnabledFor(logging.INFO):
+                    log.info("Invoking block: {}".format(instruction.block.type))
+                self.__current_branch = processed_branch
+                instruction.handler(self, instruction.block, processed_branch)
+                self.__current_branch = None
+            pc = instruction.next
 
-        completed_branch = False
-        if processed_branch.current_block.next:
+        if pc != -1 or processed_branch.lock is not None:
             # Move the branch forward
             processed_branch.step += 1
-            processed_branch.current_block = processed_branch.current_block.next
-            # Move on to the next branch
-            self.__current_branch = (self.__current_branch + 1) % len(self.__branches)
-        else:
-            completed_branch = True
-            # Raise a branch handling event
-            self.trigger_event("completed_branch_{}".format(processed_branch.id))
-            # Remove the branch as it has been completed
-            self.__branches.pop(self.__current_branch)
-            # If the removed branch was the last, move on to the next branch
-            # otherwise, the index will already be pointing to the next branch
-            if (self.__current_branch == len(self.__branches)):
-                self.__current_branch = 0
-            # If there are no more branches, reset the pointer
-            if (len(self.__branches) == 0):
-                self.__current_branch = None
-
-        return StepResult(processed_branch=processed_branch, completed_branch=completed_branch)
+            processed_branch.pc = pc
+            if processed_branch.lock is not None:
+                # Set the branch aside until the event it waits for is triggered
+                self.__wait(processed_branch)
+            else:
+                # Move on to the next branch
+                self.__ready_branches.append(processed_branch)
+            return STEP_EXECUTED
+
+        self.__complete(processed_branch)
+        return STEP_COMPLETED
+
+    def __complete(self, processed_branch: Branch) -> None:
+        """Complete a branch at the end of its chain."""
+        # Raise a branch handling event, if anything waits for it such as the
+        # caller of a function
+        event = self.__completion_event(processed_branch.id)
+        if event in self.__waiting_branches or event in self.__event_handlers:
+            self.__trigger(event)
+
+        # Restart handlers of repeating events, such as forever
+        if processed_branch.trigger in self.__repeating_events:
+            branch = self.add_branch(processed_branch.root, trigger=processed_branch.trigger)
+            delay = self.__repeating_events[processed_branch.trigger]
+            if delay > 0:
+                self.sleep(branch, delay)
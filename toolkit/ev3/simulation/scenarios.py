@@ -0,0 +1,217 @@
+import io
+import os
+import time
+import logging
+import multiprocessing
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional, Any
+
+from toolkit.ev3.simulation.simulator import Simulator, Snapshot
+from toolkit.ev3.simulation.cache import ProjectCache, DEFAULT_CACHE_DIRECTORY
+
+
+log = logging.getLogger(__name__)
+
+# Default period of simulated time in microseconds between two samples of the
+# brick's state in a trace
+DEFAULT_SAMPLE_PERIOD = 100000
+
+
+@dataclass(frozen=True)
+class ScenarioEvent:
+    """An event triggered, or readings of a sensor set, once the simulated time since the start reaches a time in microseconds."""
+    time: int
+    event: Optional[str] = None
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    # The port and readings of a sensor, such as {"pressed": True}
+    port: Optional[str] = None
+    readings: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ScenarioEvent":
+        """Create an event from a description, such as one read from JSON."""
+        return ScenarioEvent(
+            time=int(data["time"]),
+            event=data.get("event"),
+            parameters=data.get("parameters", {}),
+            port=data.get("port"),
+            readings=data.get("readings")
+        )
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """A script of events to run a program against for a duration of simulated time in microseconds."""
+    name: str
+    events: List[ScenarioEvent]
+    duration: int
+    max_steps: int = 1000000
+    sample_period: int = DEFAULT_SAMPLE_PERIOD
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "Scenario":
+        """Create a scenario from a description, such as one read from JSON."""
+        return Scenario(
+            name=data["name"],
+            events=[ScenarioEvent.from_dict(event) for event in data.get("events", [])],
+            duration=int(data["duration"]),
+            max_steps=int(data.get("maxSteps", 1000000)),
+            sample_period=int(data.get("samplePeriod", DEFAULT_SAMPLE_PERIOD))
+        )
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    # Number of steps taken
+    steps: int
+    # Simulated time in microseconds since the start of the scenario
+    time: int
+    # The brick's state sampled periodically, along with the simulated time
+    trace: List[Dict[str, Any]]
+    # Text printed to the console by the program
+    console: str
+    # Packed pixels of the screen at the end
+    screen: bytes
+    # The error which stopped the scenario, if any
+    error: Optional[str] = None
+    # Elapsed wall-clock time in seconds
+    elapsed: float = 0.0
+
+
+def run_scenario(simulator: Simulator, snapshot: Snapshot, scenario: Scenario) -> ScenarioResult:
+    """Run a scenario in a simulator, starting from the state of a snapshot."""
+    simulator.restore(snapshot)
+    brick = simulator.brick
+    start = simulator.time
+    end = start + scenario.duration
+    events = sorted(scenario.events, key=lambda event: event.time)
+    next_event = 0
+    next_sample = start
+    trace: List[Dict[str, Any]] = []
+    steps = 0
+    error = None
+    console = io.StringIO()
+
+    wall_start = time.perf_counter()
+    with redirect_stdout(console):
+        try:
+            while True:
+                now = simulator.time
+                while next_event < len(events) and start + events[next_event].time <= now:
+                    event = events[next_event]
+                    if event.readings is not None:
+                        brick.update_sensor(event.port, event.readings)
+                    if event.event is not None:
+                        simulator.runtime.trigger_event(event.event, **event.parameters)
+                    next_event += 1
+                if next_sample <= now:
+                    trace.append({"time": now - start, **brick.to_dict()})
+                    next_sample += scenario.sample_period
+                if now >= end or steps >= scenario.max_steps:
+                    break
+
+                # Run until the next event, sample or the end, whichever is first
+                target = min(end, next_sample)
+                if next_event < len(events):
+                    target = min(target, start + events[next_event].time)
+                statistics = simulator.run_until(None, scenario.max_steps - steps, target)
+                steps += statistics.steps
+                if simulator.time < target and steps < scenario.max_steps:
+                    simulator.runtime.advance_time(target - simulator.time)
+        except Exception as exception:
+            log.debug("Scenario '{}' failed".format(scenario.name), exc_info=True)
+            error = "{}: {}".format(type(exception).__name__, exception)
+
+    return ScenarioResult(
+        name=scenario.name,
+        steps=steps,
+        time=simulator.time - start,
+        trace=trace,
+        console=console.getvalue(),
+        screen=bytes(brick.screen.buffer),
+        error=error,
+        elapsed=time.perf_counter() - wall_start
+    )
+
+
+# The simulator and the post-start snapshot of each worker process
+worker_state: Optional[Tuple[Simulator, Snapshot]] = None
+
+
+def prepare(data: bytes, config: Dict[str, Any], snapshot: bytes, cache_directory: str) -> Tuple[Simulator, Snapshot]:
+    """Create a simulator of a UF2 archive's bytes set up by a config, to restore a snapshot into for each scenario."""
+    simulator = ProjectCache(cache_directory).simulator(data)
+    simulator.brick.configure(config)
+    return (simulator, Snapshot.from_bytes(snapshot))
+
+
+def initialize_worker(data: bytes, config: Dict[str, Any], snapshot: bytes, cache_directory: str) -> None:
+    global worker_state
+    worker_state = prepare(data, config, snapshot, cache_directory)
+
+
+def run_in_worker(scenario: Tuple[int, Scenario]) -> Tuple[int, ScenarioResult]:
+    index, scenario = scenario
+    simulator, snapshot = worker_state
+    return (index, run_scenario(simulator, snapshot, scenario))
+
+
+class ScenarioRunner:
+    """Run a program against many scenarios in parallel, each starting from the state once the program started.
+
+    The project is parsed once, as the worker processes read it from the
+    project cache, and each scenario restores a snapshot taken after starting
+    the program rather than starting it again.
+    """
+    def __init__(self, data: bytes, config: Dict[str, Any] = None, warmup: int = 0, processes: Optional[int] = None, cache_directory: str = DEFAULT_CACHE_DIRECTORY) -> None:
+        self.__data = data
+        # The motors, sensors and world, as sent by clients of the server
+        self.__config = {} if config is None else config
+        # Simulated time in microseconds to run before taking the snapshot,
+        # such as to let the program set itself up
+        self.__warmup = warmup
+        self.__processes = (os.cpu_count() or 1) if processes is None else processes
+        self.__cache_directory = cache_directory
+        self.__snapshot: Optional[bytes] = None
+
+    @property
+    def processes(self) -> int:
+        """The number of worker processes."""
+        return self.__processes
+
+    def snapshot(self) -> bytes:
+        """The serialized state of the program once started, which the scenarios start from."""
+        if self.__snapshot is None:
+            simulator = ProjectCache(self.__cache_directory).simulator(self.__data)
+            simulator.brick.configure(self.__config)
+            simulator.start()
+            if self.__warmup > 0:
+                simulator.run_for(self.__warmup, 1000000)
+            self.__snapshot = simulator.snapshot().to_bytes()
+        return self.__snapshot
+
+    def run(self, scenarios: List[Scenario]) -> List[ScenarioResult]:
+        """Run scenarios, returning their results in the same order."""
+        snapshot = self.snapshot()
+        arguments = (self.__data, self.__config, snapshot, self.__cache_directory)
+        start = time.perf_counter()
+        results: List[Optional[ScenarioResult]] = [None] * len(scenarios)
+        processes = min(self.__processes, len(scenarios))
+        if processes <= 1:
+            simulator, state = prepare(*arguments)
+            for index, scenario in enumerate(scenarios):
+                results[index] = run_scenario(simulator, state, scenario)
+        else:
+            # Forked workers start from the parent's memory, such as the parsed project
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            with context.Pool(processes, initializer=initialize_worker, initargs=arguments) as pool:
+                for index, result in pool.imap_unordered(run_in_worker, enumerate(scenarios)):
+                    results[index] = result
+
+        log.info("Ran {} scenarios in {:.2f}s with {} processes, {} steps".format(
+            len(scenarios), time.perf_counter() - start, max(processes, 1), sum(result.steps for result in results)
+        ))
+        return results
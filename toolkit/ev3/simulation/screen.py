@@ -0,0 +1,250 @@
+import logging
+from array import array
+from typing import List, Tuple, Optional, Dict, Union
+
+from toolkit.ev3.simulation.changes import ChangeTracker
+
+log = logging.getLogger(__name__)
+
+# Size of the EV3 screen in pixels
+SCREEN_WIDTH = 178
+SCREEN_HEIGHT = 128
+# Bytes per row of the packed framebuffer, one bit per pixel
+SCREEN_STRIDE = (SCREEN_WIDTH + 7) // 8
+
+# Size of a character of the font in pixels, including spacing, and the
+# height of a line of text
+FONT_WIDTH = 6
+FONT_HEIGHT = 8
+LINE_HEIGHT = 10
+
+# The printable ASCII characters from ' ' to '~' of a 5x7 font, as five
+# columns per character with the top pixel as the least significant bit
+FONT = bytes.fromhex(
+    "0000000000" "00005f0000" "0007000700" "147f147f14" "242a7f2a12" "2313086462" "3649552250" "0005030000"
+    "001c224100" "0041221c00" "082a1c2a08" "08083e0808" "0050300000" "0808080808" "0060600000" "2010080402"
+    "3e5149453e" "00427f4000" "4261514946" "2141454b31" "1814127f10" "2745454539" "3c4a494930" "0171090503"
+    "3649494936" "064949291e" "0036360000" "0056360000" "0008142241" "1414141414" "4122140800" "0201510906"
+    "324979413e" "7e1111117e" "7f49494936" "3e41414122" "7f4141221c" "7f49494941" "7f09090101" "3e41415132"
+    "7f0808087f" "00417f4100" "2040413f01" "7f08142241" "7f40404040" "7f0204027f" "7f0408107f" "3e4141413e"
+    "7f09090906" "3e4151215e" "7f09192946" "4649494931" "01017f0101" "3f4040403f" "1f2040201f" "7f2018207f"
+    "6314081463" "0304780403" "6151494543" "00007f4141" "0204081020" "41417f0000" "0402010204" "4040404040"
+    "0001020400" "2054545478" "7f48444438" "3844444420" "384444487f" "3854545418" "087e090102" "081454543c"
+    "7f08040478" "00447d4000" "2040443d00" "007f102844" "00417f4000" "7c04180478" "7c08040478" "3844444438"
+    "7c14141408" "081414187c" "7c08040408" "4854545420" "043f444020" "3c4040207c" "1c2040201c" "3c4030403c"
+    "4428102844" "0c5050503c" "4464544c44" "0008364100" "00007f0000" "0041360800" "08082a1c08"
+)
+
+
+def glyph_rows(character: str) -> List[int]:
+    """The rows of a character of the font, each as FONT_WIDTH bits with the leftmost pixel as the most significant bit."""
+    code = ord(character)
+    if code < 0x20 or code > 0x7e:
+        code = ord("?")
+    columns = FONT[(code - 0x20) * 5:(code - 0x20) * 5 + 5]
+    rows = []
+    for y in range(FONT_HEIGHT):
+        row = 0
+        for column in columns:
+            row = (row << 1) | ((column >> y) & 1)
+        # Leave the rightmost column empty as spacing
+        rows.append(row << (FONT_WIDTH - 5))
+    return rows
+
+
+# Rows of each printable character, computed once
+GLYPHS: Dict[str, List[int]] = {chr(code): glyph_rows(chr(code)) for code in range(0x20, 0x7f)}
+
+
+class Framebuffer:
+    """A packed framebuffer with one bit per pixel, the leftmost pixel of a byte being its most significant bit.
+
+    Changed rows and the rectangle enclosing all changes are tracked until
+    they are taken, so that clients only need to fetch what changed.
+    """
+    def __init__(self, width: int = SCREEN_WIDTH, height: int = SCREEN_HEIGHT, tracker: ChangeTracker = None) -> None:
+        self.__width = width
+        self.__height = height
+        self.__stride = (width + 7) // 8
+        self.__buffer = bytearray(self.__stride * height)
+        # One flag per row, set once the row changes
+        self.__dirty_rows = bytearray(height)
+        # The rectangle enclosing all changes as left, top, right and bottom
+        # (exclusive), if any
+        self.__dirty_rect: Optional[Tuple[int, int, int, int]] = None
+        # Versions of the state the screen belongs to, and the version at which
+        # each row last changed
+        self.__tracker = ChangeTracker() if tracker is None else tracker
+        self.__row_versions = array("Q", bytes(8 * height))
+
+    @property
+    def width(self) -> int:
+        """The width in pixels."""
+        return self.__width
+
+    @property
+    def height(self) -> int:
+        """The height in pixels."""
+        return self.__height
+
+    @property
+    def stride(self) -> int:
+        """The number of bytes per row."""
+        return self.__stride
+
+    @property
+    def buffer(self) -> memoryview:
+        """The packed pixels, row by row, without copying them."""
+        return memoryview(self.__buffer)
+
+    @property
+    def dirty_rect(self) -> Optional[Tuple[int, int, int, int]]:
+        """The rectangle enclosing all changes since they were last taken as left, top, right and bottom (exclusive), if any."""
+        return self.__dirty_rect
+
+    @property
+    def version(self) -> int:
+        """The latest version of the state the screen belongs to."""
+        return self.__tracker.version
+
+    def rows_since(self, version: int) -> List[Tuple[int, bytes]]:
+        """The index and packed pixels of each row changed after a version, without clearing any changes."""
+        return [(y, self.row(y)) for y, changed in enumerate(self.__row_versions) if changed > version]
+
+    def row(self, y: int) -> bytes:
+        """The packed pixels of a row."""
+        return bytes(self.__buffer[y * self.__stride:(y + 1) * self.__stride])
+
+    def get_pixel(self, x: int, y: int) -> bool:
+        """Whether or not a pixel is set."""
+        return bool(self.__buffer[y * self.__stride + (x >> 3)] & (0x80 >> (x & 7)))
+
+    def set_pixel(self, x: int, y: int, value: bool = True) -> None:
+        """Set or clear a pixel, if on the screen."""
+        if x < 0 or y < 0 or x >= self.__width or y >= self.__height:
+            return
+        index = y * self.__stride + (x >> 3)
+        current = self.__buffer[index]
+        if value:
+            self.__buffer[index] |= 0x80 >> (x & 7)
+        else:
+            self.__buffer[index] &= ~(0x80 >> (x & 7)) & 0xff
+        if self.__buffer[index] != current:
+            self.__mark(x, y, x + 1, y + 1)
+
+    def clear(self, y: int = 0, height: int = None) -> None:
+        """Clear all rows or a range of rows."""
+        height = self.__height - y if height is None else height
+        start = max(y, 0)
+        end = min(y + height, self.__height)
+        if start >= end:
+            return
+        size = (end - start) * self.__stride
+        # Only mark the rows as changed if any pixel is cleared
+        if self.__buffer.count(0, start * self.__stride, end * self.__stride) != size:
+            self.__buffer[start * self.__stride:end * self.__stride] = bytes(size)
+            self.__mark(0, start, self.__width, end)
+
+    def blit(self, bitmap: Union[bytes, bytearray, memoryview], width: int, height: int, x: int, y: int, transparent: bool = False) -> None:
+        """Draw a packed bitmap with rows of (width + 7) // 8 bytes at a position, optionally only setting pixels rather than copying them."""
+        stride = (width + 7) // 8
+        # Clip the bitmap to the screen
+        left = max(x, 0)
+        right = min(x + width, self.__width)
+        top = max(y, 0)
+        bottom = min(y + height, self.__height)
+        if left >= right or top >= bottom:
+            return
+
+        buffer = self.__buffer
+        # The first and last row which changed
+        changed_top = None
+        changed_bottom = None
+        if x == left and x & 7 == 0 and width & 7 == 0 and right == x + width and not transparent:
+            # Byte aligned rows are copied as is
+            offset = x >> 3
+            for row in range(top, bottom):
+                source = (row - y) * stride
+                start = row * self.__stride + offset
+                if buffer[start:start + stride] != bitmap[source:source + stride]:
+                    buffer[start:start + stride] = bitmap[source:source + stride]
+                    changed_top = row if changed_top is None else changed_top
+                    changed_bottom = row + 1
+        else:
+            # Shift each row into place as an integer spanning the affected bytes
+            first = left >> 3
+            last = (right - 1) >> 3
+            span = last - first + 1
+            # Shift from the bitmap's bits to the bits of the affected bytes
+            shift = (span * 8) - (x - first * 8) - stride * 8
+            mask = ((1 << (right - left)) - 1) << ((span * 8) - (right - first * 8))
+            for row in range(top, bottom):
+                source = (row - y) * stride
+                bits = int.from_bytes(bitmap[source:source + stride], "big")
+                bits = bits << shift if shift >= 0 else bits >> -shift
+                start = row * self.__stride + first
+                current = int.from_bytes(buffer[start:start + span], "big")
+                if transparent:
+                    updated = current | (bits & mask)
+                else:
+                    updated = (current & ~mask) | (bits & mask)
+                if updated != current:
+                    buffer[start:start + span] = updated.to_bytes(span, "big")
+                    changed_top = row if changed_top is None else changed_top
+                    changed_bottom = row + 1
+        if changed_top is not None:
+            self.__mark(left, changed_top, right, changed_bottom)
+
+    def text(self, text: str, x: int, y: int) -> None:
+        """Draw a line of text with the built-in font, its top left corner at a position."""
+        if not text:
+            return
+        width = FONT_WIDTH * len(text)
+        stride = (width + 7) // 8
+        padding = stride * 8 - width
+        glyphs = [GLYPHS.get(character, GLYPHS["?"]) for character in text]
+        rows = []
+        for row in range(FONT_HEIGHT):
+            bits = 0
+            for glyph in glyphs:
+                bits = (bits << FONT_WIDTH) | glyph[row]
+            rows.append((bits << padding).to_bytes(stride, "big"))
+        self.blit(b"".join(rows), width, FONT_HEIGHT, x, y)
+
+    def load(self, buffer: Union[bytes, bytearray, memoryview]) -> None:
+        """Replace all packed pixels, such as by those of a snapshot, marking the whole screen as changed."""
+        if len(buffer) != len(self.__buffer):
+            raise Exception("Got {} bytes of pixels rather than {}".format(len(buffer), len(self.__buffer)))
+        self.__buffer[:] = buffer
+        self.mark_all_dirty()
+
+    def take_dirty_rows(self) -> List[Tuple[int, bytes]]:
+        """The index and packed pixels of each row changed since the last call, clearing the changes."""
+        rows = []
+        dirty_rows = self.__dirty_rows
+        if self.__dirty_rect is not None:
+            _, top, _, bottom = self.__dirty_rect
+            for y in range(top, bottom):
+                if dirty_rows[y]:
+                    rows.append((y, self.row(y)))
+            dirty_rows[top:bottom] = bytes(bottom - top)
+            self.__dirty_rect = None
+        return rows
+
+    def mark_all_dirty(self) -> None:
+        """Mark the whole screen as changed, such as for a newly connected client."""
+        self.__mark(0, 0, self.__width, self.__height)
+
+    def to_list(self) -> List[List[bool]]:
+        """The pixels as rows of booleans."""
+        return [[self.get_pixel(x, y) for x in range(self.__width)] for y in range(self.__height)]
+
+    def __mark(self, left: int, top: int, right: int, bottom: int) -> None:
+        """Mark a rectangle as changed."""
+        self.__dirty_rows[top:bottom] = b"\x01" * (bottom - top)
+        self.__row_versions[top:bottom] = array("Q", [self.__tracker.mark("screen")]) * (bottom - top)
+        if self.__dirty_rect is None:
+            self.__dirty_rect = (left, top, right, bottom)
+        else:
+            current = self.__dirty_rect
+            self.__dirty_rect = (min(current[0], left), min(current[1], top), max(current[2], right), max(current[3], bottom))
@@ -0,0 +1,192 @@
+import re
+import logging
+from bisect import bisect_left, bisect_right, insort
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional, Any
+
+from toolkit.ev3.simulation.runtime import Runtime, Event
+
+
+log = logging.getLogger(__name__)
+
+# Thresholds in percent of reflected light below which it is dark and above
+# which it is bright, as well as the distances in centimeters below which an
+# object is near and above which it is far, matching the defaults of PXT
+LIGHT_DARK_THRESHOLD = 20
+LIGHT_BRIGHT_THRESHOLD = 80
+ULTRASONIC_NEAR_THRESHOLD = 10
+ULTRASONIC_FAR_THRESHOLD = 100
+
+# Conditions of sensor readings which cause events
+BELOW = "below"
+ABOVE = "above"
+EQUAL = "equal"
+
+
+# Labels are constant fields, so each one only needs to be parsed once
+@lru_cache(maxsize=None)
+def parse_sensor_label(label: str) -> Tuple[str, str]:
+    match = re.fullmatch(r"sensors\.([a-z]+)([1-4])", label)
+    if match is None:
+        raise Exception("Got unsupported sensor label '{}'".format(label))
+    return (match.group(2), match.group(1))
+
+
+def sensor_condition(event: Event) -> Optional[Tuple[str, str, str, Any]]:
+    """The port, reading, condition and value of the reading which causes a sensor event, if it is one."""
+    parameters = event.parameters
+    if "sensor" not in parameters:
+        return None
+
+    if event.event == "colorOnLightDetected":
+        if parameters.get("mode") != "LightIntensityMode.Reflected":
+            return None
+        if parameters.get("condition") == "Light.Dark":
+            reading, condition, value = ("reflected", BELOW, LIGHT_DARK_THRESHOLD)
+        elif parameters.get("condition") == "Light.Bright":
+            reading, condition, value = ("reflected", ABOVE, LIGHT_BRIGHT_THRESHOLD)
+        else:
+            return None
+    elif event.event == "colorOnColorDetected":
+        reading, condition, value = ("color", EQUAL, parameters.get("color"))
+    elif event.event == "ultrasonicOn":
+        if parameters.get("event") in ("UltrasonicSensorEvent.ObjectNear", "UltrasonicSensorEvent.ObjectDetected"):
+            reading, condition, value = ("distance", BELOW, ULTRASONIC_NEAR_THRESHOLD)
+        elif parameters.get("event") == "UltrasonicSensorEvent.ObjectFar":
+            reading, condition, value = ("distance", ABOVE, ULTRASONIC_FAR_THRESHOLD)
+        else:
+            return None
+    elif event.event == "touchEvent":
+        if parameters.get("event") == "ButtonEvent.Pressed":
+            reading, condition, value = ("pressed", EQUAL, True)
+        elif parameters.get("event") in ("ButtonEvent.Released", "ButtonEvent.Bumped"):
+            reading, condition, value = ("pressed", EQUAL, False)
+        else:
+            return None
+    else:
+        return None
+
+    port, _ = parse_sensor_label(parameters["sensor"])
+    return (port, reading, condition, value)
+
+
+class ThresholdIndex:
+    """Sorted thresholds of a reading, with the events of values crossing below or above each of them."""
+    def __init__(self) -> None:
+        self.__thresholds: List[float] = []
+        # Events by threshold, for values falling below or rising above it
+        self.__below: Dict[float, List[Event]] = {}
+        self.__above: Dict[float, List[Event]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__thresholds)
+
+    def add(self, threshold: float, condition: str, event: Event) -> None:
+        """Add an event caused by crossing a threshold."""
+        if threshold not in self.__below:
+            insort(self.__thresholds, threshold)
+            self.__below[threshold] = []
+            self.__above[threshold] = []
+        (self.__below if condition == BELOW else self.__above)[threshold].append(event)
+
+    def remove(self, threshold: float, condition: str, event: Event) -> None:
+        """Remove an event caused by crossing a threshold."""
+        (self.__below if condition == BELOW else self.__above)[threshold].remove(event)
+        if not self.__below[threshold] and not self.__above[threshold]:
+            del self.__thresholds[bisect_left(self.__thresholds, threshold)]
+            del self.__below[threshold]
+            del self.__above[threshold]
+
+    def crossings(self, old: Optional[float], new: float) -> List[Event]:
+        """The events of the thresholds crossed by a change of the reading, the first reading crossing every threshold it satisfies."""
+        thresholds = self.__thresholds
+        events: List[Event] = []
+        if old is None or new < old:
+            # Falling below the thresholds in (new, old]
+            end = len(thresholds) if old is None else bisect_right(thresholds, old)
+            for threshold in thresholds[bisect_right(thresholds, new):end]:
+                events.extend(self.__below[threshold])
+        if old is None or new > old:
+            # Rising above the thresholds in [old, new)
+            start = 0 if old is None else bisect_left(thresholds, old)
+            for threshold in thresholds[start:bisect_left(thresholds, new)]:
+                events.extend(self.__above[threshold])
+        return events
+
+
+class SensorEvents:
+    """Sensor events which branches or handlers wait for, indexed per port and reading to only trigger them as readings cross their conditions."""
+    def __init__(self, runtime: Runtime) -> None:
+        # Number of waits per event, as an event is indexed while waited for
+        self.__references: Dict[Event, int] = {}
+        # Indices of the thresholds of numeric readings by port and reading
+        self.__thresholds: Dict[Tuple[str, str], ThresholdIndex] = {}
+        # Events by the value of categorical readings, by port and reading
+        self.__values: Dict[Tuple[str, str], Dict[Any, List[Event]]] = {}
+        self.__runtime = runtime
+        runtime.register_wait_listener(self.__on_wait)
+
+    @property
+    def events(self) -> List[Event]:
+        """The indexed events."""
+        return list(self.__references.keys())
+
+    def reset(self) -> None:
+        """Rebuild the index from the events the runtime waits for, such as once its state is restored."""
+        self.__references.clear()
+        self.__thresholds.clear()
+        self.__values.clear()
+        self.__runtime.notify_waits(self.__on_wait)
+
+    def detect(self, port: str, changes: Dict[str, Tuple[Any, Any]]) -> List[Event]:
+        """The events caused by changes of the readings of a sensor, given as the old and new value by reading."""
+        events: List[Event] = []
+        for reading, (old, new) in changes.items():
+            key = (port, reading)
+            index = self.__thresholds.get(key)
+            if index is not None and new is not None:
+                events.extend(index.crossings(old, new))
+            values = self.__values.get(key)
+            if values is not None:
+                events.extend(values.get(new, ()))
+        return events
+
+    def __on_wait(self, event: Event, waiting: bool) -> None:
+        """Index events once waited for and drop them once no longer."""
+        references = self.__references.get(event, 0)
+        if waiting:
+            if references == 0:
+                condition = sensor_condition(event)
+                if condition is None:
+                    return
+                self.__index(event, condition, True)
+            self.__references[event] = references + 1
+        elif references > 0:
+            if references == 1:
+                del self.__references[event]
+                self.__index(event, sensor_condition(event), False)
+            else:
+                self.__references[event] = references - 1
+
+    def __index(self, event: Event, condition: Tuple[str, str, str, Any], add: bool) -> None:
+        port, reading, kind, value = condition
+        key = (port, reading)
+        if kind == EQUAL:
+            events = self.__values.setdefault(key, {}).setdefault(value, [])
+            if add:
+                events.append(event)
+            else:
+                events.remove(event)
+                if not events:
+                    del self.__values[key][value]
+                    if not self.__values[key]:
+                        del self.__values[key]
+        else:
+            index = self.__thresholds.setdefault(key, ThresholdIndex())
+            if add:
+                index.add(value, kind, event)
+            else:
+                index.remove(value, kind, event)
+                if len(index) == 0:
+                    del self.__thresholds[key]
+        log.debug("{} sensor event {}".format("Indexed" if add else "Dropped", event))
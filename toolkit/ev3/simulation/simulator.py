@@ -1,39 +1,65 @@
-import os
+import zlib
+import pickle
 import logging
-import time
+from dataclasses import dataclass
 from typing import Tuple, Callable, Any, Optional
 
 from toolkit.pxt.project import Project
 from toolkit.ev3.simulation.block.source import BlockSource
-from toolkit.ev3.simulation.block.block import Block, BlockValue
-from toolkit.ev3.simulation.runtime import Runtime, Branch, StepResult
+from toolkit.ev3.simulation.runtime import Runtime, StepResult, RunStatistics, RuntimeSnapshot
 from toolkit.ev3.simulation.lib.utilities import get_all_handlers
-from toolkit.ev3.simulation.brick import Brick, Motor
+from toolkit.ev3.simulation.pacing import Pacing, Pacer, PacingStatistics
+from toolkit.ev3.simulation.brick import Brick, BrickSnapshot
+from toolkit.ev3.simulation.chassis import ChassisPoses
 
 
 log = logging.getLogger(__name__)
 
+# Delay between two iterations of a forever loop in microseconds, matching the
+# implicit pause of PXT
+FOREVER_DELAY = 20000
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """The state of a simulation, which can be restored into any simulator of the same project."""
+    runtime: RuntimeSnapshot
+    brick: BrickSnapshot
+
+    @property
+    def time(self) -> int:
+        """Simulated time in microseconds."""
+        return self.runtime.time
+
+    def to_bytes(self) -> bytes:
+        """Serialize the snapshot compactly, such as to send it to another process."""
+        return zlib.compress(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "Snapshot":
+        """Deserialize a snapshot serialized by to_bytes."""
+        return pickle.loads(zlib.decompress(data))
+
 
 class Simulator:
-    def __init__(self, project: Project) -> None:
+    def __init__(self, project: Project, main: BlockSource = None, poses: ChassisPoses = None) -> None:
         self.__project = project
 
-        log.info("Extracting and parsing main source")
-        files = dict(self.__project.files)
-        main = BlockSource(files["main.blocks"])
+        # The main source may already be parsed, such as when cached
+        if main is None:
+            log.info("Extracting and parsing main source")
+            main = BlockSource(self.__project.file_by_name("main.blocks"))
         self.__runtime = Runtime(main)
 
         # Register all built-in calls
         for call, handler in get_all_handlers().items():
             self.__runtime.register_handler(call, handler)
 
-        # Create a brick and make it available to the runtime
-        self.__brick = Brick(self.__runtime)
+        # Create a brick and make it available to the runtime, its chassis
+        # possibly sharing poses with other simulators
+        self.__brick = Brick(self.__runtime, poses)
         self.__runtime.globals["brick"] = self.__brick
 
-        # Branch for the special forever event
-        self.__forever_branch: Branch
-
     @property
     def runtime(self) -> Runtime:
         """The runtime."""
@@ -49,11 +75,6 @@ class Simulator:
         """The project."""
         return self.__project
 
-    def __trigger_forever(self, runtime) -> None:
-        def trigger():
-            runtime.trigger_event("forever")
-        trigger()
-
     def start(self) -> None:
         # Start the runtime after the handler setup
         self.__runtime.start()
@@ -61,23 +82,53 @@ class Simulator:
         # Trigger the start event
         self.__runtime.trigger_event("pxt-on-start")
 
-        # Start triggering the forever event
-        self.__forever = self.__runtime.trigger_event("forever")
+        # Start triggering the forever event, restarting each forever handler
+        # shortly after it completes
+        self.__runtime.repeat_event("forever", FOREVER_DELAY)
+        self.__runtime.trigger_event("forever")
+
+    @property
+    def time(self) -> int:
+        """Simulated time in microseconds."""
+        return self.__runtime.time
+
+    def snapshot(self) -> Snapshot:
+        """Capture the state of the simulation between steps.
+
+        Blocks are referred to by id, so that the parsed and compiled blocks
+        are shared by all simulators of a project rather than copied.
+        """
+        return Snapshot(runtime=self.__runtime.snapshot(), brick=self.__brick.snapshot())
+
+    def restore(self, snapshot: Snapshot) -> None:
+        """Restore the state of a snapshot of a simulator of the same project, such as to rewind or to fork runs.
+
+        The simulator need not be started, as the event handlers are restored
+        along with the rest of the runtime's state.
+        """
+        self.__runtime.restore(snapshot.runtime)
+        self.__brick.restore(snapshot.brick)
 
     def step(self) -> Optional[StepResult]:
-        result = self.__runtime.step()
-        if result is None:
-            return
-
-        # If the branch was a completed forever event, trigger it again
-        if result.completed_branch and result.processed_branch == self.__forever:
-            self.__forever = self.__runtime.trigger_event("forever")
-        return result
-
-    def run(self) -> None:
-        while True:
-            while self.__runtime.current_branch is not None:
-                self.step()
-                time.sleep(0.1)
-            log.debug("No branches left, waiting")
-            time.sleep(0.5)
+        return self.__runtime.step()
+
+    def run_steps(self, count: int) -> RunStatistics:
+        """Execute up to count steps."""
+        return self.__runtime.run_steps(count)
+
+    def run_until(self, condition: Callable[[], bool], max_steps: int, max_time: Optional[int] = None) -> RunStatistics:
+        """Execute steps until the condition is met, up to max_steps steps or until the simulated time reaches max_time."""
+        return self.__runtime.run_until(condition, max_steps, max_time)
+
+    def run_for(self, duration: int, max_steps: int) -> RunStatistics:
+        """Execute steps for a duration of simulated time in microseconds, as fast as possible."""
+        return self.__runtime.run_until(None, max_steps, self.__runtime.time + duration)
+
+    def run(self, pacing: Pacing = Pacing.realtime(), duration: Optional[int] = None, on_tick: Optional[Callable[[PacingStatistics], None]] = None) -> PacingStatistics:
+        """Run the simulation paced against the wall-clock time, for a duration of simulated time in microseconds or forever."""
+        pacer = Pacer(self.__runtime, pacing)
+        statistics = pacer.run(duration, on_tick)
+        log.info("Ran {} steps in {} ticks, {:.0f} steps/s, {:.2f}x realtime, {:.2f}ms mean tick lag".format(
+            statistics.steps, statistics.ticks, statistics.steps_per_second, statistics.achieved_scale, statistics.mean_lag * 1000
+        ))
+        return statistics
@@ -0,0 +1,688 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from typing import Dict, List, Tuple, Optional, Union, Any, Callable
+
+from toolkit.ev3.simulation.simulator import Simulator
+from toolkit.ev3.simulation.cache import ProjectCache, DEFAULT_CACHE_DIRECTORY
+from toolkit.ev3.simulation.changes import pack_diff
+from toolkit.ev3.simulation.chassis import ChassisPoses
+from toolkit.ev3.simulation.pacing import Pacing, Pacer
+from toolkit.ev3.simulation.journal import Recorder, JournalWriter
+
+
+log = logging.getLogger(__name__)
+
+# Upper bound of steps run by a single request to a worker, so that the
+# sessions sharing a worker take turns instead of waiting for long runs
+MAX_STEPS_PER_REQUEST = 2000
+
+# Bounds of the rate of frames pushed to clients running autonomously, and of
+# the number of frames sent to a client but not yet acknowledged by it
+MAX_FRAME_RATE = 60.0
+MIN_FRAME_RATE = 1.0
+MAX_FRAME_WINDOW = 8
+
+# Directory in which a journal of the inputs of each session is recorded, if set
+JOURNAL_DIRECTORY_VARIABLE = "EV3_JOURNAL_DIRECTORY"
+
+
+@dataclass(frozen=True)
+class Request:
+    """A command for a session, sent from the front end to the worker holding the session."""
+    # Identifier matching the reply, or None for notifications
+    id: Optional[int]
+    session: str
+    command: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Frame:
+    """The changes of a session running autonomously, pushed from its worker to the front end."""
+    session: str
+    # Simulated time in microseconds
+    time: int
+    # The changes since the last frame, or None if the frame only reports steps
+    diff: Any = None
+    # The error which stopped the session, if any
+    error: Optional[str] = None
+    # Number of steps run since the last frame, to be charged to the budget of
+    # the session's tenant
+    steps: int = 0
+
+
+@dataclass(frozen=True)
+class Reply:
+    """The result of a request, or the error it failed with."""
+    id: int
+    result: Any = None
+    error: Optional[str] = None
+
+
+class Session:
+    """A simulation of a client, along with the state of what was already sent to it."""
+    def __init__(self, simulator: Simulator, recorder: Optional[Recorder] = None) -> None:
+        self.__simulator = simulator
+        # Inputs are applied through the recorder, so that they can be journaled
+        self.__recorder = Recorder(simulator) if recorder is None else recorder
+        # The version of the brick state last sent to the client
+        self.__sent_version = 0
+        # Whether or not the client wants packed binary diffs
+        self.__binary = False
+
+        # The pacer of the autonomous loop while running, bumping the
+        # generation whenever it starts or stops
+        self.__pacer: Optional[Pacer] = None
+        self.__generation = 0
+        # Upper bound of steps per second of wall-clock time, if any
+        self.__step_rate: Optional[float] = None
+        # Period of the frames in seconds, the time the next frame is due and
+        # the number of frames which may be sent without being acknowledged
+        self.__frame_period = 1 / MAX_FRAME_RATE
+        self.__next_frame = 0.0
+        self.__window = 1
+        self.__credits = 0
+        # Steps run autonomously which were not reported in a frame yet
+        self.__unreported_steps = 0
+        # Steps left to run of the current step request, if any, along with
+        # the steps already run and whether the diff is wanted once done
+        self.__remaining_steps: Optional[int] = None
+        self.__stepped = 0
+        self.__idle = False
+        self.__step_diff = True
+
+    @property
+    def simulator(self) -> Simulator:
+        """The simulator."""
+        return self.__simulator
+
+    @property
+    def is_running(self) -> bool:
+        """Whether or not the simulation runs autonomously."""
+        return self.__pacer is not None
+
+    @property
+    def is_stepping(self) -> bool:
+        """Whether or not a step request is being run."""
+        return self.__remaining_steps is not None
+
+    @property
+    def generation(self) -> int:
+        """The number of times the autonomous loop started or stopped."""
+        return self.__generation
+
+    def start(self, config: Dict[str, Any]) -> None:
+        """Connect the motors and sensors and place the robot in the world of a config, then start the simulation."""
+        self.__recorder.configure(config)
+        self.__binary = config.get("encoding") == "binary"
+        self.__sent_version = 0
+        self.__recorder.start()
+
+    def begin_steps(self, count: int, diff: bool = True) -> None:
+        """Begin a request to execute up to count steps, run by run_steps until take_steps_result returns its result."""
+        if self.__remaining_steps is not None:
+            raise Exception("Already running a step request")
+        self.__remaining_steps = count
+        self.__stepped = 0
+        self.__idle = False
+        self.__step_diff = diff
+
+    def run_steps(self) -> None:
+        """Execute the remaining steps of the step request.
+
+        A robot sharing poses stops once it moved, until the poses are updated
+        and the session is synced, each such stop counting as a step.
+        """
+        statistics = self.__recorder.run_steps(self.__remaining_steps)
+        self.__stepped += statistics.steps
+        self.__idle = statistics.idle
+        if self.__simulator.brick.is_moved:
+            self.__remaining_steps -= max(statistics.steps, 1)
+        else:
+            self.__remaining_steps = 0
+
+    def take_steps_result(self) -> Optional[Dict[str, Any]]:
+        """The number of steps taken and optionally the diff since last sent once the step request completed, or None."""
+        if self.__remaining_steps is None or self.__remaining_steps > 0:
+            return None
+        self.__remaining_steps = None
+        return {
+            "steps": self.__stepped,
+            "idle": self.__idle,
+            "diff": self.diff() if self.__step_diff else None
+        }
+
+    def diff(self) -> Union[Dict[str, Any], bytes]:
+        """The changes of the brick's state since last sent, the first diff holding the complete state."""
+        diff = self.__simulator.brick.diff_since(self.__sent_version)
+        self.__sent_version = diff["version"]
+        return pack_diff(diff) if self.__binary else diff
+
+    def screen(self, full: bool = False) -> Dict[str, Any]:
+        """The packed rows of the screen which changed since the last fetch, or all of them."""
+        screen = self.__simulator.brick.screen
+        if full:
+            screen.mark_all_dirty()
+        return {
+            "width": screen.width,
+            "height": screen.height,
+            "rows": {y: row for y, row in screen.take_dirty_rows()}
+        }
+
+    def trigger(self, event: str, parameters: Dict[str, Any]) -> None:
+        """Trigger an event, such as a button press."""
+        self.__recorder.trigger(event, parameters)
+
+    def run(self, pacing: str = "realtime", frame_rate: float = 30.0, window: int = 2, step_rate: Optional[float] = None) -> Dict[str, Any]:
+        """Run the simulation autonomously, pushing frames at a rate, and return the negotiated settings."""
+        frame_rate = max(MIN_FRAME_RATE, min(MAX_FRAME_RATE, frame_rate))
+        window = max(1, min(MAX_FRAME_WINDOW, window))
+        self.__pacer = Pacer(self.__simulator.runtime, Pacing.parse(pacing))
+        self.__generation += 1
+        self.__step_rate = step_rate
+        self.__frame_period = 1 / frame_rate
+        self.__next_frame = time.perf_counter()
+        self.__window = window
+        self.__credits = window
+        return {"pacing": pacing, "frameRate": frame_rate, "window": window}
+
+    def pause(self) -> None:
+        """Stop running the simulation autonomously."""
+        if self.__pacer is not None:
+            self.__pacer = None
+            self.__generation += 1
+
+    def acknowledge(self, count: int = 1) -> None:
+        """Note that the client received frames, letting more frames be sent."""
+        self.__credits = min(self.__window, self.__credits + count)
+
+    def tick(self) -> float:
+        """Run a tick of the autonomous loop, returning the wall-clock time of time.perf_counter() at which the next one is due.
+
+        A robot sharing poses with other robots only moves and senses once
+        the poses are updated and the session is synced.
+        """
+        steps = self.__pacer.statistics.steps
+        due = self.__recorder.tick(self.__pacer)
+        now = time.perf_counter()
+        if due is None:
+            due = now
+        steps = self.__pacer.statistics.steps - steps
+        self.__unreported_steps += steps
+        if self.__step_rate is not None:
+            # Spread the steps so that they do not exceed the step rate
+            due = max(due, now + steps / self.__step_rate)
+        return due
+
+    def sync(self) -> None:
+        """Read the sensors once the shared poses were updated, if the robot moved since the last sync."""
+        self.__recorder.sync()
+
+    def close(self) -> None:
+        """Close the journal of the session, if any, and free the robot's pose."""
+        self.__recorder.close()
+        self.__simulator.brick.set_chassis(None)
+
+    def take_frame(self, session: str) -> Optional[Frame]:
+        """The changes of a session since its last frame if a frame is due and the client acknowledged enough frames.
+
+        Changes are coalesced into the next frame while the client falls behind,
+        frames without changes only reporting the steps run since the last one.
+        """
+        now = time.perf_counter()
+        if now < self.__next_frame:
+            return None
+        steps = self.__unreported_steps
+        self.__unreported_steps = 0
+        if self.__credits > 0:
+            self.__next_frame += self.__frame_period
+            if self.__next_frame < now:
+                # Do not send a burst of frames after falling behind
+                self.__next_frame = now + self.__frame_period
+            if self.__simulator.brick.version != self.__sent_version:
+                self.__credits -= 1
+                return Frame(session, self.__simulator.time, self.diff(), steps=steps)
+        # The steps are charged even while the client falls behind
+        return Frame(session, self.__simulator.time, steps=steps) if steps > 0 else None
+
+
+def serve(connection: Connection, cache_directory: str = DEFAULT_CACHE_DIRECTORY) -> None:
+    """Serve the requests of the front end for the sessions held by a worker process, until the connection closes.
+
+    Between requests, the ticks of the sessions running autonomously are run
+    once due, in the order of their due time, along with the step requests.
+    The poses of the robots of all sessions are updated at once after each
+    round, before the sensors of the sessions which ran read their
+    surroundings. Step requests are replied to once completed, which may take
+    several rounds while their robot moves.
+    """
+    cache = ProjectCache(cache_directory)
+    sessions: Dict[str, Session] = {}
+    poses = ChassisPoses()
+    # Due time, sequence, session and generation of the next tick of each
+    # running session, entries of older generations being stale
+    schedule: List[Tuple[float, int, str, int]] = []
+    sequence = itertools.count()
+    # Identifier of the step request of each session running one
+    stepping: Dict[str, Optional[int]] = {}
+
+    journal_directory = os.environ.get(JOURNAL_DIRECTORY_VARIABLE)
+    if journal_directory:
+        os.makedirs(journal_directory, exist_ok=True)
+
+    def create(session: str, data: bytes) -> bool:
+        close(session)
+        simulator = cache.simulator(data, poses)
+        recorder = None
+        if journal_directory:
+            path = os.path.join(journal_directory, "{}-{}.ev3j".format(int(time.time()), session))
+            recorder = Recorder(simulator, JournalWriter(path), ProjectCache.key(data))
+            log.info("Recording session {} to {}".format(session, path))
+        sessions[session] = Session(simulator, recorder)
+        return True
+
+    def close(session: str) -> None:
+        if session in stepping:
+            reply(stepping.pop(session), error="Exception: Session {} was closed".format(session))
+        session = sessions.pop(session, None)
+        if session is not None:
+            session.close()
+
+    def step(session: str, count: int, diff: bool = True) -> None:
+        sessions[session].begin_steps(count, diff)
+
+    def run(session: str, **arguments: Any) -> Dict[str, Any]:
+        result = sessions[session].run(**arguments)
+        heapq.heappush(schedule, (time.perf_counter(), next(sequence), session, sessions[session].generation))
+        return result
+
+    commands: Dict[str, Callable[..., Any]] = {
+        "create": create,
+        "close": close,
+        "start": lambda session, config: sessions[session].start(config),
+        "step": step,
+        "diff": lambda session: sessions[session].diff(),
+        "screen": lambda session, full=False: sessions[session].screen(full),
+        "trigger": lambda session, event, parameters: sessions[session].trigger(event, parameters),
+        "run": run,
+        "pause": lambda session: sessions[session].pause(),
+        "acknowledge": lambda session, count=1: sessions[session].acknowledge(count)
+    }
+
+    def reply(id: Optional[int], result: Any = None, error: Optional[str] = None) -> None:
+        # Notifications do not expect a reply
+        if id is not None:
+            connection.send(Reply(id, result=result, error=error))
+
+    def handle(request: Request) -> None:
+        try:
+            handler = commands.get(request.command)
+            if handler is None:
+                raise Exception("Got unknown command '{}'".format(request.command))
+            result = handler(request.session, **request.arguments)
+        except Exception as exception:
+            log.error("Unable to handle {} for session {}".format(request.command, request.session), exc_info=True)
+            reply(request.id, error="{}: {}".format(type(exception).__name__, exception))
+            return
+        if request.command == "step":
+            # Step requests are replied to once completed
+            stepping[request.session] = request.id
+        else:
+            reply(request.id, result=result)
+
+    def fail(name: str, session: Session, exception: Exception) -> None:
+        log.error("Unable to run session {}".format(name), exc_info=True)
+        session.pause()
+        connection.send(Frame(name, session.simulator.time, error="{}: {}".format(type(exception).__name__, exception)))
+
+    def tick(name: str, generation: int) -> Optional[float]:
+        """Run a tick of a running session, returning when the next one is due, or None if it no longer runs."""
+        session = sessions.get(name)
+        if session is None or session.generation != generation:
+            return None
+        try:
+            return session.tick()
+        except Exception as exception:
+            fail(name, session, exception)
+            return None
+
+    def sync(name: str, generation: int, due: float) -> None:
+        """Let the sensors of a ticked session read the updated poses, then send its frame and schedule its next tick."""
+        session = sessions[name]
+        try:
+            session.sync()
+            frame = session.take_frame(name)
+        except Exception as exception:
+            fail(name, session, exception)
+            return
+        if frame is not None:
+            connection.send(frame)
+        heapq.heappush(schedule, (due, next(sequence), name, generation))
+
+    def run_steps(name: str) -> None:
+        """Run the remaining steps of the step request of a session."""
+        try:
+            sessions[name].run_steps()
+        except Exception as exception:
+            log.error("Unable to step session {}".format(name), exc_info=True)
+            reply(stepping.pop(name), error="{}: {}".format(type(exception).__name__, exception))
+
+    def sync_steps(name: str) -> None:
+        """Let the sensors of a stepped session read the updated poses, then reply once its step request completed."""
+        session = sessions[name]
+        try:
+            session.sync()
+            result = session.take_steps_result()
+        except Exception as exception:
+            log.error("Unable to step session {}".format(name), exc_info=True)
+            reply(stepping.pop(name), error="{}: {}".format(type(exception).__name__, exception))
+            return
+        if result is not None:
+            reply(stepping.pop(name), result=result)
+
+    log.info("Worker {} started".format(os.getpid()))
+    while True:
+        if stepping:
+            timeout = 0.0
+        else:
+            timeout = None if not schedule else max(0.0, schedule[0][0] - time.perf_counter())
+        try:
+            if connection.poll(timeout):
+                # Handle all waiting requests before running any ticks
+                while True:
+                    request: Request = connection.recv()
+                    if request is None:
+                        break
+                    handle(request)
+                    if not connection.poll():
+                        break
+                if request is None:
+                    break
+        except (EOFError, OSError):
+            break
+
+        # Ticks rescheduled right away run in the next round, after requests
+        now = time.perf_counter()
+        ticked: List[Tuple[str, int, float]] = []
+        while schedule and schedule[0][0] <= now:
+            _, _, name, generation = heapq.heappop(schedule)
+            due = tick(name, generation)
+            if due is not None:
+                ticked.append((name, generation, due))
+        stepped = list(stepping)
+        for name in stepped:
+            run_steps(name)
+        if ticked or stepped:
+            poses.update()
+            for name, generation, due in ticked:
+                sync(name, generation, due)
+            for name in stepped:
+                if name in stepping:
+                    sync_steps(name)
+    log.info("Worker {} stopped with {} sessions".format(os.getpid(), len(sessions)))
+    for session in sessions.values():
+        session.close()
+
+
+class Worker:
+    """A worker process holding sessions, with the pending requests sent to it."""
+    def __init__(self, index: int, cache_directory: str = DEFAULT_CACHE_DIRECTORY, on_frame: Optional[Callable[[Frame], None]] = None) -> None:
+        self.__index = index
+        # Called on the event loop with each frame pushed by the worker
+        self.__on_frame = on_frame
+        # Spawn rather than fork, as the front end runs an event loop and threads
+        context = multiprocessing.get_context("spawn")
+        self.__connection, worker_connection = context.Pipe()
+        self.__process = context.Process(target=serve, args=(worker_connection, cache_directory), name="simulation-worker-{}".format(index), daemon=True)
+        self.__worker_connection = worker_connection
+        self.__ids = itertools.count()
+        self.__pending: Dict[int, asyncio.Future] = {}
+        self.__send_lock = threading.Lock()
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__reader: Optional[threading.Thread] = None
+        self.__session_count = 0
+
+    @property
+    def index(self) -> int:
+        """The index of the worker in its pool."""
+        return self.__index
+
+    @property
+    def session_count(self) -> int:
+        """The number of sessions held by the worker."""
+        return self.__session_count
+
+    @property
+    def pending_count(self) -> int:
+        """The number of requests awaiting their reply."""
+        return len(self.__pending)
+
+    @property
+    def is_alive(self) -> bool:
+        """Whether or not the worker process is running."""
+        return self.__process.is_alive()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start the worker process and the thread receiving its replies on behalf of an event loop."""
+        self.__loop = loop
+        self.__process.start()
+        # The worker's end of the pipe is only used by the worker process
+        self.__worker_connection.close()
+        self.__reader = threading.Thread(target=self.__receive, name="simulation-worker-{}-reader".format(self.__index), daemon=True)
+        self.__reader.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ask the worker process to stop and wait for it."""
+        try:
+            with self.__send_lock:
+                self.__connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.__process.join(timeout)
+        if self.__process.is_alive():
+            log.warning("Worker {} did not stop, terminating it".format(self.__index))
+            self.__process.terminate()
+        self.__connection.close()
+
+    def add_session(self) -> None:
+        """Count a session assigned to the worker."""
+        self.__session_count += 1
+
+    def remove_session(self) -> None:
+        """Count a session dropped from the worker."""
+        self.__session_count -= 1
+
+    async def request(self, session: str, command: str, **arguments: Any) -> Any:
+        """Send a command for a session and wait for its result, raising the error it failed with."""
+        request = Request(next(self.__ids), session, command, arguments)
+        future = self.__loop.create_future()
+        self.__pending[request.id] = future
+        try:
+            with self.__send_lock:
+                self.__connection.send(request)
+        except (BrokenPipeError, OSError):
+            del self.__pending[request.id]
+            raise Exception("Worker {} is not running".format(self.__index))
+        return await future
+
+    def notify(self, session: str, command: str, **arguments: Any) -> None:
+        """Send a command for a session without waiting for it, errors only being logged by the worker."""
+        try:
+            with self.__send_lock:
+                self.__connection.send(Request(None, session, command, arguments))
+        except (BrokenPipeError, OSError):
+            log.warning("Unable to notify worker {} of {}".format(self.__index, command))
+
+    def __receive(self) -> None:
+        """Resolve the pending requests with the replies of the worker and pass on its frames, until it stops."""
+        while True:
+            try:
+                message: Union[Reply, Frame] = self.__connection.recv()
+            except (EOFError, OSError):
+                break
+            if isinstance(message, Frame):
+                if self.__on_frame is not None and not self.__call_soon(self.__on_frame, message):
+                    return
+            elif not self.__call_soon(self.__resolve, message):
+                return
+        self.__call_soon(self.__fail_pending)
+
+    def __call_soon(self, callback: Callable[..., None], *arguments: Any) -> bool:
+        """Schedule a callback on the event loop, returning False if the loop is already closed, such as on shutdown."""
+        try:
+            self.__loop.call_soon_threadsafe(callback, *arguments)
+        except RuntimeError:
+            # The loop may close between any check and scheduling the callback
+            log.debug("Event loop of worker {} is closed, dropping its messages".format(self.__index))
+            return False
+        return True
+
+    def __resolve(self, reply: Reply) -> None:
+        future = self.__pending.pop(reply.id, None)
+        if future is None or future.done():
+            return
+        if reply.error is None:
+            future.set_result(reply.result)
+        else:
+            future.set_exception(Exception(reply.error))
+
+    def __fail_pending(self) -> None:
+        if self.__pending:
+            log.error("Worker {} stopped with {} pending requests".format(self.__index, len(self.__pending)))
+        for future in self.__pending.values():
+            if not future.done():
+                future.set_exception(Exception("Worker {} stopped".format(self.__index)))
+        self.__pending.clear()
+
+
+class WorkerPool:
+    """Worker processes sharing the sessions, each session staying with the worker it was created on."""
+    def __init__(self, count: Optional[int] = None, cache_directory: str = DEFAULT_CACHE_DIRECTORY, on_frame: Optional[Callable[[Frame], None]] = None) -> None:
+        count = (os.cpu_count() or 1) if count is None else count
+        self.__workers = [Worker(index, cache_directory, on_frame) for index in range(count)]
+        # The worker holding each session
+        self.__affinity: Dict[str, Worker] = {}
+
+    @property
+    def workers(self) -> int:
+        """The number of worker processes."""
+        return len(self.__workers)
+
+    @property
+    def sessions(self) -> int:
+        """The number of sessions."""
+        return len(self.__affinity)
+
+    def has_session(self, session: str) -> bool:
+        """Whether or not a session was created."""
+        return session in self.__affinity
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start the worker processes."""
+        for worker in self.__workers:
+            worker.start(loop)
+        log.info("Started {} workers".format(len(self.__workers)))
+
+    def stop(self) -> None:
+        """Stop the worker processes."""
+        for worker in self.__workers:
+            worker.stop()
+        self.__affinity.clear()
+
+    async def create(self, session: str, data: bytes) -> bool:
+        """Create a session from a UF2 archive's bytes on the least loaded worker."""
+        if session in self.__affinity:
+            await self.close(session)
+        worker = min((worker for worker in self.__workers if worker.is_alive), key=lambda worker: (worker.session_count, worker.pending_count), default=None)
+        if worker is None:
+            raise Exception("No workers are running")
+        self.__affinity[session] = worker
+        worker.add_session()
+        log.debug("Assigned session {} to worker {}".format(session, worker.index))
+        try:
+            return await worker.request(session, "create", data=data)
+        except Exception:
+            self.__release(session)
+            raise
+
+    async def request(self, session: str, command: str, **arguments: Any) -> Any:
+        """Send a command to the worker holding a session and wait for its result."""
+        worker = self.__affinity.get(session)
+        if worker is None:
+            raise Exception("Got unknown session '{}'".format(session))
+        return await worker.request(session, command, **arguments)
+
+    def notify(self, session: str, command: str, **arguments: Any) -> None:
+        """Send a command to the worker holding a session without waiting for it."""
+        worker = self.__affinity.get(session)
+        if worker is not None:
+            worker.notify(session, command, **arguments)
+
+    async def close(self, session: str) -> None:
+        """Drop a session from its worker."""
+        worker = self.__release(session)
+        if worker is not None and worker.is_alive:
+            await worker.request(session, "close")
+
+    def __release(self, session: str) -> Optional[Worker]:
+        worker = self.__affinity.pop(session, None)
+        if worker is not None:
+            worker.remove_session()
+        return worker
+
+
+class StepBudget:
+    """A token bucket of steps per second of a tenant, refilled continuously up to a burst."""
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic) -> None:
+        if rate <= 0:
+            raise Exception("The step rate must be positive, got {}".format(rate))
+        self.__rate = rate
+        self.__burst = rate if burst is None else burst
+        self.__clock = clock
+        self.__tokens = self.__burst
+        self.__updated = clock()
+
+    @property
+    def rate(self) -> float:
+        """The number of steps per second."""
+        return self.__rate
+
+    @property
+    def available(self) -> float:
+        """The number of steps which can be taken right now."""
+        self.__refill()
+        return self.__tokens
+
+    def take(self, count: int) -> int:
+        """Take up to count steps from the budget, returning the number of steps granted."""
+        self.__refill()
+        granted = max(0, min(count, int(self.__tokens)))
+        self.__tokens -= granted
+        return granted
+
+    def refund(self, count: int) -> None:
+        """Return steps which were granted but not taken."""
+        self.__tokens = min(self.__burst, self.__tokens + count)
+
+    def charge(self, count: int) -> None:
+        """Take steps which were already run, such as by sessions running autonomously, running into debt of up to a burst."""
+        self.__refill()
+        self.__tokens = max(-self.__burst, self.__tokens - count)
+
+    def wait_time(self, count: int = 1) -> float:
+        """The time in seconds until count steps are available."""
+        self.__refill()
+        return max(0.0, (min(count, self.__burst) - self.__tokens) / self.__rate)
+
+    def __refill(self) -> None:
+        now = self.__clock()
+        self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.__rate)
+        self.__updated = now
@@ -0,0 +1,204 @@
+import math
+import logging
+from typing import Dict, List, Tuple, Optional, Any
+
+log = logging.getLogger(__name__)
+
+# Colors detected by the color sensor, by their index in the floor raster
+COLORS = [
+    "ColorSensorColor.None",
+    "ColorSensorColor.Black",
+    "ColorSensorColor.Blue",
+    "ColorSensorColor.Green",
+    "ColorSensorColor.Yellow",
+    "ColorSensorColor.Red",
+    "ColorSensorColor.White",
+    "ColorSensorColor.Brown"
+]
+
+# Size in millimeters of the cells of the spatial index of the walls
+INDEX_CELL_SIZE = 100.0
+
+
+class World:
+    """A flat world with walls and a floor raster of reflected light and colors, sizes being in millimeters."""
+    def __init__(self, width: float, height: float, resolution: float = 5.0, floor_reflection: int = 10, floor_color: str = "ColorSensorColor.None", start: Tuple[float, float, float] = (0.0, 0.0, 0.0)) -> None:
+        self.__width = width
+        self.__height = height
+        # Size of a floor cell in millimeters
+        self.__resolution = resolution
+        self.__columns = max(int(math.ceil(width / resolution)), 1)
+        self.__rows = max(int(math.ceil(height / resolution)), 1)
+        # Reflected light in percent and color index per floor cell, row by row
+        self.__reflection = bytearray([floor_reflection]) * (self.__columns * self.__rows)
+        self.__colors = bytearray([COLORS.index(floor_color)]) * (self.__columns * self.__rows)
+        # Position and heading in degrees at which robots start
+        self.__start = start
+
+        self.__walls: List[Tuple[float, float, float, float]] = []
+        # Indices of the walls crossing each cell of the spatial index
+        self.__index: Dict[Tuple[int, int], List[int]] = {}
+
+    @property
+    def width(self) -> float:
+        """The width in millimeters."""
+        return self.__width
+
+    @property
+    def height(self) -> float:
+        """The height in millimeters."""
+        return self.__height
+
+    @property
+    def start(self) -> Tuple[float, float, float]:
+        """The position in millimeters and heading in degrees at which robots start."""
+        return self.__start
+
+    @property
+    def walls(self) -> List[Tuple[float, float, float, float]]:
+        """The walls as line segments from (x1, y1) to (x2, y2)."""
+        return self.__walls
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "World":
+        """Create a world from a description, such as one sent by a client."""
+        world = World(
+            data["width"],
+            data["height"],
+            data.get("resolution", 5.0),
+            data.get("floorReflection", 10),
+            data.get("floorColor", "ColorSensorColor.None"),
+            tuple(data.get("start", (0.0, 0.0, 0.0)))
+        )
+        for line in data.get("lines", []):
+            world.draw_path(line["points"], line.get("width", 20.0), line.get("reflection", 90), line.get("color", "ColorSensorColor.White"))
+        for wall in data.get("walls", []):
+            world.add_wall(*wall)
+        if data.get("boundary", False):
+            world.add_boundary()
+        return world
+
+    def add_wall(self, x1: float, y1: float, x2: float, y2: float) -> None:
+        """Add a wall from (x1, y1) to (x2, y2), indexing it by the cells it crosses."""
+        index = len(self.__walls)
+        self.__walls.append((x1, y1, x2, y2))
+
+        # Conservatively index the wall in every cell of its bounding box
+        for column in range(int(min(x1, x2) // INDEX_CELL_SIZE), int(max(x1, x2) // INDEX_CELL_SIZE) + 1):
+            for row in range(int(min(y1, y2) // INDEX_CELL_SIZE), int(max(y1, y2) // INDEX_CELL_SIZE) + 1):
+                self.__index.setdefault((column, row), []).append(index)
+
+    def add_boundary(self) -> None:
+        """Surround the world by walls."""
+        self.add_wall(0, 0, self.__width, 0)
+        self.add_wall(self.__width, 0, self.__width, self.__height)
+        self.add_wall(self.__width, self.__height, 0, self.__height)
+        self.add_wall(0, self.__height, 0, 0)
+
+    def fill_rect(self, x: float, y: float, width: float, height: float, reflection: int, color: str = "ColorSensorColor.None") -> None:
+        """Paint a rectangle of the floor."""
+        color_index = COLORS.index(color)
+        start_column, end_column = self.__column(x), self.__column(x + width)
+        for row in range(self.__row(y), self.__row(y + height) + 1):
+            start = row * self.__columns
+            length = end_column - start_column + 1
+            self.__reflection[start + start_column:start + end_column + 1] = bytes([reflection]) * length
+            self.__colors[start + start_column:start + end_column + 1] = bytes([color_index]) * length
+
+    def draw_path(self, points: List[Tuple[float, float]], width: float, reflection: int = 90, color: str = "ColorSensorColor.White") -> None:
+        """Paint a path of a width along points on the floor, such as a line track."""
+        color_index = COLORS.index(color)
+        radius = width / 2
+        resolution = self.__resolution
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            for row in range(self.__row(min(y1, y2) - radius), self.__row(max(y1, y2) + radius) + 1):
+                for column in range(self.__column(min(x1, x2) - radius), self.__column(max(x1, x2) + radius) + 1):
+                    # Paint the cells whose centers are close enough to the segment
+                    if distance_to_segment((column + 0.5) * resolution, (row + 0.5) * resolution, x1, y1, x2, y2) <= radius:
+                        cell = row * self.__columns + column
+                        self.__reflection[cell] = reflection
+                        self.__colors[cell] = color_index
+
+    def sample(self, x: float, y: float) -> Tuple[int, str]:
+        """The reflected light in percent and the color of the floor at a position."""
+        if x < 0 or y < 0 or x >= self.__width or y >= self.__height:
+            return (0, COLORS[0])
+        cell = self.__row(y) * self.__columns + self.__column(x)
+        return (self.__reflection[cell], COLORS[self.__colors[cell]])
+
+    def raycast(self, x: float, y: float, angle: float, max_distance: float) -> Optional[float]:
+        """The distance to the closest wall along a ray from a position at an angle in radians, if any within max_distance."""
+        dx = math.cos(angle)
+        dy = math.sin(angle)
+        column = int(x // INDEX_CELL_SIZE)
+        row = int(y // INDEX_CELL_SIZE)
+        step_column = 1 if dx > 0 else -1
+        step_row = 1 if dy > 0 else -1
+        # Distances along the ray to the next cell boundaries and between them
+        next_x = ((column + (step_column > 0)) * INDEX_CELL_SIZE - x) / dx if dx != 0 else math.inf
+        next_y = ((row + (step_row > 0)) * INDEX_CELL_SIZE - y) / dy if dy != 0 else math.inf
+        delta_x = INDEX_CELL_SIZE / abs(dx) if dx != 0 else math.inf
+        delta_y = INDEX_CELL_SIZE / abs(dy) if dy != 0 else math.inf
+
+        visited = set()
+        closest = None
+        travelled = 0.0
+        while travelled <= max_distance:
+            for index in self.__index.get((column, row), ()):
+                if index in visited:
+                    continue
+                visited.add(index)
+                distance = intersect_ray(x, y, dx, dy, *self.__walls[index])
+                if distance is not None and (closest is None or distance < closest):
+                    closest = distance
+            if closest is not None and closest <= min(next_x, next_y):
+                # Walls of later cells can only be hit further away
+                return closest if closest <= max_distance else None
+
+            if next_x < next_y:
+                travelled = next_x
+                next_x += delta_x
+                column += step_column
+            else:
+                travelled = next_y
+                next_y += delta_y
+                row += step_row
+        return None
+
+    def collides(self, x: float, y: float, radius: float) -> bool:
+        """Whether or not a circle at a position touches any wall."""
+        for column in range(int((x - radius) // INDEX_CELL_SIZE), int((x + radius) // INDEX_CELL_SIZE) + 1):
+            for row in range(int((y - radius) // INDEX_CELL_SIZE), int((y + radius) // INDEX_CELL_SIZE) + 1):
+                for index in self.__index.get((column, row), ()):
+                    if distance_to_segment(x, y, *self.__walls[index]) <= radius:
+                        return True
+        return False
+
+    def __column(self, x: float) -> int:
+        return max(0, min(self.__columns - 1, int(x // self.__resolution)))
+
+    def __row(self, y: float) -> int:
+        return max(0, min(self.__rows - 1, int(y // self.__resolution)))
+
+
+def distance_to_segment(x: float, y: float, x1: float, y1: float, x2: float, y2: float) -> float:
+    """The distance of a point to a line segment."""
+    dx = x2 - x1
+    dy = y2 - y1
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length))
+    return math.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+
+def intersect_ray(x: float, y: float, dx: float, dy: float, x1: float, y1: float, x2: float, y2: float) -> Optional[float]:
+    """The distance along a ray with a unit direction to where it crosses a line segment, if it does."""
+    sx = x2 - x1
+    sy = y2 - y1
+    denominator = dx * sy - dy * sx
+    if denominator == 0:
+        return None
+    distance = ((x1 - x) * sy - (y1 - y) * sx) / denominator
+    t = ((x1 - x) * dy - (y1 - y) * dx) / denominator
+    if distance < 0 or t < 0 or t > 1:
+        return None
+    return distance
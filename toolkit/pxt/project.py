@@ -2,19 +2,61 @@ import json
 import lzma
 import struct
 import logging
-from typing import Tuple, Iterator, List
+from typing import Tuple, Iterator, List, Optional
 from lzma import LZMAError, LZMADecompressor
 
 from toolkit.uf2.uf2 import UF2
 
+# NumPy is optional, but speeds up scanning large payloads
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 log = logging.getLogger(__name__)
 
+# The magic number of the meta data hidden within the binary data
+# payload of some block (the ELF block in this case)
+META_MAGIC = bytes([0x41, 0x14, 0x0E, 0x2F, 0xB8, 0x2F, 0xA2, 0xBB])
+
+
+def find_aligned(payload: bytes, magic: bytes, alignment: int) -> Iterator[int]:
+    """Find every offset aligned to the given alignment where the payload starts with an 8 byte magic number."""
+    if numpy is not None and len(magic) == 8 and alignment % 8 == 0:
+        # Compare the first 8 bytes of every aligned chunk in one go
+        words = numpy.frombuffer(payload, dtype="<u8", count=len(payload) // 8)
+        matches = numpy.flatnonzero(words[0::alignment // 8] == int.from_bytes(magic, "little"))
+        yield from (int(match) * alignment for match in matches)
+        return
+
+    # bytes.find skips ahead at C speed, only alignment is checked in Python
+    if not isinstance(payload, (bytes, bytearray)):
+        payload = bytes(payload)
+    position = payload.find(magic)
+    while position != -1:
+        if position % alignment == 0:
+            yield position
+            position = payload.find(magic, position + alignment)
+        else:
+            position = payload.find(magic, position + alignment - position % alignment)
+
 
 class Project:
     def __init__(self, archive: UF2) -> None:
         self.__archive = archive
-        self.__meta, self.__source_meta, self.__source = next(self.__extract_sources())
-        self.__pxt = json.loads(self.__source["pxt.json"])
+        # The sources are extracted on first access, as decompressing them is
+        # expensive and not always needed
+        self.__meta_block: Optional[Tuple[object, Optional[bytes]]] = None
+        self.__sources: Optional[Tuple[object, object]] = None
+        self.__pxt: Optional[object] = None
+
+    @staticmethod
+    def from_sources(meta: object, source_meta: object, source: object, archive: UF2 = None) -> "Project":
+        """Create a project from already extracted sources, such as cached ones."""
+        project = Project(archive)
+        project.__meta_block = (meta, None)
+        project.__sources = (source_meta, source)
+        return project
 
     @property
     def archive(self) -> UF2:
@@ -24,44 +66,47 @@ class Project:
     @property
     def meta(self) -> object:
         """The main archive meta data."""
-        return self.__meta
+        if self.__meta_block is None:
+            self.__meta_block = self.__extract_meta_block()
+        return self.__meta_block[0]
 
     @property
     def source_meta(self) -> object:
         """The source's meta."""
-        return self.__source_meta
+        if self.__sources is None:
+            self.__sources = self.__extract_sources()
+        return self.__sources[0]
 
     @property
     def source(self) -> object:
         """The project's source."""
-        return self.__source
+        if self.__sources is None:
+            self.__sources = self.__extract_sources()
+        return self.__sources[1]
 
     @property
     def readme(self) -> str:
         """The project's README text."""
-        return self.__source["README.md"]
+        return self.source["README.md"]
 
     @property
     def pxt(self) -> object:
         """The project's PXT definition."""
+        if self.__pxt is None and self.source is not None:
+            self.__pxt = json.loads(self.source["pxt.json"])
         return self.__pxt
 
     @property
     def name(self) -> str:
         """The project's name."""
-        return self.__meta["name"]
-
-    @property
-    def name(self) -> str:
-        """The project's name."""
-        return self.__meta["name"]
+        return self.meta["name"]
 
     @property
     def source_files(self) -> List[Tuple[str, str]]:
         """The project's source files."""
         files = []
-        for filename in self.__pxt["files"]:
-            files.append((filename, self.__source[filename]))
+        for filename in self.pxt["files"]:
+            files.append((filename, self.source[filename]))
         return files
 
     @property
@@ -71,19 +116,11 @@ class Project:
 
     def file_by_name(self, filename: str) -> str:
         """Get a file's content by name."""
-        return self.__source[filename] if filename in self.__source else None
+        return self.source[filename] if filename in self.source else None
 
     def __find_meta_blocks(self, payload: bytes) -> Iterator[int]:
-        """Loop through the data to find any matching block start."""
-        # The magic number of the meta data hidden within the binary data
-        # payload of some block (the ELF block in this case)
-        magic = bytes([0x41, 0x14, 0x0E, 0x2F, 0xB8, 0x2F, 0xA2, 0xBB])
-        for i in range(0, len(payload), 16):
-            current_magic = payload[i:i + 8]
-
-            # Compare the magic number to the first 8 bytes
-            if current_magic == magic:
-                yield i
+        """Find the start of any meta block in the data."""
+        return find_aligned(payload, META_MAGIC, 16)
 
     def __extract_header(self, payload: bytes, meta_block_start: int) -> Tuple[int, int]:
         """Extract the lengths of the fields."""
@@ -113,8 +150,8 @@ class Project:
         text_start = meta_end
         text_end = text_start + text_length
 
-        meta = json.loads(payload[meta_start:meta_end])
-        compressed_text = payload[text_start:text_end]
+        meta = json.loads(bytes(payload[meta_start:meta_end]))
+        compressed_text = bytes(payload[text_start:text_end])
 
         return (meta, compressed_text)
 
@@ -122,9 +159,10 @@ class Project:
     def __lzma_decompress(self, compressed: bytes) -> bytes:
         """Decompress LZMA data."""
         # Log the printf-friendly hex representation of the bytes to decompress
-        hex = compressed.hex()
-        hex = "\\x" + "\\x".join([hex[i:i+2] for i in range(0, len(hex), 2)])
-        log.debug("Attempting LZMA decompression of bytes: {}".format(hex))
+        if log.isEnabledFor(logging.DEBUG):
+            hex = compressed.hex()
+            hex = "\\x" + "\\x".join([hex[i:i+2] for i in range(0, len(hex), 2)])
+            log.debug("Attempting LZMA decompression of bytes: {}".format(hex))
 
         properties, dictionary_size, uncompressed_size = struct.unpack("<BIQ", compressed[:13])
         if properties > (4 * 5 + 4) * 9 + 8:
@@ -154,16 +192,16 @@ class Project:
         # it may have to be changed (6-7 seems to work well)
         return decompressor.decompress(compressed[:-6])
 
-    def __extract_sources(self) -> Iterator[Tuple[object, object, object]]:
+    def __extract_meta_block(self) -> Tuple[object, Optional[bytes]]:
         """
-        Extract MakeCode sources from the archive.
+        Extract the meta data and the compressed source from the archive.
 
         Based off of the pxt source code from https://github.com/microsoft/pxt,
         pxt/cpp.ts@extractSourceFromBin.
         """
 
         # All bytes in the correct order
-        payload = self.__archive.extract_bytes()
+        payload = self.__archive.assemble()
 
         for meta_block_start in self.__find_meta_blocks(payload):
             log.debug("Found meta block at byte offset {}".format(meta_block_start))
@@ -180,26 +218,35 @@ class Project:
                 meta, compressed_text = self.__extract_meta(payload, meta_block_start, meta_length, text_length)
             except ValueError:
                 log.warning("Unable to parse meta from JSON", exc_info=True)
-                yield (None, None, None)
-                continue
+                return (None, None)
 
             # As per MakeCode, the only officially supported compression algorithm
             # is LZMA
             if not meta["compression"] == "LZMA":
                 log.warning("Unsupported compression algorithm: {}".format(meta["compression"]))
-                yield (meta, None, None)
-                continue
-
-            try:
-                text = self.__lzma_decompress(compressed_text)
-                # Workaround for the byte issue caused in __lzma_decompress
-                if text.decode()[-1:][0] != "}":
-                    text += b"}"
-
-                source_length = meta["headerSize"] or meta["metaSize"] or 0
-                source_meta = json.loads(text[0:source_length])
-                source = json.loads(text[source_length:])
-                yield (meta, source_meta, source)
-            except LZMAError:
-                log.warning("Unable to decompress source", exc_info=True)
-                yield (meta, None, None)
+                return (meta, None)
+
+            return (meta, compressed_text)
+
+        raise Exception("Unable to find any meta block in the archive")
+
+    def __extract_sources(self) -> Tuple[object, object]:
+        """Decompress and parse the source meta and the source."""
+        meta = self.meta
+        compressed_text = self.__meta_block[1]
+        if compressed_text is None:
+            return (None, None)
+
+        try:
+            text = self.__lzma_decompress(compressed_text)
+            # Workaround for the byte issue caused in __lzma_decompress
+            if text.decode()[-1:][0] != "}":
+                text += b"}"
+
+            source_length = meta["headerSize"] or meta["metaSize"] or 0
+            source_meta = json.loads(text[0:source_length])
+            source = json.loads(text[source_length:])
+            return (source_meta, source)
+        except LZMAError:
+            log.warning("Unable to decompress source", exc_info=True)
+            return (None, None)
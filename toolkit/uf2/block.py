@@ -1,5 +1,5 @@
 import struct
-from typing import Tuple
+from typing import Tuple, Optional
 from struct import Struct
 
 NOT_MAIN_FLASH = 0x00000001
@@ -83,6 +83,11 @@ class Block():
         """File size or board family ID or zero."""
         return self.__file_size_or_family_id
 
+    @property
+    def payload(self) -> memoryview:
+        """Data, excluding padding and the optional checksum, without copying it."""
+        return memoryview(self.__data)[0:self.__payload_size]
+
     @property
     def data(self) -> bytes:
         """Data, excluding padding and the optional checksum."""
@@ -94,7 +99,7 @@ class Block():
         return self.__magic_end
 
     @property
-    def checksum(self) -> Tuple[int, int, bytes]:
+    def checksum(self) -> Optional[Tuple[int, int, bytes]]:
         """The optionally specified checksum."""
         if not self.is_md5_checksum_present:
             return None
@@ -102,7 +107,7 @@ class Block():
         return checksum_struct.unpack(self.__data[-24::])
 
     @property
-    def filename(self) -> str:
+    def filename(self) -> Optional[str]:
         """The filename if specified."""
         if not self.is_file_container:
             return None
@@ -147,3 +152,157 @@ class Block():
             raise Exception("Got bad magic number 2. Expected {}, got {}".format(MAGIC_NUMBER_1, self.__magic_start_1))
         if not self.__magic_end == MAGIC_NUMBER_END:
             raise Exception("Got bad end magic number. Expected {}, got {}".format(MAGIC_NUMBER_END, self.__magic_end))
+
+# Byte offsets of the fields within a 512 byte block
+MAGIC_START_0_OFFSET = 0
+MAGIC_START_1_OFFSET = 4
+FLAGS_OFFSET = 8
+TARGET_ADDRESS_OFFSET = 12
+PAYLOAD_SIZE_OFFSET = 16
+BLOCK_NUMBER_OFFSET = 20
+NUMBER_OF_BLOCKS_OFFSET = 24
+FILE_SIZE_OFFSET = 28
+DATA_OFFSET = 32
+MAGIC_END_OFFSET = 508
+BLOCK_SIZE = 512
+
+field_struct = Struct('<L')
+
+class BlockView():
+    def __init__(self, buffer: memoryview) -> None:
+        """Create a lightweight view of a block in the given 512 byte buffer without copying it."""
+        self.__buffer = buffer
+
+    def __field(self, offset: int) -> int:
+        return field_struct.unpack_from(self.__buffer, offset)[0]
+
+    @property
+    def buffer(self) -> memoryview:
+        """The underlying buffer of the block."""
+        return self.__buffer
+
+    @property
+    def magic_start_0(self) -> bytes:
+        """First magic number, 0x0A324655 ("UF2\\n")."""
+        return bytes(self.__buffer[MAGIC_START_0_OFFSET:MAGIC_START_1_OFFSET])
+
+    @property
+    def magic_start_1(self) -> bytes:
+        """Second magic number, 0x9E5D5157."""
+        return bytes(self.__buffer[MAGIC_START_1_OFFSET:FLAGS_OFFSET])
+
+    @property
+    def magic_start(self) -> bytes:
+        """Magic bytes."""
+        return bytes(self.__buffer[MAGIC_START_0_OFFSET:FLAGS_OFFSET])
+
+    @property
+    def flags(self) -> int:
+        """Flags."""
+        return self.__field(FLAGS_OFFSET)
+
+    @property
+    def target_address(self) -> int:
+        """Address in flash where the data should be written."""
+        return self.__field(TARGET_ADDRESS_OFFSET)
+
+    @property
+    def payload_size(self) -> int:
+        """Number of bytes used in data (often 256)."""
+        return self.__field(PAYLOAD_SIZE_OFFSET)
+
+    @property
+    def block_number(self) -> int:
+        """Sequential block number; starts at 0."""
+        return self.__field(BLOCK_NUMBER_OFFSET)
+
+    @property
+    def number_of_blocks(self) -> int:
+        """Total number of blocks in file."""
+        return self.__field(NUMBER_OF_BLOCKS_OFFSET)
+
+    @property
+    def file_size(self) -> int:
+        """File size or board family ID or zero."""
+        return self.__field(FILE_SIZE_OFFSET)
+
+    @property
+    def family_id(self) -> int:
+        """File size or board family ID or zero."""
+        return self.__field(FILE_SIZE_OFFSET)
+
+    @property
+    def payload(self) -> memoryview:
+        """Data, excluding padding and the optional checksum, without copying it."""
+        return self.__buffer[DATA_OFFSET:DATA_OFFSET + self.payload_size]
+
+    @property
+    def data(self) -> bytes:
+        """Data, excluding padding and the optional checksum."""
+        return bytes(self.payload)
+
+    @property
+    def magic_end(self) -> bytes:
+        """Final magic number, 0x0AB16F30."""
+        return bytes(self.__buffer[MAGIC_END_OFFSET:BLOCK_SIZE])
+
+    @property
+    def checksum(self) -> Optional[Tuple[int, int, bytes]]:
+        """The optionally specified checksum."""
+        if not self.is_md5_checksum_present:
+            return None
+
+        return checksum_struct.unpack_from(self.__buffer, MAGIC_END_OFFSET - checksum_struct.size)
+
+    @property
+    def filename(self) -> Optional[str]:
+        """The filename if specified."""
+        if not self.is_file_container:
+            return None
+
+        data = self.__buffer[DATA_OFFSET:MAGIC_END_OFFSET]
+        payload_size = self.payload_size
+        string_termination = bytes(data).index(b'\x00', payload_size)
+        return bytes(data[payload_size:string_termination]).decode()
+
+    @property
+    def is_not_main_flash(self) -> bool:
+        """Whether or not the block is meant for the main flash."""
+        return self.flags & NOT_MAIN_FLASH > 0
+
+    @property
+    def is_file_container(self) -> bool:
+        """Whether or not the block is part of a file container."""
+        return self.flags & FILE_CONTAINER > 0
+
+    @property
+    def is_family_id_present(self) -> bool:
+        """Whether or not a family id is present."""
+        return self.flags & FAMILY_ID_PRESENT > 0
+
+    @property
+    def is_md5_checksum_present(self) -> bool:
+        """Whether or not a md5 checksum is present."""
+        return self.flags & MD5_CHECKSUM_PRESENT > 0
+
+    @property
+    def is_extension_tags_present(self) -> bool:
+        """Whether or not extension tags are present."""
+        return self.flags & EXTENSION_TAGS_PRESENT > 0
+
+    def pack(self) -> bytes:
+        """Pack the block into bytes."""
+        return bytes(self.__buffer)
+
+    def to_block(self) -> Block:
+        """Copy the view into a fully unpacked block."""
+        return Block(self.pack())
+
+    def validate(self) -> None:
+        """Validate the block."""
+        if not self.__buffer[MAGIC_START_0_OFFSET:MAGIC_START_1_OFFSET] == MAGIC_NUMBER_0:
+            raise Exception("Got bad magic number 1. Expected {}, got {}".format(MAGIC_NUMBER_0, self.magic_start_0))
+        if not self.__buffer[MAGIC_START_1_OFFSET:FLAGS_OFFSET] == MAGIC_NUMBER_1:
+            raise Exception("Got bad magic number 2. Expected {}, got {}".format(MAGIC_NUMBER_1, self.magic_start_1))
+        if not self.__buffer[MAGIC_END_OFFSET:BLOCK_SIZE] == MAGIC_NUMBER_END:
+            raise Exception("Got bad end magic number. Expected {}, got {}".format(MAGIC_NUMBER_END, self.magic_end))
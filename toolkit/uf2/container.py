@@ -0,0 +1,53 @@
+from typing import List, Tuple, Union
+
+from toolkit.uf2.block import Block, BlockView
+
+
+class ContainerFile():
+    def __init__(self, filename: str, file_size: int) -> None:
+        """Create an empty file of a file container, to be filled by blocks."""
+        self.__filename = filename
+        self.__buffer = bytearray(file_size)
+        # One byte per byte of the file, set once the byte has been written
+        self.__coverage = bytearray(file_size)
+        self.__covered = 0
+
+    @property
+    def filename(self) -> str:
+        """The filename."""
+        return self.__filename
+
+    @property
+    def data(self) -> memoryview:
+        """The file's content, without copying it."""
+        return memoryview(self.__buffer)
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether or not every byte of the file has been written."""
+        return self.__covered == len(self.__buffer)
+
+    @property
+    def missing_ranges(self) -> List[Tuple[int, int]]:
+        """The start (inclusive) and end (exclusive) of each range not yet written."""
+        ranges = []
+        start = self.__coverage.find(0)
+        while start != -1:
+            end = self.__coverage.find(1, start)
+            end = len(self.__coverage) if end == -1 else end
+            ranges.append((start, end))
+            start = self.__coverage.find(0, end)
+        return ranges
+
+    def write(self, block: Union[Block, BlockView]) -> None:
+        """Write the payload of a block in place."""
+        start = block.target_address
+        end = start + block.payload_size
+        if end > len(self.__buffer):
+            # The block reaches beyond the specified file size, grow the file
+            self.__buffer.extend(bytes(end - len(self.__buffer)))
+            self.__coverage.extend(bytes(end - len(self.__coverage)))
+
+        self.__buffer[start:end] = block.payload
+        self.__covered += (end - start) - self.__coverage.count(1, start, end)
+        self.__coverage[start:end] = b"\x01" * (end - start)
@@ -1,50 +1,143 @@
 import os
-from typing import List, Iterator
+import struct
+import logging
+from array import array
+from mmap import mmap as MemoryMap, ACCESS_READ
+from typing import Dict, List, Iterator, Union, Optional, Set, Tuple
 
-from toolkit.uf2.block import Block
+from toolkit.uf2.block import Block, BlockView, MAGIC_NUMBER_0, MAGIC_NUMBER_1, MAGIC_NUMBER_END, BLOCK_NUMBER_OFFSET, BLOCK_SIZE, field_struct
+from toolkit.uf2.container import ContainerFile
 
-BLOCK_SIZE = 512
+log = logging.getLogger(__name__)
 
 class UF2():
-    def __init__(self, blocks: List[Block]) -> None:
+    def __init__(self, blocks: List[Union[Block, BlockView]], buffer: Optional[memoryview] = None, mapping: Optional[MemoryMap] = None) -> None:
         """Create a UF2 file from blocks."""
         self.__blocks = blocks
+        # The buffer and memory mapping backing any block views
+        self.__buffer = buffer
+        self.__mapping = mapping
+
+    def __enter__(self) -> "UF2":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
 
     @property
-    def blocks(self) -> List[Block]:
+    def blocks(self) -> List[Union[Block, BlockView]]:
         """All available blocks."""
         return self.__blocks
 
-    def extract_binary(self) -> bytes:
-        data: bytes = bytes()
+    def close(self) -> None:
+        """Release the buffer backing the block views, if any.
+
+        Any payload views handed out by the blocks must be released before
+        the memory mapping can be closed.
+        """
+        for block in self.__blocks:
+            if isinstance(block, BlockView):
+                block.buffer.release()
+
+        if self.__buffer is not None:
+            self.__buffer.release()
+            self.__buffer = None
+
+        if self.__mapping is not None:
+            self.__mapping.close()
+            self.__mapping = None
+
+    def assemble(self) -> memoryview:
+        """Assemble all payload bytes into a single buffer in linear time.
+
+        The payloads are grouped into segments, one per file in a file
+        container and one for the main flash, ordered by their first block
+        number. Each payload is written at its target address relative to the
+        segment's lowest address, so blocks may be out of order and gaps are
+        zero-filled.
+        """
+        # Find the address range and first block number of each segment
+        segments: Dict[Optional[str], List[int]] = {}
+        placements: List[Tuple[Optional[str], int, int]] = []
         for block in self.__blocks:
-            data += block.data[0:block.payload_size]
-        return data
+            segment = block.filename if block.is_file_container else None
+            start = block.target_address
+            end = start + block.payload_size
+            placements.append((segment, start, end))
+            if segment not in segments:
+                segments[segment] = [block.block_number, start, end]
+            else:
+                bounds = segments[segment]
+                bounds[0] = min(bounds[0], block.block_number)
+                bounds[1] = min(bounds[1], start)
+                bounds[2] = max(bounds[2], end)
+
+        # Lay the segments out one after the other
+        offsets: Dict[Optional[str], int] = {}
+        size = 0
+        for segment, (_, start, end) in sorted(segments.items(), key=lambda item: item[1][0]):
+            offsets[segment] = size - start
+            size += end - start
+
+        result = bytearray(size)
+        for block, (segment, start, end) in zip(self.__blocks, placements):
+            offset = offsets[segment]
+            result[offset + start:offset + end] = block.payload
+
+        return memoryview(result)
+
+    def extract_binary(self) -> bytes:
+        return bytes(self.assemble())
+
+    def reassemble_files(self) -> Dict[str, ContainerFile]:
+        """Reassemble all files of the file container in a single pass."""
+        files: Dict[str, ContainerFile] = {}
+        for filename, file in self.__reassemble():
+            files[filename] = file
+        return files
 
-    def extract_files(self) -> List[str]:
+    def stream_files(self) -> Iterator[Tuple[str, memoryview]]:
+        """Yield each file of the file container as soon as it is complete.
+
+        Incomplete files are yielded last, with their missing ranges zeroed.
+        """
+        for filename, file in self.__reassemble():
+            yield (filename, file.data)
+
+    def extract_files(self) -> Dict[str, bytearray]:
         """Files in the archive."""
-        files: Dict[str, bytes] = {}
+        return {filename: file.data.obj for filename, file in self.reassemble_files().items()}
 
+    def __reassemble(self) -> Iterator[Tuple[str, ContainerFile]]:
+        """Reassemble files, yielding each one once complete and any incomplete ones at the end."""
+        files: Dict[str, ContainerFile] = {}
+        yielded: Set[str] = set()
         for block in self.__blocks:
             if not block.is_file_container:
                 continue
 
-            if block.filename is None:
+            filename = block.filename
+            if filename is None:
                 raise Exception("Got bad filename")
 
-            if block.filename not in files:
-                files[block.filename] = bytearray(block.file_size)
+            file = files.get(filename)
+            if file is None:
+                file = ContainerFile(filename, block.file_size)
+                files[filename] = file
 
-            files[block.filename] = files[block.filename][0:block.target_address] + block.data + files[block.filename][block.target_address + block.payload_size:]
+            file.write(block)
+            if file.is_complete and filename not in yielded:
+                yielded.add(filename)
+                yield (filename, file)
 
-        return files
+        for filename, file in files.items():
+            if filename not in yielded:
+                log.warning("File '{}' is incomplete, missing ranges {}".format(filename, file.missing_ranges))
+                yield (filename, file)
 
     def extract_bytes(self) -> bytes:
         """Extract all payload bytes in the correct order."""
-        result = bytes()
-        for block in self.__blocks:
-            result += block.data[:block.payload_size]
-        return result
+        return bytes(self.assemble())
 
     @staticmethod
     def parse(content: bytes) -> "UF2":
@@ -67,6 +160,73 @@ class UF2():
 
         return UF2(blocks)
 
+    @staticmethod
+    def validate_buffer(buffer: memoryview) -> None:
+        """Validate the magic numbers of all blocks in a buffer in one batch."""
+        # View the buffer as 32-bit words so that each magic number of every
+        # block can be compared using a single strided slice
+        words_per_block = BLOCK_SIZE // 4
+        number_of_blocks = len(buffer) // BLOCK_SIZE
+        valid = True
+        with buffer.cast("I") as words:
+            for index, magic in ((0, MAGIC_NUMBER_0), (1, MAGIC_NUMBER_1), (words_per_block - 1, MAGIC_NUMBER_END)):
+                expected = array("I", struct.unpack("=I", magic)) * number_of_blocks
+                if words[index::words_per_block] != memoryview(expected):
+                    valid = False
+                    break
+
+        if not valid:
+            # Fall back to validating block by block for a detailed error
+            for i in range(number_of_blocks):
+                # Release each view even on errors, so that mappings can be closed
+                with buffer[i * BLOCK_SIZE:(i + 1) * BLOCK_SIZE] as view:
+                    BlockView(view).validate()
+
+    @staticmethod
+    def from_buffer(buffer: Union[bytes, bytearray, memoryview, MemoryMap], validate: bool = True, mapping: Optional[MemoryMap] = None) -> "UF2":
+        """Create a UF2 file of lightweight block views of a buffer, without copying it."""
+        buffer = memoryview(buffer)
+        try:
+            if len(buffer) % BLOCK_SIZE > 0:
+                raise Exception("Got a bad block size, the contents may be corrupt")
+
+            if validate:
+                UF2.validate_buffer(buffer)
+        except Exception:
+            buffer.release()
+            raise
+
+        blocks: List[BlockView] = [BlockView(buffer[offset:offset + BLOCK_SIZE]) for offset in range(0, len(buffer), BLOCK_SIZE)]
+
+        # Sort by block number, only unpacking the block number of each block
+        blocks.sort(key=lambda block: field_struct.unpack_from(block.buffer, BLOCK_NUMBER_OFFSET)[0])
+
+        return UF2(blocks, buffer=buffer, mapping=mapping)
+
+    @staticmethod
+    def open(path: str, mmap: bool = True, validate: bool = True) -> "UF2":
+        """Open a UF2 file from a path as lightweight block views.
+
+        If mmap is True, the file is memory-mapped and no payload is read
+        until it is accessed. Close the archive when done to unmap the file.
+        """
+        file_size = os.path.getsize(path)
+        if file_size % BLOCK_SIZE > 0:
+            raise Exception("Got a bad block size, the file may be corrupt")
+
+        with open(path, "rb") as file:
+            if not mmap or file_size == 0:
+                return UF2.from_buffer(file.read(), validate=validate)
+
+            mapping = MemoryMap(file.fileno(), 0, access=ACCESS_READ)
+
+        try:
+            return UF2.from_buffer(mapping, validate=validate, mapping=mapping)
+        except Exception:
+            # The archive owning the mapping was never created
+            mapping.close()
+            raise
+
     @staticmethod
     def read(path: str) -> "UF2":
         """Read a UF2 file from a path."""